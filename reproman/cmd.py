@@ -17,8 +17,14 @@ import logging
 import os
 import shutil
 import shlex
+import signal
 import atexit
+import codecs
+import collections
 import functools
+from queue import Queue
+import tempfile
+import threading
 
 from os.path import abspath, isabs
 
@@ -33,6 +39,54 @@ lgr = logging.getLogger('reproman.cmd')
 
 _TEMP_std = sys.stdout, sys.stderr
 
+# Defaults for Runner.stream
+CHUNK_SIZE = 64 * 1024
+TAIL_SIZE = 8 * 1024
+
+
+class TailBuffer(object):
+    """Keep the last `size` characters of a stream of text.
+
+    Parameters
+    ----------
+    size : int
+        Maximum number of characters to keep.  If 0, nothing is kept.
+    """
+
+    def __init__(self, size):
+        if size < 0:
+            raise ValueError("Tail size must not be negative: %d" % size)
+        self.size = size
+        self._chunks = collections.deque()
+        self._len = 0
+
+    def append(self, text):
+        if not self.size:
+            return
+        self._chunks.append(text)
+        self._len += len(text)
+        # Drop chunks that are entirely outside of the tail.
+        while self._len - len(self._chunks[0]) >= self.size:
+            self._len -= len(self._chunks.popleft())
+
+    def __str__(self):
+        if not self.size:
+            return ""
+        return "".join(self._chunks)[-self.size:]
+
+
+def _kill_group(proc):
+    """Kill `proc` and, if it leads a process group, the rest of the group.
+    """
+    if on_windows:
+        proc.kill()
+        return
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        # The group is already gone.
+        pass
+
 
 class Runner(object):
     """Provides a wrapper for calling functions and commands.
@@ -158,7 +212,7 @@ class Runner(object):
 
     def run(self, cmd, log_stdout=True, log_stderr=True, log_online=False,
             expect_stderr=False, expect_fail=False,
-            cwd=None, env=None, shell=None):
+            cwd=None, env=None, shell=None, callback=None, spool=None):
         """Runs the command `cmd` using shell.
 
         In case of dry-mode `cmd` is just added to `commands` and it is
@@ -211,9 +265,21 @@ class Runner(object):
             Run command in a shell.  If not specified, then it runs in a shell
             only if command is specified as a string (not a list)
 
+        callback: callable, optional
+            Called with the stream name ("stdout" or "stderr") and the text
+            for each line of output as it comes in.  Giving `callback` or
+            `spool` switches to streaming with bounded memory (see `stream`),
+            where the log_* and expect_stderr options have no effect.
+
+        spool: int, optional
+            Collect the output in temporary files which are kept in memory
+            until they exceed `spool` characters.
+
         Returns
         -------
         (stdout, stderr)
+          The files (positioned at the start) if `spool` is given, None if
+          only `callback` is given.
 
         Raises
         ------
@@ -223,6 +289,11 @@ class Runner(object):
            in CommandError's `stdout` and `stderr` fields respectively.
         """
 
+        if callback is not None or spool is not None:
+            return self._run_streamed(cmd, callback, spool,
+                                      expect_fail=expect_fail,
+                                      cwd=cwd, env=env, shell=shell)
+
         outputstream = subprocess.PIPE if log_stdout else sys.stdout
         errstream = subprocess.PIPE if log_stderr else sys.stderr
 
@@ -230,36 +301,8 @@ class Runner(object):
 
         if self.protocol.do_execute_ext_commands:
 
-            if shell is None:
-                shell = isinstance(cmd, str)
-
-            if self.protocol.records_ext_commands:
-                prot_exc = None
-                prot_id = self.protocol.start_section(
-                    shlex.split(cmd, posix=not on_windows)
-                    if isinstance(cmd, str)
-                    else cmd)
-
-            try:
-                proc = subprocess.Popen(cmd, stdout=outputstream,
-                                        stderr=errstream,
-                                        shell=shell,
-                                        cwd=cwd or self.cwd,
-                                        env=env or self.env)
-
-            except Exception as e:
-                prot_exc = e
-                if isinstance(e, FileNotFoundError) and expect_fail:
-                    logfn = lgr.debug
-                else:
-                    logfn = lgr.error
-                logfn("Failed to start %r%r: %s" %
-                      (cmd, " under %r" % cwd if cwd else '', exc_str(e)))
-                raise
-
-            finally:
-                if self.protocol.records_ext_commands:
-                    self.protocol.end_section(prot_id, prot_exc)
+            proc = self._popen(cmd, outputstream, errstream, shell=shell,
+                               cwd=cwd, env=env, expect_fail=expect_fail)
 
             if log_online:
                 out = self._get_output_online(proc, log_stdout, log_stderr,
@@ -295,15 +338,173 @@ class Runner(object):
                          level=8)
 
         else:
-            if self.protocol.records_ext_commands:
-                self.protocol.add_section(shlex.split(cmd,
-                                                      posix=not on_windows)
-                                          if isinstance(cmd, str)
-                                          else cmd, None)
+            self._add_dry_section(cmd)
             out = ("DRY", "DRY")
 
         return out
 
+    def _run_streamed(self, cmd, callback, spool, **kwargs):
+        files = None
+        if spool is not None:
+            files = {name: tempfile.SpooledTemporaryFile(max_size=spool,
+                                                         mode="w+")
+                     for name in ["stdout", "stderr"]}
+        try:
+            for name, text in self.stream(cmd, **kwargs):
+                if callback:
+                    callback(name, text)
+                if files:
+                    files[name].write(text)
+        except BaseException:
+            for fh in (files or {}).values():
+                fh.close()
+            raise
+        if files is None:
+            return None, None
+        for fh in files.values():
+            fh.seek(0)
+        return files["stdout"], files["stderr"]
+
+    def _add_dry_section(self, cmd):
+        if self.protocol.records_ext_commands:
+            self.protocol.add_section(shlex.split(cmd,
+                                                  posix=not on_windows)
+                                      if isinstance(cmd, str)
+                                      else cmd, None)
+
+    def _popen(self, cmd, stdout, stderr, shell=None, cwd=None, env=None,
+               expect_fail=False, new_session=False):
+        """Start `cmd`, recording it in the protocol.
+
+        If `new_session` is true, `cmd` is started in a new session (and thus
+        process group), so that it can be killed along with its children.
+        """
+        if shell is None:
+            shell = isinstance(cmd, str)
+
+        if self.protocol.records_ext_commands:
+            prot_exc = None
+            prot_id = self.protocol.start_section(
+                shlex.split(cmd, posix=not on_windows)
+                if isinstance(cmd, str)
+                else cmd)
+
+        try:
+            return subprocess.Popen(cmd, stdout=stdout,
+                                    stderr=stderr,
+                                    shell=shell,
+                                    cwd=cwd or self.cwd,
+                                    env=env or self.env,
+                                    start_new_session=new_session)
+
+        except Exception as e:
+            prot_exc = e
+            if isinstance(e, FileNotFoundError) and expect_fail:
+                logfn = lgr.debug
+            else:
+                logfn = lgr.error
+            logfn("Failed to start %r%r: %s" %
+                  (cmd, " under %r" % cwd if cwd else '', exc_str(e)))
+            raise
+
+        finally:
+            if self.protocol.records_ext_commands:
+                self.protocol.end_section(prot_id, prot_exc)
+
+    def stream(self, cmd, expect_fail=False, cwd=None, env=None, shell=None,
+               chunk_size=CHUNK_SIZE, tail_size=TAIL_SIZE):
+        """Run the command `cmd` and yield its output as it comes in.
+
+        Memory use does not depend on the amount of output: only the last
+        `tail_size` characters of each stream are kept, for the message of the
+        CommandError raised on failure.
+
+        Parameters
+        ----------
+        cmd : str, list
+            See `run`.
+        expect_fail, cwd, env, shell
+            See `run`.
+        chunk_size : int, optional
+            Lines longer than this many bytes are yielded in pieces.
+        tail_size : int, optional
+            Number of characters of each stream to keep for CommandError.
+
+        Yields
+        ------
+        (name, text) tuples, where name is "stdout" or "stderr" and text is a
+        line of output (or a piece of a long line)
+
+        Raises
+        ------
+        CommandError
+           if command's exitcode wasn't 0 or None.  Its `stdout` and `stderr`
+           fields contain only the tails of the output.
+        """
+        self.log("Running: %s" % (cmd,))
+        if not self.protocol.do_execute_ext_commands:
+            self._add_dry_section(cmd)
+            return
+
+        # The command gets its own process group so that stopping early kills
+        # any children that still hold the pipes.
+        proc = self._popen(cmd, subprocess.PIPE, subprocess.PIPE, shell=shell,
+                           cwd=cwd, env=env, expect_fail=expect_fail,
+                           new_session=not on_windows)
+        # A bounded queue makes the readers wait for the consumer.
+        queue = Queue(maxsize=64)
+        stopped = threading.Event()
+
+        def read(name, fh):
+            try:
+                for chunk in iter(functools.partial(fh.readline, chunk_size),
+                                  b''):
+                    if stopped.is_set():
+                        break
+                    queue.put((name, chunk))
+            finally:
+                fh.close()
+                queue.put((name, None))
+
+        for name, fh in [("stdout", proc.stdout), ("stderr", proc.stderr)]:
+            threading.Thread(target=read, args=(name, fh), daemon=True).start()
+
+        tails = {name: TailBuffer(tail_size) for name in ["stdout", "stderr"]}
+        decoders = {name: codecs.getincrementaldecoder("utf-8")("replace")
+                    for name in tails}
+        nopen = 2
+        try:
+            while nopen:
+                name, chunk = queue.get()
+                if chunk is None:
+                    nopen -= 1
+                    continue
+                text = decoders[name].decode(chunk)
+                if text:
+                    tails[name].append(text)
+                    yield name, text
+        finally:
+            if nopen:
+                # The consumer stopped early.  Don't leave the readers
+                # blocked on a full queue.
+                stopped.set()
+                _kill_group(proc)
+                while nopen:
+                    if queue.get()[1] is None:
+                        nopen -= 1
+                proc.wait()
+
+        status = proc.wait()
+        if status not in [0, None]:
+            out, err = str(tails["stdout"]), str(tails["stderr"])
+            msg = "Failed to run %r%s. Exit code=%d. out (tail)=%s " \
+                "err (tail)=%s" \
+                % (cmd, " under %r" % (cwd or self.cwd), status, out, err)
+            (lgr.debug if expect_fail else lgr.error)(msg)
+            raise CommandError(str(cmd), msg, status, out, err)
+        self.log("Finished running %r with status %s" % (cmd, status),
+                 level=8)
+
     def call(self, f, *args, **kwargs):
         """Helper to unify collection of logging all "dry" actions.
 
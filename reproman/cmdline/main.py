@@ -22,6 +22,7 @@ from importlib import import_module
 import reproman
 
 from reproman.cmdline import helpers
+from reproman.support import spans
 from reproman.support.exceptions import InsufficientArgumentsError, MissingConfigFileError
 from ..utils import setup_exceptionhook, chpwd
 from ..dochelpers import exc_str
@@ -104,6 +105,14 @@ def setup_parser(
         multiple times, in which case values in the later files override
         previous ones.""")
 
+    parser.add_argument(
+        "--trace-profile", metavar="PATH",
+        help="""record how long session commands, file transfers, and tracers
+        take and write these spans to PATH when done.  The spans are written
+        in the Chrome trace-event format (viewable at chrome://tracing or
+        https://ui.perfetto.dev) unless PATH ends with '.jsonl', in which case
+        they are written as JSON lines.""")
+
     # yoh: atm we only dump to console.  Might adopt the same separation later on
     #      and for consistency will call it --verbose-level as well for now
     # log-level is set via common_opts ATM
@@ -243,29 +252,35 @@ def main(args=None):
         lgr.info("No command given, returning")
         return
 
-    ret = None
-    if cmdlineargs.common_debug or cmdlineargs.common_idebug:
-        # so we could see/stop clearly at the point of failure
-        setup_exceptionhook(ipython=cmdlineargs.common_idebug)
-        ret = cmdlineargs.func(cmdlineargs)
-    else:
-        # otherwise - guard and only log the summary. Postmortem is not
-        # as convenient if being caught in this ultimate except
-        try:
+    if cmdlineargs.trace_profile:
+        spans.start()
+    try:
+        ret = None
+        if cmdlineargs.common_debug or cmdlineargs.common_idebug:
+            # so we could see/stop clearly at the point of failure
+            setup_exceptionhook(ipython=cmdlineargs.common_idebug)
             ret = cmdlineargs.func(cmdlineargs)
-        except InsufficientArgumentsError as exc:
-            # if the func reports inappropriate usage, give help output
-            lgr.error('%s (%s)' % (exc_str(exc), exc.__class__.__name__))
-            cmdlineargs.subparser.print_usage()
-            sys.exit(1)
-        except MissingConfigFileError as exc:
-            # TODO: ConfigManager is not finding files in the default locations.
-            lgr.error('%s (%s)' % (exc_str(exc), exc.__class__.__name__))
-            sys.exit(1)
-        except Exception as exc:
-            # print('%s (%s)' % (exc_str(exc), exc.__class__.__name__))
-            lgr.error('%s (%s)' % (exc_str(exc), exc.__class__.__name__))
-            sys.exit(1)
+        else:
+            # otherwise - guard and only log the summary. Postmortem is not
+            # as convenient if being caught in this ultimate except
+            try:
+                ret = cmdlineargs.func(cmdlineargs)
+            except InsufficientArgumentsError as exc:
+                # if the func reports inappropriate usage, give help output
+                lgr.error('%s (%s)' % (exc_str(exc), exc.__class__.__name__))
+                cmdlineargs.subparser.print_usage()
+                sys.exit(1)
+            except MissingConfigFileError as exc:
+                # TODO: ConfigManager is not finding files in the default locations.
+                lgr.error('%s (%s)' % (exc_str(exc), exc.__class__.__name__))
+                sys.exit(1)
+            except Exception as exc:
+                # print('%s (%s)' % (exc_str(exc), exc.__class__.__name__))
+                lgr.error('%s (%s)' % (exc_str(exc), exc.__class__.__name__))
+                sys.exit(1)
+    finally:
+        if cmdlineargs.trace_profile:
+            spans.write(spans.stop(), cmdlineargs.trace_profile)
     if hasattr(cmdlineargs, 'result_renderer'):
         return cmdlineargs.result_renderer(ret)
 
@@ -13,6 +13,8 @@
 from reproman.formats.tests.fixtures import demo1_spec, reprozip_spec2
 from reproman.tests.fixtures import resource_manager_fixture
 
+import sys
+
 import pytest
 
 
@@ -41,3 +43,16 @@ def pytest_collection_modifyitems(config, items):
 # any resources and don't plan on modifying the on-disk inventory. If you do
 # need to modify the resources, use `resource_manager_fixture` directly.
 resman = resource_manager_fixture(resources={}, scope="session")
+
+
+@pytest.fixture(autouse=True)
+def _clear_shared_clients():
+    """Keep shared clients (often mocks) from leaking between tests.
+    """
+    yield
+    module = sys.modules.get("reproman.resource.docker_container")
+    if module is not None:
+        module.clear_clients()
+    module = sys.modules.get("reproman.resource.aws_ec2")
+    if module is not None:
+        module.clear_state_cache()
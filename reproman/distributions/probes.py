@@ -0,0 +1,39 @@
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the reproman package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Cheap checks of whether a tracer can apply to a session.
+
+These are registered as tracer probes (see reproman.support.plugins) and run
+before the tracer modules are imported, so this module should not import
+anything heavy.
+"""
+
+from reproman.support.exceptions import CommandError
+
+
+def _have_command(session, name):
+    try:
+        session.execute_command(["sh", "-c", "command -v {}".format(name)])
+    except CommandError:
+        return False
+    return True
+
+
+def have_dpkg(session):
+    return _have_command(session, "dpkg-query")
+
+
+def have_rpm(session):
+    return _have_command(session, "rpm")
+
+
+def have_docker(session):
+    return _have_command(session, "docker")
+
+
+def have_singularity(session):
+    return _have_command(session, "singularity")
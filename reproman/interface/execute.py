@@ -11,6 +11,7 @@
 
 __docformat__ = 'restructuredtext'
 
+import asyncio
 import os
 import os.path as op
 from shlex import quote as shlex_quote
@@ -20,16 +21,22 @@ import uuid
 import yaml
 
 from .base import Interface
+from ..dochelpers import exc_str
+from ..support import spans
 from ..support.exceptions import CommandError
 from ..support.exceptions import MissingExternalDependency
 import reproman.interface.base  # Needed for test patching
 from ..support.param import Parameter
+from ..support.constraints import EnsureInt
+from ..support.constraints import EnsureListOf
+from ..support.constraints import EnsureNone
 from ..support.constraints import EnsureStr
 from ..support.external_versions import external_versions
 from ..resource import get_manager
+from ..resource.async_session import gather_bounded
+from ..resource.async_session import run_async
 from ..resource.session import Session
 from .common_opts import trace_opt
-from .common_opts import resref_opt
 from .common_opts import resref_type_opt
 
 from logging import getLogger
@@ -74,12 +81,20 @@ class CommandAdapter(object):
     def post_command(self):
         pass
 
+    def _phase(self, name):
+        return spans.span(name, "command", resource=self.resource.name,
+                          adapter=self.__class__.__name__,
+                          command=self.command)
+
     def __call__(self):
-        self.pre_command()
+        with self._phase("pre_command"):
+            self.pre_command()
         try:
-            out, err = self.execute()
+            with self._phase("execute"):
+                out, err = self.execute()
         finally:
-            self.post_command()
+            with self._phase("post_command"):
+                self.post_command()
         return out, err
 
 
@@ -277,6 +292,66 @@ class TracedCommand(CommandAdapter):
         lgr.info("ReproMan trace %s", reproman_spec_path)
 
 
+def execute_on_resources(resources, command, args, max_parallel=None):
+    """Run a command on several resources concurrently.
+
+    Output lines are written as they arrive, prefixed with the name of the
+    resource.  A summary of the exit codes is shown at the end.
+
+    Parameters
+    ----------
+    resources : list of Resource objects
+    command : str
+    args : list of str
+    max_parallel : int, optional
+        Maximum number of resources to work on at the same time.
+
+    Returns
+    -------
+    A list with the exit code for each resource, or None if the command
+    could not be run there.
+    """
+    from reproman.ui import ui
+
+    width = max(len(r.name) for r in resources)
+
+    def make_callback(name):
+        prefix = "{:<{}} | ".format(name, width)
+
+        def callback(stream, line):
+            out = sys.stdout if stream == "stdout" else sys.stderr
+            if not line.endswith("\n"):
+                line += "\n"
+            out.write(prefix + line)
+            out.flush()
+        return callback
+
+    async def run(resource):
+        await asyncio.get_running_loop().run_in_executor(None, resource.connect)
+        session = resource.get_async_session()
+        return await session.execute_command_streamed(
+            [command] + args, make_callback(resource.name))
+
+    results = run_async(
+        gather_bounded([run(r) for r in resources], max_parallel),
+        max_workers=max_parallel or len(resources))
+
+    codes = []
+    template = "{:<%d} {}" % max(width, len("RESOURCE"))
+    ui.message(template.format("RESOURCE", "EXIT CODE"))
+    ui.message(template.format("--------", "---------"))
+    for resource, result in zip(resources, results):
+        if isinstance(result, Exception):
+            lgr.error("Failed to run %s in %s: %s",
+                      command, resource.name, exc_str(result))
+            codes.append(None)
+            ui.message(template.format(resource.name, "ERROR"))
+        else:
+            codes.append(result)
+            ui.message(template.format(resource.name, result))
+    return codes
+
+
 # Exists for ease of testing.
 CMD_CLASSES = {"plain": PlainCommand,
                "internal": InternalCommand,
@@ -305,14 +380,26 @@ class Execute(Interface):
             nargs="*",
             constraints=EnsureStr(),
         ),
-        resref=resref_opt,
-        # XXX reenable when we support working with multiple instances at once
-        # resource_type=Parameter(
-        #     args=("-t", "--resource-type"),
-        #     doc="""Resource type to work on""",
-        #     constraints=EnsureStr(),
-        # ),
+        resref=Parameter(
+            args=("-r", "--resource",),
+            dest="resref",
+            metavar="RESOURCE",
+            action="append",
+            doc="""Name or ID of the resource to operate on. To see available
+            resources, run 'reproman ls'. This option can be given multiple
+            times and can be a shell-style wildcard pattern matched against
+            resource names (e.g., 'node-*') to run the command on several
+            resources at once. The output is then prefixed with the name of
+            the resource and followed by a summary of the exit codes.""",
+            constraints=EnsureStr() | EnsureListOf(str) | EnsureNone()),
         resref_type=resref_type_opt,
+        max_parallel=Parameter(
+            args=("--max-parallel",),
+            metavar="N",
+            constraints=EnsureInt(),
+            doc="""Maximum number of resources to run the command on at the
+            same time.""",
+        ),
         # TODO: should be moved into generic API
         internal=Parameter(
             args=("--internal",),
@@ -326,7 +413,7 @@ class Execute(Interface):
 
     @staticmethod
     def __call__(command, args, resref=None, resref_type="auto",
-                 internal=False, trace=False):
+                 internal=False, trace=False, max_parallel=10):
         from reproman.ui import ui
 
         if internal and trace:
@@ -337,8 +424,20 @@ class Execute(Interface):
                 "Enter a resource name or ID",
                 error_message="Missing resource name or ID"
             )
-
-        env_resource = get_manager().get_resource(resref, resref_type)
+        resrefs = [resref] if isinstance(resref, str) else resref
+
+        resources = get_manager().get_resources(resrefs, resref_type)
+        if len(resources) > 1:
+            if internal or trace:
+                raise NotImplementedError(
+                    "No --trace or --internal for multiple resources")
+            codes = execute_on_resources(resources, command, args,
+                                         max_parallel=max_parallel)
+            if any(c != 0 for c in codes):
+                raise SystemExit(1)
+            return
+
+        env_resource = resources[0]
         env_resource.connect()
 
         if internal:
@@ -17,7 +17,9 @@ import yaml
 from reproman.dochelpers import exc_str
 from reproman.interface.base import Interface
 from reproman.support.jobs.local_registry import LocalRegistry
+from reproman.support.jobs.orchestrators import DataladOrchestrator
 from reproman.support.jobs.orchestrators import ORCHESTRATORS
+from reproman.support.jobs.status import query_statuses
 from reproman.resource import get_manager
 from reproman.support.param import Parameter
 from reproman.support.constraints import EnsureChoice
@@ -89,17 +91,45 @@ def _resurrect_orc(job):
     return orc
 
 
+def _needs_orchestrator(job, orc_status):
+    # DataLad orchestrators can find the status in the job's ref.
+    return orc_status == "unknown" and issubclass(
+        ORCHESTRATORS[job["orchestrator"]], DataladOrchestrator)
+
+
+def _get_status(job, statuses=None):
+    """Return the orchestrator's and the submitter's status of `job`.
+
+    Parameters
+    ----------
+    job : dict
+    statuses : dict, optional
+        Statuses returned by `query_statuses`.  The orchestrator is
+        resurrected to query jobs that are not in there.
+
+    Returns
+    -------
+    A tuple as described for `query_statuses`.  The subjob summary is None
+    if the orchestrator had to be resurrected.
+    """
+    status = (statuses or {}).get(job["_jobid"])
+    if isinstance(status, Exception):
+        raise status
+    if status is None:
+        orc = _resurrect_orc(job)
+        status = orc.status, orc.submitter.status, None
+    return status
+
+
 # Action functions
 
 
-def show_oneline(job, status=False):
+def show_oneline(job, status=False, statuses=None):
     """Display `job` as a single summary line.
     """
     fmt = "{status}{j[_jobid]} on {j[resource_name]} via {j[submitter]}$ {cmd}"
     if status:
-        orc = _resurrect_orc(job)
-        orc_status = orc.status
-        _, queried_status = orc.submitter.status
+        orc_status, (_, queried_status), _ = _get_status(job, statuses)
         if orc_status == queried_status:
             # Drop repeated status (e.g., our and condor's "running").
             queried_status = None
@@ -120,31 +150,45 @@ def show_oneline(job, status=False):
         )
 
 
-def show(job, status=False):
+def show(job, status=False, statuses=None):
     """Display detailed information about `job`.
     """
     if status:
-        orc = _resurrect_orc(job)
-        queried_normalized, queried = orc.submitter.status
-        job["status"] = {"orchestrator": orc.status,
+        orc_status, (queried_normalized, queried), summary = _get_status(
+            job, statuses)
+        job["status"] = {"orchestrator": orc_status,
                          "queried": queried,
                          "queried_normalized": queried_normalized}
+        if summary:
+            job["status"]["subjobs"] = summary
     print(yaml.safe_dump(job))
 
 
-def fetch(job):
+def fetch(job, meta_only=False):
     """Fetch `job` locally.
+
+    If `meta_only` is true, fetch only the logs and status files and keep
+    the job registered so that its outputs can be fetched later.
     """
     orc = _resurrect_orc(job)
     if orc.has_completed:
-        orc.fetch()
-        LREG.unregister(orc.jobid)
+        orc.fetch(meta_only=meta_only)
+        if not meta_only:
+            LREG.unregister(orc.jobid)
     else:
         lgr.warning("Not fetching incomplete job %s [status: %s]",
                     job["_jobid"],
                     orc.status or "unknown")
 
 
+def rerun_failed(job):
+    """Resubmit the failed subjobs of `job` and update its record.
+    """
+    orc = _resurrect_orc(job)
+    if orc.rerun_failed():
+        LREG.register(orc.jobid, orc.as_dict(), replace=True)
+
+
 class Jobs(Interface):
     """View and manage `reproman run` jobs.
 
@@ -158,6 +202,11 @@ class Jobs(Interface):
 
       - fetch: Fetch a completed job
 
+      - rerun-failed: Submit the failed subjobs of a completed job again, in
+        the same working directory. The job must still be registered, so
+        fetch it with --meta-only to inspect the failures first. This is
+        supported only by the plain orchestrator.
+
       - auto: If jobs are specified (via JOB or --all), behave like 'fetch'.
         Otherwise, behave like 'list'.
     """
@@ -171,7 +220,7 @@ class Jobs(Interface):
             args=("-a", "--action"),
             constraints=EnsureChoice(
                 "auto", "list", "show",
-                "delete", "fetch"),
+                "delete", "fetch", "rerun-failed"),
             doc="""Operation to perform on the job(s)."""),
         all_=Parameter(
             dest="all_",
@@ -184,11 +233,20 @@ class Jobs(Interface):
             action="store_true",
             doc="""Query the resource for status information when listing or
             showing jobs"""),
+        meta_only=Parameter(
+            dest="meta_only",
+            args=("--meta-only",),
+            action="store_true",
+            doc="""When fetching, get only the status and log files of the
+            jobs, not their outputs. The jobs stay registered so that their
+            outputs can be fetched later. This is supported only by the plain
+            orchestrator."""),
         # TODO: Add ability to restrict to resource.
     )
 
     @staticmethod
-    def __call__(queries, action="auto", all_=False, status=False):
+    def __call__(queries, action="auto", all_=False, status=False,
+                 meta_only=False):
         job_files = LREG.find_job_files()
 
         if not job_files:
@@ -206,7 +264,7 @@ class Jobs(Interface):
                 else:
                     lgr.warning("No jobs matched query %s", query)
 
-        if not matched_ids and action in ["delete", "fetch"]:
+        if not matched_ids and action in ["delete", "fetch", "rerun-failed"]:
             # These are actions where we don't want to just conveniently
             # default to "all" unless --all is explicitly specified.
             raise ValueError("Must specify jobs to {}".format(action))
@@ -219,11 +277,17 @@ class Jobs(Interface):
             jobs = [_load(job_files[i]) for i in matched_ids or job_files]
 
             if action == "fetch" or (action == "auto" and matched_ids):
-                fn = fetch
-            elif action == "list" or action == "auto":
-                fn = partial(show_oneline, status=status)
-            elif action == "show":
-                fn = partial(show, status=status)
+                fn = partial(fetch, meta_only=meta_only)
+            elif action == "rerun-failed":
+                fn = rerun_failed
+            elif action in ["list", "auto", "show"]:
+                statuses = None
+                if status:
+                    statuses = query_statuses(
+                        jobs, get_manager(),
+                        needs_orchestrator=_needs_orchestrator)
+                fn = partial(show if action == "show" else show_oneline,
+                             status=status, statuses=statuses)
             else:
                 raise RuntimeError("Unknown action: {}".format(action))
 
@@ -12,10 +12,18 @@
 __docformat__ = 'restructuredtext'
 
 from collections import OrderedDict
+import queue
+import threading
+import time
+
+import humanize
 
 from .base import Interface
 from .common_opts import resref_type_opt
 # import reproman.interface.base  # Needed for test patching
+from ..support.constraints import EnsureFloat
+from ..support.constraints import EnsureInt
+from ..support.constraints import EnsureNone
 from ..support.param import Parameter
 from ..resource import get_manager
 from ..ui import ui
@@ -54,15 +62,39 @@ class Ls(Interface):
             doc="Restrict the output to this resource name or ID"
         ),
         resref_type=resref_type_opt,
+        max_age=Parameter(
+            args=("--max-age",),
+            metavar="SECONDS",
+            constraints=EnsureFloat() | EnsureNone(),
+            doc="""Refresh the status of a resource only if it was last
+            checked more than this many seconds ago (or never), and show the
+            recorded status otherwise.  This doesn't require --refresh""",
+        ),
+        max_parallel=Parameter(
+            args=("--max-parallel",),
+            metavar="N",
+            constraints=EnsureInt(),
+            doc="""When refreshing, the maximum number of resources to query
+            at the same time""",
+        ),
+        timeout=Parameter(
+            args=("--timeout",),
+            metavar="SECONDS",
+            constraints=EnsureFloat() | EnsureNone(),
+            doc="""When refreshing, report a resource as 'TIMEOUT' if it
+            doesn't respond within this many seconds""",
+        ),
     )
 
     @staticmethod
     def __call__(resrefs=None, resref_type="auto", verbose=False,
-                 refresh=False):
+                 refresh=False, max_age=None, max_parallel=10, timeout=30):
         id_length = 19  # todo: make it possible to output them long
-        template = '{:<20} {:<20} {:<%(id_length)s} {!s:<10}' % locals()
-        ui.message(template.format('RESOURCE NAME', 'TYPE', 'ID', 'STATUS'))
-        ui.message(template.format('-------------', '----', '--', '------'))
+        template = '{:<20} {:<20} {:<%(id_length)s} {!s:<17} {}' % locals()
+        ui.message(template.format('RESOURCE NAME', 'TYPE', 'ID', 'STATUS',
+                                   'CHECKED'))
+        ui.message(template.format('-------------', '----', '--', '------',
+                                   '-------'))
 
         results = OrderedDict()
         manager = get_manager()
@@ -71,10 +103,10 @@ class Ls(Interface):
                        if not n.startswith("_"))
 
         unknown_resrefs = []
+        resources = []
         for resref in resrefs:
             try:
                 resource = manager.get_resource(resref, resref_type)
-                name = resource.name
             except ResourceNotFoundError as e:
                 lgr.debug("Resource %s not found: %s", resref, exc_str(e))
                 unknown_resrefs.append(resref)
@@ -83,31 +115,44 @@ class Ls(Interface):
                 lgr.warning("Manager did not return a resource for %s: %s",
                             resref, exc_str(e))
                 continue
+            resources.append(resource)
 
-            if refresh:
-                try:
-                    resource.connect()
-                    if not resource.id:
-                        resource.status = 'NOT FOUND'
-                except Exception as e:
-                    lgr.debug("%s resource query error: %s", name, exc_str(e))
-                    resource.status = 'CONNECTION ERROR'
-
-                manager.inventory[name].update({'status': resource.status})
-
-            id_ = manager.inventory[name]['id']
+        def show(resource):
+            name = resource.name
+            inventory_item = manager.inventory[name]
+            id_ = inventory_item['id']
+            checked = inventory_item.get('status_time')
             msgargs = (
                 name,
                 resource.type,
                 id_[:id_length],
                 resource.status,
+                humanize.naturaltime(time.time() - checked)
+                if checked else "-",
             )
             ui.message(template.format(*msgargs))
             results[id_] = msgargs
 
-        if refresh:
+        if refresh or max_age is not None:
+            now = time.time()
+            stale = []
+            for resource in resources:
+                checked = manager.inventory[resource.name].get('status_time')
+                if max_age is not None and checked \
+                        and now - checked <= max_age:
+                    show(resource)
+                else:
+                    stale.append(resource)
+            for resource, status in _iter_refreshed(stale, max_parallel,
+                                                    timeout):
+                resource.status = status
+                manager.inventory[resource.name].update(
+                    {'status': status, 'status_time': time.time()})
+                show(resource)
             manager.save_inventory()
         else:
+            for resource in resources:
+                show(resource)
             ui.message('Use --refresh option to view updated status.')
 
         if unknown_resrefs:
@@ -115,3 +160,78 @@ class Ls(Interface):
                 "Could not find the following resources: {}"
                 .format(", ".join(unknown_resrefs)))
         return results
+
+
+def _check_status(resource):
+    """Connect to `resource` and return its status.
+    """
+    try:
+        resource.connect()
+        if not resource.id:
+            return 'NOT FOUND'
+    except Exception as e:
+        lgr.debug("%s resource query error: %s", resource.name, exc_str(e))
+        return 'CONNECTION ERROR'
+    return resource.status
+
+
+def _iter_refreshed(resources, max_parallel, timeout):
+    """Check the status of `resources` concurrently.
+
+    Parameters
+    ----------
+    resources : list of Resource objects
+    max_parallel : int
+        Maximum number of resources to check at the same time.
+    timeout : float or None
+        A resource that is not done after this many seconds is reported with
+        a 'TIMEOUT' status.  The check continues in a daemon thread, while
+        another one takes its place.
+
+    Yields
+    ------
+    (resource, status) tuples in the order in which the checks complete
+    """
+    todo = queue.Queue()
+    for resource in resources:
+        todo.put(resource)
+    done = queue.Queue()
+    started = {}
+
+    def work():
+        while True:
+            try:
+                resource = todo.get_nowait()
+            except queue.Empty:
+                return
+            started[resource.name] = time.time()
+            done.put((resource, _check_status(resource)))
+
+    def spawn():
+        threading.Thread(target=work, daemon=True).start()
+
+    for _ in range(min(max_parallel, len(resources))):
+        spawn()
+
+    pending = {r.name: r for r in resources}
+    while pending:
+        wait = None
+        if timeout is not None:
+            deadlines = [started[n] + timeout for n in pending
+                         if n in started]
+            # Those not started yet have at least `timeout` left.
+            wait = max(min(deadlines, default=time.time() + timeout)
+                       - time.time(), 0)
+        try:
+            resource, status = done.get(timeout=wait)
+        except queue.Empty:
+            now = time.time()
+            for name in list(pending):
+                if name in started and now - started[name] >= timeout:
+                    lgr.warning("No status for %s after %s seconds",
+                                name, timeout)
+                    yield pending.pop(name), 'TIMEOUT'
+                    spawn()
+            continue
+        if pending.pop(resource.name, None) is not None:
+            yield resource, status
@@ -13,6 +13,7 @@ from os.path import normpath
 import sys
 import time
 
+from reproman.dochelpers import exc_str
 from reproman.resource.session import get_local_session
 from reproman.resource.session import Session
 from .common_opts import resref_opt
@@ -20,6 +21,8 @@ from .common_opts import resref_type_opt
 from .base import Interface
 from ..support.constraints import EnsureNone
 from ..support.constraints import EnsureStr
+from ..support import plugins
+from ..support import spans
 from ..support.exceptions import InsufficientArgumentsError
 from ..support.param import Parameter
 from ..utils import assure_list
@@ -153,10 +156,10 @@ def identify_distributions(files, session=None, tracer_classes=None):
     unknown_files : list of str
       Files which were not determined to belong to any specific distribution
     """
+    session = session or get_local_session()
     if tracer_classes is None:
-        tracer_classes = get_tracer_classes()
+        tracer_classes = get_tracer_classes(session)
 
-    session = session or get_local_session()
     # TODO create list of appropriate for the `environment` OS tracers
     #      in case of no environment -- get current one
     # TODO: should operate in the session, might be given additional information
@@ -204,12 +207,17 @@ def identify_distributions(files, session=None, tracer_classes=None):
             #     files, so we should not just 'continue' the loop if there is no
             #     files_to_trace
             if files_to_trace:
-                remaining_files_to_trace = files_to_trace
-                nenvs = 0
-                for env, remaining_files_to_trace in tracer.identify_distributions(
-                        files_to_trace):
-                    distibutions.append(env)
-                    nenvs += 1
+                with spans.span(Tracer.__name__, "tracer",
+                                resource=getattr(session, "resource_name", None),
+                                iteration=niter,
+                                files=len(files_to_trace)) as span_attrs:
+                    remaining_files_to_trace = files_to_trace
+                    nenvs = 0
+                    for env, remaining_files_to_trace in \
+                            tracer.identify_distributions(files_to_trace):
+                        distibutions.append(env)
+                        nenvs += 1
+                    span_attrs["distributions"] = nenvs
                 files_processed |= files_to_trace - remaining_files_to_trace
                 files_to_trace = remaining_files_to_trace
                 lgr.info("%s: %d envs with %d other files remaining",
@@ -231,19 +239,35 @@ def identify_distributions(files, session=None, tracer_classes=None):
     return distibutions, files_to_consider
 
 
-def get_tracer_classes():
+def get_tracer_classes(session=None):
     """A helper which returns a list of all available Tracers
 
-    The order should not but does matter and ATM is magically provided
+    The order should not but does matter and is the order of the registered
+    tracers (see reproman.support.plugins).
+
+    Parameters
+    ----------
+    session : Session, optional
+        If given, skip tracers whose probe reports that they cannot apply to
+        this session.  Such tracers are not imported.
     """
-    # TODO: automate discovery of available tracers
-    from reproman.distributions.debian import DebTracer
-    from reproman.distributions.redhat import RPMTracer
-    from reproman.distributions.conda import CondaTracer
-    from reproman.distributions.venv import VenvTracer
-    from reproman.distributions.vcs import VCSTracer
-    from reproman.distributions.docker import DockerTracer
-    from reproman.distributions.singularity import SingularityTracer
-    Tracers = [DebTracer, RPMTracer, CondaTracer, VenvTracer, VCSTracer,
-        DockerTracer, SingularityTracer]
-    return Tracers
+    tracers = []
+    probes = plugins.get_plugins(plugins.TRACER_PROBES)
+    for name in plugins.get_plugins(plugins.TRACERS):
+        if session is not None and name in probes:
+            try:
+                applicable = plugins.load_plugin(plugins.TRACER_PROBES,
+                                                 name)(session)
+            except Exception as exc:
+                lgr.debug("Probe for tracer %s failed, assuming it applies: "
+                          "%s", name, exc_str(exc))
+                applicable = True
+            if not applicable:
+                lgr.debug("Skipping tracer %s: not applicable to %s",
+                          name, session)
+                continue
+        try:
+            tracers.append(plugins.load_plugin(plugins.TRACERS, name))
+        except Exception as exc:
+            lgr.warning("Failed to load tracer %s: %s", name, exc_str(exc))
+    return tracers
@@ -187,6 +187,31 @@ JOB_PARAMETERS = collections.OrderedDict(
          directory."""),
         ("inputs, outputs",
          """Input and output files (list) to the command."""),
+        ("input_store",
+         """If true, keep the inputs in a content-addressed store under the
+         root directory and hard link them into the working directory, so that
+         inputs with unchanged content are not transferred again for later
+         jobs. Jobs must not modify their inputs in place. This option is valid
+         only for the plain orchestrator."""),
+        ("run_cache",
+         """If true, reuse the results of earlier subjobs with the same
+         command, inputs, container, and resource configuration instead of
+         running them again. The outputs, stdout, and stderr of subjobs that
+         succeed are kept in a cache under the root directory when the job is
+         fetched, and later subjobs found in the cache are marked as "cached"
+         and not submitted. Outputs must be declared and within the working
+         directory. This option is valid only for the plain orchestrator."""),
+        ("compress_results",
+         """Whether the plain orchestrator should compress the archive in which
+         it fetches the results (default: true)."""),
+        ("pack_size",
+         """Number of commands to run in each task of the batch system's job
+         array (default: 1). Packing many short commands into fewer array
+         tasks reduces the load on the scheduler. Each command still gets its
+         own status and output files. The local submitter ignores this."""),
+        ("pack_parallel",
+         """Number of a task's packed commands to run at once (default:
+         1)."""),
         ("message",
          """Message to use when saving the run. The details depend on the orchestator,
          but in general this message will be used in the commit message."""),
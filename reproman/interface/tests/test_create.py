@@ -32,7 +32,7 @@ def test_create_interface():
         swallow_logs(new_level=logging.DEBUG) as log:
 
         client.return_value = MagicMock(
-            containers=lambda all: [],
+            containers=lambda all, filters: [],
             pull=lambda repository, stream: [
                 b'{ "status" : "status 1", "progress" : "progress 1" }',
                 b'{ "status" : "status 2", "progress" : "progress 2" }'
@@ -45,7 +45,7 @@ def mock_get_manager():
 def mock_docker_client():
     mock = MagicMock()
     mock.return_value = MagicMock(
-        containers=lambda all: [
+        containers=lambda all, filters: [
             {
                 'Id': '326b0fdfbf838',
                 'Names': ['/my-resource'],
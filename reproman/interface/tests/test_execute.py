@@ -85,6 +85,31 @@ def test_invalid_trace_internal():
         execute("doesn't matter", [], internal=True, trace=True)
 
 
+def test_execute_multiple_resources():
+    manager = ResourceManager()
+    manager.inventory = {
+        name: {"name": name, "type": "shell", "id": name + "-id"}
+        for name in ["node-1", "node-2", "other"]}
+    with patch("reproman.interface.execute.get_manager",
+               return_value=manager):
+        with swallow_outputs() as cmo:
+            main(["execute", "-r", "node-*", "-r", "other", "--max-parallel",
+                  "2", "--", "sh", "-c", "echo hi; echo err >&2"])
+            out, err = cmo.out, cmo.err
+        for name in ["node-1", "node-2", "other"]:
+            assert "{:<6} | hi\n".format(name) in out
+            assert "{:<6} | err\n".format(name) in err
+        assert "RESOURCE EXIT CODE" in out
+        assert "node-1   0" in out
+
+        with pytest.raises(SystemExit) as exc:
+            execute("sh", ["-c", "test $PWD = /"], resref=["node-1", "other"])
+        assert exc.value.code == 1
+
+        with pytest.raises(NotImplementedError):
+            execute("true", [], resref=["node-*"], internal=True)
+
+
 @pytest.fixture(scope="function")
 def trace_info(tmpdir_factory):
     """Return a TracedCommand that uses temporary directories.
@@ -27,7 +27,7 @@ def test_install_interface(demo1_spec):
             swallow_logs(new_level=logging.DEBUG) as log:
 
         client.return_value = MagicMock(
-            containers=lambda all: [
+            containers=lambda all, filters: [
                 {
                     'Id': '326b0fdfbf838',
                     'Names': ['/my-resource'],
@@ -29,7 +29,7 @@ def test_login_interface():
         swallow_logs(new_level=logging.DEBUG) as log:
 
         client.return_value = MagicMock(
-            containers=lambda all: [
+            containers=lambda all, filters: [
                 {
                     'Id': '18b31b30e3a5',
                     'Names': ['/my-test-resource'],
@@ -7,12 +7,15 @@
 # ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
 
 import contextlib
+import threading
+import time
 from unittest.mock import patch
 
 import pytest
 
 from ...api import ls
 from ...resource.base import ResourceManager
+from ...resource.shell import Shell
 from ...support.exceptions import ResourceNotFoundError
 from ...tests.skip import skipif
 
@@ -95,3 +98,58 @@ def test_ls_unknown(resource_manager):
                return_value=resource_manager):
         with pytest.raises(ResourceNotFoundError):
             ls(resrefs=["unknown"], resref_type="name")
+
+
+def test_ls_refresh_parallel():
+    manager = ResourceManager()
+    manager.inventory = {
+        name: {"name": name, "type": "shell", "id": name + "-id",
+               "status": "available"}
+        for name in ["fast", "hangs", "recent"]}
+    manager.inventory["recent"]["status_time"] = time.time()
+    manager.save_inventory = lambda: None
+    release = threading.Event()
+    connected = []
+
+    def connect(self):
+        connected.append(self.name)
+        if self.name == "hangs":
+            release.wait()
+
+    try:
+        with patch("reproman.interface.ls.get_manager",
+                   return_value=manager), \
+                patch.object(Shell, "connect", connect):
+            results = ls(refresh=True, max_age=60, timeout=0.5)
+    finally:
+        release.set()
+    # The recent status was shown right away and not queried.
+    assert list(results) == ["recent-id", "fast-id", "hangs-id"]
+    assert sorted(connected) == ["fast", "hangs"]
+    assert results["fast-id"][3] == "available"
+    assert results["hangs-id"][3] == "TIMEOUT"
+    assert manager.inventory["hangs"]["status"] == "TIMEOUT"
+    assert manager.inventory["fast"]["status_time"] > \
+        manager.inventory["recent"]["status_time"]
+
+
+def test_ls_max_age_without_refresh():
+    manager = ResourceManager()
+    manager.inventory = {
+        name: {"name": name, "type": "shell", "id": name + "-id",
+               "status": "available"}
+        for name in ["never", "old", "recent"]}
+    manager.inventory["old"]["status_time"] = time.time() - 3600
+    manager.inventory["recent"]["status_time"] = time.time()
+    manager.save_inventory = lambda: None
+    connected = []
+
+    def connect(self):
+        connected.append(self.name)
+
+    with patch("reproman.interface.ls.get_manager",
+               return_value=manager), \
+            patch.object(Shell, "connect", connect):
+        ls(max_age=60)
+    assert sorted(connected) == ["never", "old"]
+    assert manager.inventory["old"]["status_time"] > time.time() - 60
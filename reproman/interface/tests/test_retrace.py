@@ -8,8 +8,10 @@
 
 from reproman.cmdline.main import main
 from reproman.formats import Provenance
+from reproman.support import plugins
 
 import logging
+from unittest.mock import patch
 
 from reproman.utils import swallow_logs, swallow_outputs, make_tempfile
 from reproman.tests.utils import (
@@ -18,6 +20,7 @@ from reproman.tests.utils import (
 )
 from reproman.tests.skip import mark
 
+from ..retrace import get_tracer_classes
 from ..retrace import identify_distributions
 
 def test_retrace(reprozip_spec2):
@@ -149,4 +152,36 @@ def test_retrace_loop_over_tracers():
         ],
         files=["file1", "file2"],
         tenvs=['Env1', 'Env2', 'Env2.1', 'Env3'],
-        tfiles={'file3'})
\ No newline at end of file
+        tfiles={'file3'})
+
+
+def _never_applies(session):
+    return False
+
+
+def test_get_tracer_classes():
+    from reproman.distributions.debian import DebTracer
+    from reproman.distributions.vcs import VCSTracer
+
+    tracers = get_tracer_classes()
+    assert tracers[0] is DebTracer
+    assert VCSTracer in tracers
+
+    registry = plugins._get_registry()
+    with patch.dict(registry[plugins.TRACERS],
+                    {"missing": "reproman.not_a_module:Tracer"}):
+        # A tracer which fails to import is skipped with a warning.
+        with swallow_logs(new_level=logging.WARNING) as log:
+            assert VCSTracer in get_tracer_classes()
+            assert "Failed to load tracer missing" in log.out
+
+        # A probe reporting that the tracer does not apply keeps it from
+        # being imported.
+        with patch.dict(registry[plugins.TRACER_PROBES],
+                        {"debian": __name__ + ":_never_applies",
+                         "missing": __name__ + ":_never_applies"}):
+            with swallow_logs(new_level=logging.WARNING) as log:
+                tracers = get_tracer_classes(session=object())
+                assert not log.out
+            assert DebTracer not in tracers
+            assert VCSTracer in tracers
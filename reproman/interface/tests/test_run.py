@@ -9,12 +9,14 @@
 """
 
 import contextlib
+import glob
 import logging
 from unittest.mock import patch
 import os
 import os.path as op
 import shutil
 import time
+import yaml
 
 import pytest
 
@@ -292,6 +294,65 @@ def test_run_and_fetch(context):
     assert op.exists(op.join(path, "ok"))
 
 
+def test_jobs_fetch_meta_only(context):
+    path = context["directory"]
+    run = context["run_fn"]
+    jobs = context["jobs_fn"]
+    registry = context["registry"]
+
+    run(command=["sh", "-c", "echo hi && touch ok"], outputs=["ok"],
+        resref="myshell")
+    jobid = list(registry.find_job_files())[0]
+    with swallow_outputs():
+        try_fetch(lambda: jobs(queries=[], action="fetch", all_=True,
+                               meta_only=True))
+    assert not op.exists(op.join(path, "ok"))
+    stdout = glob.glob(op.join(path, ".reproman", "jobs", "*", jobid,
+                               "stdout.0"))
+    assert len(stdout) == 1
+    with open(stdout[0]) as fh:
+        assert "hi\n" in fh.read()
+    # The job is still registered so that the outputs can be fetched.
+    assert list(registry.find_job_files()) == [jobid]
+
+    with swallow_outputs():
+        jobs(queries=[], action="fetch", all_=True)
+    assert op.exists(op.join(path, "ok"))
+    assert len(registry.find_job_files()) == 0
+
+
+def test_jobs_rerun_failed(context):
+    path = context["directory"]
+    run = context["run_fn"]
+    jobs = context["jobs_fn"]
+    registry = context["registry"]
+
+    flag = op.join(path, "flag")
+    run(command=["sh", "-c", "test -e {} && touch ok".format(flag)],
+        outputs=["ok"], resref="myshell")
+    jobid = list(registry.find_job_files())[0]
+    with swallow_outputs():
+        try_fetch(lambda: jobs(queries=[], action="fetch", all_=True,
+                               meta_only=True))
+    status, = glob.glob(op.join(path, ".reproman", "jobs", "*", jobid,
+                                "status.0"))
+    with open(status) as fh:
+        assert fh.read().startswith("failed")
+
+    create_tree(path, {"flag": ""})
+    with pytest.raises(ValueError):
+        jobs(queries=[], action="rerun-failed")
+    jobs(queries=[jobid], action="rerun-failed")
+    with open(registry.find_job_files()[jobid]) as fh:
+        assert yaml.safe_load(fh)["_num_run"] == 1
+    with swallow_outputs():
+        try_fetch(lambda: jobs(queries=[], action="fetch", all_=True))
+    assert op.exists(op.join(path, "ok"))
+    with open(status) as fh:
+        assert fh.read().strip() == "succeeded"
+    assert len(registry.find_job_files()) == 0
+
+
 def test_run_and_follow(context):
     path = context["directory"]
     run = context["run_fn"]
@@ -405,6 +466,27 @@ def test_jobs_show(context):
         assert len(output.out.splitlines()) > 1
         assert "myshell" in output.out
         assert "status:" in output.out
+        status = yaml.safe_load(output.out)["status"]
+        assert sum(status["subjobs"]["counts"].values()) == 1
+        assert status["subjobs"]["failed"] == []
+
+
+def test_jobs_status_batched(context):
+    run = context["run_fn"]
+    jobs = context["jobs_fn"]
+
+    run(command=["doesntmatter0"], resref="myshell")
+    run(command=["doesntmatter1"], resref="myshell")
+
+    # The status of all jobs is queried without resurrecting an
+    # orchestrator for each one.
+    with patch("reproman.interface.jobs._resurrect_orc",
+               side_effect=AssertionError("resurrected")):
+        with swallow_outputs() as output:
+            jobs(queries=[], status=True)
+            lines = output.out.splitlines()
+    assert len(lines) == 2
+    assert all(ln.startswith("[status: ") for ln in lines)
 
 
 def test_jobs_unknown_action(context):
@@ -0,0 +1,391 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the reproman package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Asynchronous counterparts of sessions
+
+These allow working with many resources at once from a single event loop.
+Use `get_async_session` to wrap an existing session and `run_async` to drive
+coroutines from synchronous code.
+"""
+
+import asyncio
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import logging
+import os
+
+import attr
+
+from reproman.resource.session import get_updated_env
+from reproman.resource.session import POSIXSession
+from reproman.resource.shell import ShellSession
+from reproman.support import spans
+from reproman.support.exceptions import CommandError
+from reproman.utils import command_as_string
+from reproman.utils import to_unicode
+
+lgr = logging.getLogger('reproman.resource.async_session')
+
+StatResult = namedtuple("StatResult", ["isdir", "size", "mtime"])
+StatResult.__doc__ = """Subset of stat information returned by stat_many.
+
+Both `size` and `mtime` may be None if the session cannot provide them.
+"""
+
+
+class AsyncSession(object):
+    """Interface for asynchronous interaction within a resource environment
+
+    The methods mirror the ones of `Session`, but are coroutines.
+    """
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def open(self):
+        """Called when a session is started.
+        """
+        pass
+
+    async def close(self):
+        """Called when a session ends.
+        """
+        pass
+
+    async def execute_command(self, command, env=None, cwd=None,
+                              with_shell=False):
+        """Execute the given command in the environment.
+
+        See `Session.execute_command` for a description of the parameters.
+
+        Returns
+        -------
+        (stdout, stderr)
+        """
+        raise NotImplementedError
+
+    async def execute_many(self, commands, env=None, stop_on_error=False):
+        """Execute several commands in the environment.
+
+        See `Session.execute_many` for a description of the parameters.
+
+        Returns
+        -------
+        list of (stdout, stderr, exit code) tuples
+        """
+        raise NotImplementedError
+
+    async def execute_command_streamed(self, command, callback, env=None,
+                                       cwd=None, with_shell=False):
+        """Execute the given command and pass its output lines to `callback`.
+
+        Sessions which cannot stream pass the output once the command is
+        done.
+
+        Parameters
+        ----------
+        command, env, cwd, with_shell
+            See `Session.execute_command`.
+        callback : callable
+            Called with the name of the stream ("stdout" or "stderr") and a
+            line of output, including the trailing newline if any.
+
+        Returns
+        -------
+        exit code of the command
+        """
+        try:
+            out, err = await self.execute_command(
+                command, env=env, cwd=cwd, with_shell=with_shell)
+            code = 0
+        except CommandError as exc:
+            out, err, code = exc.stdout, exc.stderr, exc.code
+        for stream, text in [("stdout", out), ("stderr", err)]:
+            for line in (text or "").splitlines(True):
+                callback(stream, line)
+        return code
+
+    async def stat_many(self, paths):
+        """Stat several paths in the environment.
+
+        Parameters
+        ----------
+        paths : list of str
+
+        Returns
+        -------
+        list with a StatResult, or None if the path does not exist, for each
+        path
+        """
+        raise NotImplementedError
+
+    async def put(self, src_path, dest_path, uid=-1, gid=-1):
+        """Take file on the local file system and copy over into the session.
+
+        See `Session.put` for a description of the parameters.
+        """
+        raise NotImplementedError
+
+    async def get(self, src_path, dest_path=None, uid=-1, gid=-1):
+        """Take file from the session and copy to the local file system.
+
+        See `Session.get` for a description of the parameters.
+        """
+        raise NotImplementedError
+
+
+def _stat_many(session, paths):
+    """Synchronous implementation of `AsyncSession.stat_many`.
+    """
+    if isinstance(session, POSIXSession):
+        # A single round trip for all paths.
+        results = session.execute_many(
+            [["stat", "-L", "-c", "%F %s %Y", path] for path in paths])
+        stats = []
+        for out, _, code in results:
+            if code:
+                stats.append(None)
+                continue
+            ftype, size, mtime = out.strip().rsplit(" ", 2)
+            stats.append(StatResult(ftype == "directory",
+                                    int(size), int(mtime)))
+        return stats
+    return [StatResult(session.isdir(path), None, session.get_mtime(path))
+            if session.exists(path) else None
+            for path in paths]
+
+
+@attr.s
+class SyncSessionAdapter(AsyncSession):
+    """Run the methods of a synchronous `Session` in a worker thread
+
+    Calls are serialized per adapter because sessions are not thread-safe,
+    but calls on different adapters run concurrently.
+    """
+
+    session = attr.ib()
+    _lock = attr.ib(default=None, init=False, repr=False)
+
+    async def _run(self, func, *args, **kwargs):
+        # The lock has to be created within the loop which uses it.
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, partial(func, *args, **kwargs))
+
+    async def open(self):
+        await self._run(self.session.open)
+
+    async def close(self):
+        await self._run(self.session.close)
+
+    async def execute_command(self, command, env=None, cwd=None,
+                              with_shell=False):
+        return await self._run(self.session.execute_command, command,
+                               env=env, cwd=cwd, with_shell=with_shell)
+
+    async def execute_many(self, commands, env=None, stop_on_error=False):
+        return await self._run(self.session.execute_many, commands,
+                               env=env, stop_on_error=stop_on_error)
+
+    async def execute_command_streamed(self, command, callback, env=None,
+                                       cwd=None, with_shell=False):
+        loop = asyncio.get_running_loop()
+
+        def relay(name, text):
+            for line in (text or "").splitlines(True):
+                loop.call_soon_threadsafe(callback, name, line)
+
+        def stream():
+            nlines = 0
+            try:
+                for name, line in self.session.iter_command_output(
+                        command, env=env, cwd=cwd, with_shell=with_shell):
+                    nlines += 1
+                    loop.call_soon_threadsafe(callback, name, line)
+            except CommandError as exc:
+                if not nlines:
+                    # The session doesn't stream and failed before
+                    # providing any output.
+                    relay("stdout", exc.stdout)
+                    relay("stderr", exc.stderr)
+                return exc.code
+            return 0
+
+        # The lines are handed to the loop before the result, so all
+        # callbacks have run when this returns.
+        return await self._run(stream)
+
+    async def stat_many(self, paths):
+        return await self._run(_stat_many, self.session, paths)
+
+    async def put(self, src_path, dest_path, uid=-1, gid=-1):
+        await self._run(self.session.put, src_path, dest_path, uid, gid)
+
+    async def get(self, src_path, dest_path=None, uid=-1, gid=-1):
+        await self._run(self.session.get, src_path, dest_path, uid, gid)
+
+
+@attr.s
+class AsyncShellSession(SyncSessionAdapter):
+    """Local session running commands as asyncio subprocesses
+    """
+
+    session = attr.ib(default=attr.Factory(ShellSession))
+
+    async def _create_process(self, command, env=None, cwd=None,
+                              with_shell=False):
+        command_env = dict(self.session.get_envvars(), **(env or {}))
+        run_kw = {}
+        if command_env:
+            run_kw['env'] = get_updated_env(os.environ, command_env)
+        if with_shell and isinstance(command, str):
+            command = ["/bin/sh", "-c", command]
+        if isinstance(command, str):
+            create = partial(asyncio.create_subprocess_shell, command)
+        else:
+            create = partial(asyncio.create_subprocess_exec, *command)
+        lgr.log(5, "Running %r asynchronously", command)
+        return await create(stdout=asyncio.subprocess.PIPE,
+                            stderr=asyncio.subprocess.PIPE,
+                            cwd=cwd, **run_kw)
+
+    def _span(self, command):
+        return spans.span("execute_command", "session",
+                          resource=self.session.resource_name,
+                          command=command_as_string(command))
+
+    async def execute_command(self, command, env=None, cwd=None,
+                              with_shell=False):
+        with self._span(command) as attrs:
+            proc = await self._create_process(command, env=env, cwd=cwd,
+                                              with_shell=with_shell)
+            out, err = await proc.communicate()
+            out, err = to_unicode(out), to_unicode(err)
+            attrs.update(exit_code=proc.returncode,
+                         bytes_in=len(out) + len(err))
+        if proc.returncode:
+            msg = "Failed to run %r. Exit code=%d. out=%s err=%s" \
+                % (command, proc.returncode, out, err)
+            lgr.debug(msg)
+            raise CommandError(command_as_string(command), msg,
+                               proc.returncode, out, err)
+        return out, err
+
+    async def execute_command_streamed(self, command, callback, env=None,
+                                       cwd=None, with_shell=False):
+        nbytes = [0]
+
+        async def relay(stream, name):
+            while True:
+                line = await stream.readline()
+                if not line:
+                    break
+                nbytes[0] += len(line)
+                callback(name, to_unicode(line))
+
+        with self._span(command) as attrs:
+            proc = await self._create_process(command, env=env, cwd=cwd,
+                                              with_shell=with_shell)
+            await asyncio.gather(relay(proc.stdout, "stdout"),
+                                 relay(proc.stderr, "stderr"))
+            code = await proc.wait()
+            attrs.update(exit_code=code, bytes_in=nbytes[0])
+        return code
+
+    async def stat_many(self, paths):
+        stats = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                stats.append(None)
+                continue
+            stats.append(StatResult(os.path.isdir(path),
+                                    st.st_size, int(st.st_mtime)))
+        return stats
+
+
+def get_async_session(session):
+    """Return an AsyncSession for `session`.
+
+    Local shell sessions get a native implementation.  Any other session
+    (including SSH sessions, which use fabric) runs in a worker thread.
+
+    Parameters
+    ----------
+    session : Session
+
+    Returns
+    -------
+    AsyncSession
+    """
+    if type(session) is ShellSession:
+        return AsyncShellSession(session)
+    return SyncSessionAdapter(session)
+
+
+async def gather_bounded(coros, max_parallel=None):
+    """Like `asyncio.gather`, but run at most `max_parallel` at a time.
+
+    Exceptions are returned in place of results, as with
+    ``return_exceptions=True``.
+
+    Parameters
+    ----------
+    coros : iterable of coroutines
+    max_parallel : int, optional
+        Unlimited if not specified.
+
+    Returns
+    -------
+    list of results in the order of `coros`
+    """
+    if max_parallel:
+        semaphore = asyncio.Semaphore(max_parallel)
+
+        async def bounded(coro):
+            async with semaphore:
+                return await coro
+        coros = [bounded(c) for c in coros]
+    return await asyncio.gather(*coros, return_exceptions=True)
+
+
+def run_async(coro, max_workers=None):
+    """Run coroutine `coro` to completion in a new event loop.
+
+    This is the entry point for synchronous code, such as interfaces.
+
+    Parameters
+    ----------
+    coro : coroutine
+    max_workers : int, optional
+        Number of threads for blocking calls, such as those of the sessions
+        wrapped by `SyncSessionAdapter`.  asyncio's default pool has only a
+        few more threads than there are CPUs, which would limit how many
+        sessions are used at the same time.
+    """
+    loop = asyncio.new_event_loop()
+    executor = None
+    if max_workers:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        loop.set_default_executor(executor)
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        if hasattr(loop, "shutdown_default_executor"):  # Python 3.9+
+            loop.run_until_complete(loop.shutdown_default_executor())
+        elif executor:
+            executor.shutdown(wait=True)
+        loop.close()
@@ -79,7 +79,6 @@ class AwsCondor(Resource):
         # Create an aws_ec2 instance definition for the master node plus each worker node.
         # Node 0 is the master node.
         if not self.nodes:
-            self.nodes = []
             node_configs = []
             for i in range(self.size):
                 node_configs.append({
@@ -95,18 +94,18 @@ class AwsCondor(Resource):
                 })
         else:
             node_configs = self.nodes
-            self.nodes = []
 
         # in either case we need to populate them with secrets
         for node in node_configs:
             node['access_key_id'] = self.access_key_id
             node['secret_access_key'] = self.secret_access_key
 
-        # Create a connection for each node in the cluster.
-        for i in range(self.size):
-            node = resource_manager.factory(node_configs[i])
+        # Create all the nodes before connecting so that the state of all of
+        # them is fetched by the first connect() call.
+        self.nodes = [resource_manager.factory(node_configs[i])
+                      for i in range(self.size)]
+        for node in self.nodes:
             node.connect()
-            self.nodes.append(node)
 
     def create(self):
         """
@@ -154,37 +153,76 @@ class AwsCondor(Resource):
 
         lgr.info("Cluster %s is up and running!", self.name)
 
-        central_manager_ip = self.nodes[0]._ec2_instance.private_ip_address
-        for i, node in enumerate(self.nodes):
-            if not node._ec2_instance.public_ip_address:
-                node._ec2_instance = node._ec2_resource.Instance(node.id)
-            is_central_manager = (i == 0)
-            condor_config = Template(
-                central_manager_ip=central_manager_ip,
-                is_central_manager=is_central_manager,
-                worker_nodes=self.nodes[1:]
-            ).render_cluster("condor_config.local.template")
-            session = node.get_session()
-            session.execute_command(["sudo", "chmod", "0777", "/etc/condor/config.d"])
-            session.put_text(condor_config, "/etc/condor/config.d/00-nitrcce-cluster")
-            session.execute_command(["sudo", "rm", "/etc/condor/config.d/00-minicondor"])
-            session.execute_command(["sudo", "systemctl", "restart", "condor"])
-            nfs_file = "/home/{}/bin/nfs-mount-{}.sh".format(self.user, "server" if is_central_manager else "client")
-            # we need to establish shared ~/.reproman to have datasets we operate on
-            # accessible across nodes by default
-            session.execute_command([
-                "bash",
-                "-c",
-                "echo -e '\nmkdir -p ~/nfs-shared/.reproman " +
-                    ("&& chown {} ~/nfs-shared/.reproman ".format(self.user) if is_central_manager else '') +
-                    "&& ln -s ~/nfs-shared/.reproman ~/.reproman' >> '{}'".format(nfs_file)
-            ])
-            session.execute_command(["sudo", nfs_file, central_manager_ip])
+        self._configure_nodes()
 
         yield {
             'status': "Running"
         }
 
+    def _configure_nodes(self):
+        """Configure all the nodes of the cluster.
+        """
+        central_manager_ip = self.nodes[0]._ec2_instance.private_ip_address
+        # The central manager serves the NFS share that the other nodes
+        # mount, so it has to be configured first.  The others are
+        # independent of each other.
+        self._configure_node(self.nodes[0], central_manager_ip, True)
+        workers = self.nodes[1:]
+        if workers:
+            with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=len(workers)) as executor:
+                list(executor.map(
+                    lambda node: self._configure_node(
+                        node, central_manager_ip, False),
+                    workers))
+        lgr.info("Cluster %s is configured", self.name)
+
+    def _configure_node(self, node, central_manager_ip, is_central_manager):
+        """Configure HTCondor and the NFS share on `node`.
+
+        All the commands run as a single script so that a node costs one
+        round trip regardless of the number of steps.
+        """
+        if not node._ec2_instance.public_ip_address:
+            node._ec2_instance = node._ec2_resource.Instance(node.id)
+        condor_config = Template(
+            central_manager_ip=central_manager_ip,
+            is_central_manager=is_central_manager,
+            worker_nodes=self.nodes[1:]
+        ).render_cluster("condor_config.local.template")
+        lgr.debug("Configuring node %s", node.name)
+        node.get_session().execute_command(
+            ["bash", "-c",
+             self._get_node_script(condor_config, central_manager_ip,
+                                   is_central_manager)])
+
+    def _get_node_script(self, condor_config, central_manager_ip,
+                         is_central_manager):
+        """Return the shell script that configures a node.
+        """
+        config_dir = "/etc/condor/config.d"
+        nfs_file = "/home/{}/bin/nfs-mount-{}.sh".format(
+            self.user, "server" if is_central_manager else "client")
+        # we need to establish shared ~/.reproman to have datasets we operate on
+        # accessible across nodes by default
+        nfs_setup = (
+            "mkdir -p ~/nfs-shared/.reproman " +
+            ("&& chown {} ~/nfs-shared/.reproman ".format(self.user)
+             if is_central_manager else '') +
+            "&& ln -s ~/nfs-shared/.reproman ~/.reproman")
+        eof = "REPROMAN_CONDOR_CONFIG_EOF"
+        return "\n".join([
+            "set -e",
+            "sudo chmod 0777 {}".format(config_dir),
+            "cat > {}/00-nitrcce-cluster <<'{}'".format(config_dir, eof),
+            condor_config.rstrip("\n"),
+            eof,
+            "sudo rm {}/00-minicondor".format(config_dir),
+            "sudo systemctl restart condor",
+            "echo -e '\\n{}' >> '{}'".format(nfs_setup, nfs_file),
+            "sudo {} {}".format(nfs_file, central_manager_ip),
+        ]) + "\n"
+
     def delete(self):
         """
         Terminate all the EC2 instances in the cluster.
@@ -9,10 +9,13 @@
 
 import attr
 import boto3
+from collections import Counter
+from collections import defaultdict
 import os
 import os.path as op
 import re
 import threading
+import time
 
 from os import chmod
 from os.path import join
@@ -27,9 +30,151 @@ from .base import Resource
 from ..ui import ui
 from ..utils import assure_dir, attrib
 from ..dochelpers import exc_str
+from ..support import spans
 from ..support.exceptions import ResourceError
 from .ssh import SSH
 
+# Number of EC2 connections made and API calls issued by this process, keyed
+# by "connections" or the API call name.  Tests (and curious users) can
+# inspect it to verify that the number of calls does not grow with the number
+# of resources.
+api_calls = Counter()
+
+# Maximum number of instance IDs passed in a single describe_instances filter.
+_DESCRIBE_BATCH_SIZE = 200
+
+
+class InstanceStateCache(object):
+    """Short-lived cache of EC2 instances shared by all AWS resources.
+
+    Looking up an instance fetches, with one describe_instances call, all the
+    registered instances of the same account and region whose information is
+    missing or older than `ttl`.  So when many AWS resources (e.g., the nodes
+    of an AwsCondor cluster or the resources listed by `reproman ls`) are
+    connected, they are served by a single call rather than one call each.
+
+    Parameters
+    ----------
+    ttl : float, optional
+        Number of seconds for which fetched information is used.
+    """
+
+    def __init__(self, ttl=10):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # key => lock held while fetching instances for key
+        self._key_locks = {}
+        # key => boto3 EC2 service resource
+        self._ec2 = {}
+        # key => set of instance IDs to include in the next fetch
+        self._wanted = defaultdict(set)
+        # (key, instance ID) => (time fetched, boto3 Instance or None)
+        self._instances = {}
+
+    @staticmethod
+    def get_key(access_key_id, secret_access_key, region_name):
+        return access_key_id, secret_access_key, region_name
+
+    def get_ec2_resource(self, key):
+        """Return the shared boto3 EC2 resource for `key`.
+        """
+        with self._lock:
+            if key not in self._ec2:
+                access_key_id, secret_access_key, region_name = key
+                api_calls["connections"] += 1
+                self._ec2[key] = boto3.resource(
+                    'ec2',
+                    aws_access_key_id=access_key_id,
+                    aws_secret_access_key=secret_access_key,
+                    region_name=region_name
+                )
+                self._key_locks[key] = threading.Lock()
+            return self._ec2[key]
+
+    def register(self, key, instance_id):
+        """Include `instance_id` in the next fetch for `key`.
+        """
+        with self._lock:
+            self._wanted[key].add(instance_id)
+
+    def invalidate(self, key, instance_id):
+        """Forget the information about `instance_id` (e.g., after starting
+        or stopping it).
+        """
+        with self._lock:
+            self._instances.pop((key, instance_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._key_locks.clear()
+            self._ec2.clear()
+            self._wanted.clear()
+            self._instances.clear()
+
+    def _fresh(self, key, instance_id, now):
+        cached = self._instances.get((key, instance_id))
+        return cached is not None and now - cached[0] < self.ttl
+
+    def get_instance(self, key, instance_id):
+        """Return the boto3 Instance `instance_id`, or None if it does not
+        exist.
+
+        Its attributes (e.g., `state`) are already loaded.
+        """
+        ec2 = self.get_ec2_resource(key)
+        # Concurrent lookups for the same key wait for a running fetch, which
+        # likely includes their instance, instead of issuing their own.
+        with self._key_locks[key]:
+            with self._lock:
+                now = time.time()
+                if self._fresh(key, instance_id, now):
+                    return self._instances[(key, instance_id)][1]
+                ids = sorted(
+                    {instance_id} |
+                    {i for i in self._wanted[key]
+                     if not self._fresh(key, i, now)})
+            fetched = self._describe(ec2, ids)
+            with self._lock:
+                now = time.time()
+                for i in ids:
+                    self._instances[(key, i)] = (now, fetched.get(i))
+            return fetched.get(instance_id)
+
+    @staticmethod
+    def _describe(ec2, ids):
+        """Return a dict mapping the existing instances of `ids` to boto3
+        Instance objects.
+        """
+        paginator = ec2.meta.client.get_paginator('describe_instances')
+        instances = {}
+        for start in range(0, len(ids), _DESCRIBE_BATCH_SIZE):
+            chunk = ids[start:start + _DESCRIBE_BATCH_SIZE]
+            with spans.span("describe_instances", "aws",
+                            instances=len(chunk)):
+                # A filter, unlike InstanceIds, does not fail the whole call
+                # if one of the instances no longer exists.
+                for page in paginator.paginate(
+                        Filters=[{'Name': 'instance-id', 'Values': chunk}]):
+                    api_calls["describe_instances"] += 1
+                    for reservation in page['Reservations']:
+                        for data in reservation['Instances']:
+                            instance = ec2.Instance(data['InstanceId'])
+                            # Prevent boto3 from loading it again.
+                            instance.meta.data = data
+                            instances[data['InstanceId']] = instance
+        lgr.debug("Described %d EC2 instances, %d found",
+                  len(ids), len(instances))
+        return instances
+
+
+_state_cache = InstanceStateCache()
+
+
+def clear_state_cache():
+    """Drop the cached clients and instance states.
+    """
+    _state_cache.clear()
+
 
 class AwsKeyMixin(object):
     """A mixin class to provide keys handling for both AwsEc2 or AwsCondor"""
@@ -199,12 +344,22 @@ class AwsEc2(Resource, AwsKeyMixin):
     _ec2_resource = attrib()
     _ec2_instance = attrib()
 
+    def __attrs_post_init__(self):
+        if self.id:
+            # Let the first connect() of any AWS resource fetch this one too.
+            _state_cache.register(self._state_key, self.id)
+
     @property
     def ec2_name(self):
         if self.name:
             return 'reproman-' + self.name
         return self.name
 
+    @property
+    def _state_key(self):
+        return InstanceStateCache.get_key(
+            self.access_key_id, self.secret_access_key, self.region_name)
+
     def connect(self):
         """
         Open a connection to the environment resource.
@@ -213,16 +368,14 @@ class AwsEc2(Resource, AwsKeyMixin):
         just sets .id and .status to None
         """
 
-        self._ec2_resource = boto3.resource(
-            'ec2',
-            aws_access_key_id=self.access_key_id,
-            aws_secret_access_key=self.secret_access_key,
-            region_name=self.region_name
-        )
+        self._ec2_resource = _state_cache.get_ec2_resource(self._state_key)
         instances = []
         if self.id:
-            instances.append(self._ec2_resource.Instance(self.id))
+            instance = _state_cache.get_instance(self._state_key, self.id)
+            if instance is not None:
+                instances.append(instance)
         elif self.name:
+            api_calls["describe_instances"] += 1
             instances = self._ec2_resource.instances.filter(
                 Filters=[{
                         'Name': 'tag:Name',
@@ -373,18 +526,21 @@ class AwsEc2(Resource, AwsKeyMixin):
         Terminate this EC2 instance in the AWS subscription.
         """
         self._ec2_instance.terminate()
+        _state_cache.invalidate(self._state_key, self.id)
 
     def start(self):
         """
         Start this EC2 instance in the AWS subscription.
         """
         self._ec2_instance.start()
+        _state_cache.invalidate(self._state_key, self.id)
 
     def stop(self):
         """
         Stop this EC2 instance in the AWS subscription.
         """
         self._ec2_instance.stop()
+        _state_cache.invalidate(self._state_key, self.id)
 
     def get_session(self, pty=False, shared=None):
         """
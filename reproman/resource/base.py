@@ -8,21 +8,26 @@
 """Classes to manage compute resources."""
 
 import attr
-from importlib import import_module
+from itertools import groupby
 import abc
 from configparser import NoSectionError
+import fnmatch
 
 import yaml
-from glob import glob
 import os
 import os.path as op
+import re
 
 from ..dochelpers import exc_str
+from ..support.exceptions import CommandError
 from ..support.exceptions import ResourceError
 from ..support.exceptions import ResourceNotFoundError
 from ..support.exceptions import ResourceAlreadyExistsError
 from ..support.exceptions import MultipleResourceMatches
 from ..support.exceptions import MissingConfigError
+from ..support import plugins
+from .inventory import SQLITE_SUFFIXES
+from .inventory import SQLiteInventory
 
 
 import logging
@@ -30,60 +35,58 @@ lgr = logging.getLogger('reproman.resource.base')
 
 
 def discover_types():
-    """Discover resource types by inspecting the resource directory files.
+    """Discover resource types registered with the plugin registry.
 
     Returns
     -------
     string list
-        List of resource identifiers extracted from file names.
+        List of resource identifiers.
     """
-    l = []
-    for f in glob(op.join(op.dirname(__file__), '*.py')):
-        f_ = op.basename(f)
-        if f_ in ('base.py',) or f_.startswith('_'):
-            continue
-        l.append(f_[:-3].replace('_', '-'))
-    return sorted(l)
+    return sorted(plugins.get_plugins(plugins.RESOURCES))
 
 
 def get_resource_class(name):
-    if '_' in name:
+    """Return the resource class registered as `name`.
+
+    The class is imported on first use.
+
+    Raises
+    ------
+    ResourceError if `name` is not registered or the class cannot be
+    imported.
+    """
+    import difflib
+    try:
         known = discover_types()
+    except Exception as exc:
+        raise ResourceError(
+            "Failed to import resource: {}.  "
+            "Failed to discover resource types: {}".format(name, exc_str(exc)))
+
+    if name not in known:
         hyph_name = name.replace('_', '-')
-        if name not in known and hyph_name in known:
+        if hyph_name in known:
             raise ResourceError(
                 "'{}' not a known backend. Did you mean '{}'?"
                 .format(name, hyph_name))
-    module_name = name.replace('-', '_')
-    try:
-        module = import_module('reproman.resource.{}'.format(module_name))
-    except Exception as exc:
-        # Typically it should be an ImportError, but let's catch and recast
-        # anything just in case.
-        import difflib
-        try:
-            msg = exc_str(exc)
-            known = discover_types()
-            suggestions = difflib.get_close_matches(name, known)
-            if module_name not in known:
-                msg += (
-                    ". {}: {}"
-                    .format("Similar backends" if suggestions else "Known backends",
-                            ', '.join(suggestions or known)))
-        except Exception as exc2:
-            msg += ".  Failed to discover resource types: " + exc_str(exc2)
+        suggestions = difflib.get_close_matches(name, known)
         raise ResourceError(
-            "Failed to import resource: {}".format(msg)
-        )
+            "Failed to import resource: unknown resource type '{}'. {}: {}"
+            .format(name,
+                    "Similar backends" if suggestions else "Known backends",
+                    ', '.join(suggestions or known)))
 
-    class_name = ''.join([token.capitalize() for token in name.split('-')])
     try:
-        cls = getattr(module, class_name)
+        return plugins.load_plugin(plugins.RESOURCES, name)
     except AttributeError as exc:
         raise ResourceError(
-            "Failed to find {} in {}: {}"
-            .format(class_name, module, exc_str(exc)))
-    return cls
+            "Failed to find resource class for {}: {}"
+            .format(name, exc_str(exc)))
+    except Exception as exc:
+        # Typically it should be an ImportError, but let's catch and recast
+        # anything just in case.
+        raise ResourceError(
+            "Failed to import resource: {}".format(exc_str(exc)))
 
 
 def get_required_fields(cls):
@@ -287,28 +290,29 @@ class ResourceManager(object):
         return instance
 
     def _find_resources(self, resref, resref_type):
-        def match_name(inventory_item):
-            return resref == inventory_item[0]
-
-        def match_id(inventory_item):
-            return resref == inventory_item[1].get("id")
-
-        def match_id_partial(inventory_item):
-            return inventory_item[1].get("id", "").startswith(resref)
-
-        def filter_inventory(pred):
-            return list(filter(pred, self.inventory.items()))
+        def filter_inventory(column, prefix=False):
+            if isinstance(self.inventory, SQLiteInventory):
+                # Use indexed queries instead of scanning the inventory.
+                return self.inventory.find(column, resref, prefix=prefix)
+
+            def match(inventory_item):
+                name, config = inventory_item
+                value = name if column == "name" else config.get(column)
+                if prefix:
+                    return (value or "").startswith(resref)
+                return resref == value
+            return list(filter(match, self.inventory.items()))
 
         results_name = None
         results_id = None
         partial_id = False
         if resref_type in ["auto", "name"]:
-            results_name = filter_inventory(match_name)
+            results_name = filter_inventory("name")
         if resref_type in ["auto", "id"]:
-            results_id = filter_inventory(match_id)
+            results_id = filter_inventory("id")
             if not results_id:
                 partial_id = True
-                results_id = filter_inventory(match_id_partial)
+                results_id = filter_inventory("id", prefix=True)
         return results_name, results_id, partial_id
 
     def _get_resource_config(self, resref, resref_type="auto"):
@@ -365,6 +369,37 @@ class ResourceManager(object):
         return self.factory(self._get_resource_config(resref, resref_type),
                             strict=False)
 
+    def get_resources(self, resrefs, resref_type="auto"):
+        """Return the resource instances for `resrefs`.
+
+        Parameters
+        ----------
+        resrefs : list of str
+            Each item is either a name or ID as accepted by `get_resource` or
+            a shell-style wildcard pattern (e.g., "node-*") that is matched
+            against resource names.
+        resref_type : {'auto', 'name', 'id'}, optional
+            See `get_resource`.  It applies only to items that are not
+            patterns.
+
+        Returns
+        -------
+        A list of Resource objects, without duplicates, in the order in which
+        they are referenced.
+        """
+        names = []
+        for resref in resrefs:
+            if re.search(r"[*?[]", resref):
+                matches = fnmatch.filter(sorted(self.inventory), resref)
+                if not matches:
+                    raise ResourceNotFoundError(
+                        "No resource name matches {}".format(resref))
+            else:
+                matches = [self._get_resource_config(
+                    resref, resref_type)["name"]]
+            names.extend(n for n in matches if n not in names)
+        return [self.get_resource(name, "name") for name in names]
+
     def _get_inventory(self):
         """Return a dict with the config information for all resources.
 
@@ -380,7 +415,14 @@ class ResourceManager(object):
                 "No resource inventory path is known to %s" % self
             )
 
-        if not op.isfile(inventory_path):
+        if inventory_path.endswith(SQLITE_SUFFIXES):
+            is_new = not op.exists(inventory_path)
+            inventory = SQLiteInventory(inventory_path)
+            yaml_path = op.splitext(inventory_path)[0] + ".yml"
+            if is_new and op.isfile(yaml_path):
+                # Start from the YAML inventory that was used so far.
+                inventory.import_yaml(yaml_path)
+        elif not op.isfile(inventory_path):
             inventory = {}
         else:
             with open(inventory_path, 'r') as fp:
@@ -388,9 +430,31 @@ class ResourceManager(object):
 
         return inventory
 
+    @staticmethod
+    def _prepare_inventory_item(inventory_item):
+        """Return `inventory_item` as it should be saved.
+
+        None is returned if the item should not be saved.
+        """
+        # A resource without an ID has been deleted.
+        if 'id' in inventory_item and not inventory_item['id']:
+            return None
+        # Remove AWS credentials
+        # TODO(yoh): split away handling of credentials.  Resource should
+        # probably just provide some kind of an id for a credential which
+        # should be stored in a safe credentials storage
+        for secret_key in ResourceManager.SECRET_KEYS:
+            if secret_key in inventory_item:
+                del inventory_item[secret_key]
+        return inventory_item
+
     def save_inventory(self):
         """Save the resource inventory.
         """
+        if isinstance(getattr(self, "inventory", None), SQLiteInventory):
+            self.inventory.save(self._prepare_inventory_item)
+            return
+
         # Operate on a copy so there is no side-effect of modifying original
         # inventory.
         #
@@ -398,20 +462,9 @@ class ResourceManager(object):
         inventory = self.inventory.copy() if hasattr(self, "inventory") else {}
 
         for key in list(inventory):  # go through a copy of all keys since we modify
-
-            # A resource without an ID has been deleted.
-            inventory_item = inventory[key]
-            if 'id' in inventory_item and not inventory_item['id']:
+            if self._prepare_inventory_item(inventory[key]) is None:
                 del inventory[key]
 
-            # Remove AWS credentials
-            # TODO(yoh): split away handling of credentials.  Resource should
-            # probably just provide some kind of an id for a credential which
-            # should be stored in a safe credentials storage
-            for secret_key in ResourceManager.SECRET_KEYS:
-                if secret_key in inventory_item:
-                    del inventory_item[secret_key]
-
         if not op.exists(op.dirname(self._inventory_path)):
             os.makedirs(op.dirname(self._inventory_path))
 
@@ -535,9 +588,22 @@ class Resource(object, metaclass=abc.ABCMeta):
         """
         if not session:
             session = self.get_session(pty=False)
-        for command in self._command_buffer:
-            lgr.debug("Running command '%s'", command['command'])
-            session.execute_command(command['command'], env=command['env'])
+        # Consecutive commands sharing the same environment are sent to the
+        # session as a single batch.
+        for env, group in groupby(self._command_buffer,
+                                  key=lambda c: c['env']):
+            commands = [c['command'] for c in group]
+            for command in commands:
+                lgr.debug("Running command '%s'", command)
+            results = session.execute_many(commands, env=env,
+                                           stop_on_error=True)
+            out, err, code = results[-1]
+            if code:
+                raise CommandError(
+                    str(commands[len(results) - 1]),
+                    "Failed to run command. Exit code=%d. out=%s err=%s"
+                    % (code, out, err),
+                    code, out, err)
 
     def set_envvar(self, var, value):
         """Save an environment variable for inclusion in the environment
@@ -605,3 +671,11 @@ class Resource(object, metaclass=abc.ABCMeta):
             Shared session identifier (the default is None)
         """
         return
+
+    def get_async_session(self, pty=False, shared=None):
+        """Returns an AsyncSession object for this resource.
+
+        Parameters are the same as for `get_session`.
+        """
+        from .async_session import get_async_session
+        return get_async_session(self.get_session(pty=pty, shared=shared))
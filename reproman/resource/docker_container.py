@@ -10,13 +10,16 @@
 import attr
 import docker
 import dockerpty
+from functools import partial
 import io
 import json
 import os
+import re
 import tarfile
+import threading
 
 from .. import utils
-from ..cmd import Runner
+from ..support import spans
 from ..support.exceptions import CommandError, ResourceError
 from ..dochelpers import (
     borrowdoc,
@@ -40,6 +43,137 @@ def _image_latest_default(image):
     return image
 
 
+def _tar_stream(src_path, arcname, chunk_size=io.DEFAULT_BUFFER_SIZE * 64):
+    """Yield a tar archive of `src_path` in chunks.
+
+    The archive is written by a separate thread into a pipe, so only about
+    `chunk_size` bytes are held in memory at a time regardless of the size of
+    `src_path`.
+
+    Parameters
+    ----------
+    src_path : str
+        Local file or directory to archive.
+    arcname : str
+        Name to give `src_path` within the archive.
+    chunk_size : int, optional
+        Maximum number of bytes in each yielded chunk.
+
+    Yields
+    ------
+    bytes
+    """
+    read_fd, write_fd = os.pipe()
+    errors = []
+
+    def produce():
+        try:
+            with os.fdopen(write_fd, 'wb') as wfh:
+                with tarfile.open(fileobj=wfh, mode='w|') as tar:
+                    tar.add(src_path, arcname=arcname)
+        except Exception as exc:
+            # A BrokenPipeError is expected if the consumer stopped reading.
+            errors.append(exc)
+
+    producer = threading.Thread(target=produce, name="reproman-tar-stream")
+    producer.daemon = True
+    producer.start()
+    with os.fdopen(read_fd, 'rb') as rfh:
+        for chunk in iter(partial(rfh.read, chunk_size), b''):
+            yield chunk
+    producer.join()
+    if errors:
+        raise errors[0]
+
+
+# Engine URL => docker.APIClient shared by all resources and sessions using
+# that engine.
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(base_url=None):
+    """Return the shared client for the Docker engine at `base_url`.
+
+    Creating a client is not free (it reads the Docker configuration and
+    sets up a connection pool), and a single ReproMan command might look up
+    many containers on the same engine.
+
+    Parameters
+    ----------
+    base_url : str, optional
+        URL or socket where Docker engine is listening.  If not specified,
+        the engine is configured from the environment (DOCKER_HOST,
+        DOCKER_TLS_VERIFY, and DOCKER_CERT_PATH), like the docker CLI does.
+
+    Returns
+    -------
+    docker.APIClient
+    """
+    with _clients_lock:
+        client = _clients.get(base_url)
+        if client is None:
+            if base_url is None:
+                kwargs = docker.utils.kwargs_from_env()
+            else:
+                kwargs = {"base_url": base_url}
+            client = _clients[base_url] = docker.APIClient(**kwargs)
+        return client
+
+
+def clear_clients():
+    """Drop the shared clients so that new ones are created on next use.
+    """
+    with _clients_lock:
+        _clients.clear()
+
+
+def find_containers(client, name=None, id=None, running=False):
+    """Return the containers matching `name` and `id`.
+
+    The matching is done by the engine so that only the matching containers
+    are transferred, which matters on hosts with many (exited) containers.
+
+    Parameters
+    ----------
+    client : docker.APIClient
+    name : str, optional
+        Exact name of the container.
+    id : str, optional
+        ID, or a prefix of it, of the container.
+    running : bool, optional
+        Whether to consider only running containers.
+
+    Returns
+    -------
+    list of container dicts as returned by docker.APIClient.containers()
+    """
+    assert id or name, "Container name or id must be known"
+    filters = {}
+    if id:
+        filters['id'] = id
+    if name:
+        # The name filter is an unanchored regular expression matched against
+        # names with a leading slash.
+        filters['name'] = '^/{}$'.format(re.escape(name))
+    if running:
+        filters['status'] = 'running'
+
+    containers = []
+    for container in client.containers(all=not running, filters=filters):
+        # The engine should have done this already, but double check because
+        # its filter semantics (e.g., for partial IDs) has varied.
+        if id and not container.get('Id').startswith(id):
+            lgr.log(5, "Container %s does not match by id: %s", container, id)
+            continue
+        if name and ('/' + name) not in container.get('Names'):
+            lgr.log(5, "Container %s does not match by name: %s",
+                    container, name)
+            continue
+        containers.append(container)
+    return containers
+
+
 @attr.s
 class DockerContainer(Resource):
     """
@@ -83,8 +217,7 @@ class DockerContainer(Resource):
         """
         from requests.exceptions import ConnectionError
         try:
-            session = docker.APIClient(base_url=base_url)
-            session.info()
+            get_client(base_url).info()
         except docker.errors.InvalidConfigFile as exc:
             lgr.error(
                 "Failed to query Docker due to problem with configuration "
@@ -98,45 +231,28 @@ class DockerContainer(Resource):
         return True
 
     @staticmethod
-    def is_container_running(container_name):
+    def is_container_running(container_name, base_url=None):
         """Ping the local environment to see if given container is running.
 
         Parameters
         ----------
         container_name : string
+        base_url : str, optional
+            URL or socket where Docker engine is listening
 
         Returns
         -------
         boolean
         """
-        stdout, _ = Runner().run(['docker', 'ps', '--quiet', '--filter',
-            'name=^/{}$'.format(container_name)])
-        if stdout.strip():
-            return True
-        return False
+        return bool(find_containers(get_client(base_url),
+                                    name=container_name, running=True))
 
     def connect(self):
         """
         Open a connection to the environment.
         """
-        # Open a client connection to the Docker engine.
-        self._client = docker.APIClient(base_url=self.engine_url)
-
-        containers = []
-        for container in self._client.containers(all=True):
-            assert self.id or self.name,\
-                "Container name or id must be known"
-            if self.id and not container.get('Id').startswith(self.id):
-                lgr.log(5, "Container %s does not match by id: %s", container,
-                        self.id)
-                continue
-            if self.name and ('/' + self.name) \
-                    not in container.get('Names'):
-                lgr.log(5, "Container %s does not match by name: %s", container,
-                        self.name)
-                continue
-            # TODO: make above more robust and centralize across different resources/backends?
-            containers.append(container)
+        self._client = get_client(self.engine_url)
+        containers = find_containers(self._client, name=self.name, id=self.id)
         if len(containers) == 1:
             self._container = containers[0]
             self.id = self._container.get('Id')
@@ -223,10 +339,12 @@ class DockerContainer(Resource):
 
         if pty and shared is not None and not shared:
             lgr.warning("Cannot do non-shared pty session for docker yet")
-        return (PTYDockerSession if pty else DockerSession)(
+        session = (PTYDockerSession if pty else DockerSession)(
             client=self._client,
             container=self._container
         )
+        session.resource_name = self.name
+        return session
 
 
 @attr.s
@@ -234,6 +352,13 @@ class DockerSession(POSIXSession):
     client = attrib(default=attr.NOTHING)
     container = attrib(default=attr.NOTHING)
 
+    @property
+    def _environ_cmd_key(self):
+        try:
+            return "docker:" + self.container['Id']
+        except (KeyError, TypeError):
+            return None
+
     @borrowdoc(Session)
     def _execute_command(self, command, env=None, cwd=None, with_shell=True):
         command = self._prefix_command(utils.command_as_string(command),
@@ -242,51 +367,57 @@ class DockerSession(POSIXSession):
         # The following call may throw the following exception:
         #    docker.errors.APIError - If the server returns an error.
         lgr.debug('Running command %r', command)
-        out = []
         execute = self.client.exec_create(container=self.container, cmd=command)
-        out = ''
-        for i, line in enumerate(
-                self.client.exec_start(exec_id=execute['Id'],
-                stream=True)
-        ):
-            if line.startswith(b'rpc error'):
-                raise CommandError(cmd=command, msg="Docker error - %s" % line)
-            out += utils.to_unicode(line, "utf-8")
-            lgr.debug("exec#%i: %s", i, line.rstrip())
+        # Accumulate raw chunks and decode once at the end: repeated string
+        # concatenation is quadratic for large outputs.
+        out_chunks, err_chunks = [], []
+        for out_chunk, err_chunk in self.client.exec_start(
+                exec_id=execute['Id'], stream=True, demux=True):
+            for chunk in (out_chunk, err_chunk):
+                if chunk and chunk.startswith(b'rpc error'):
+                    raise CommandError(cmd=command,
+                                       msg="Docker error - %s" % chunk)
+            if out_chunk:
+                out_chunks.append(out_chunk)
+            if err_chunk:
+                err_chunks.append(err_chunk)
+        out = utils.to_unicode(b''.join(out_chunks), "utf-8")
+        err = utils.to_unicode(b''.join(err_chunks), "utf-8")
+        lgr.log(5, "exec of %r produced %d bytes of stdout and %d of stderr",
+                command, len(out), len(err))
 
         exit_code = self.client.exec_inspect(execute['Id'])['ExitCode']
         if exit_code not in [0, None]:
             msg = "Failed to run %r. Exit code=%d. out=%s err=%s" \
-                % (command, exit_code, out, out)
-            raise CommandError(str(command), msg, exit_code, '', out)
+                % (command, exit_code, out, err)
+            raise CommandError(str(command), msg, exit_code, out, err)
         else:
             lgr.log(8, "Finished running %r with status %s", command,
                 exit_code)
 
-        return (out, '')
+        return (out, err)
 
     # XXX should we start/stop on open/close or just assume that it is running already?
 
 
     @borrowdoc(Session)
+    @spans.traced_transfer
     def put(self, src_path, dest_path, uid=-1, gid=-1):
         # To copy one or more files to the container, the API recommends
         # to do so with a tar archive. http://docker-py.readthedocs.io/en/1.5.0/api/#copy
         dest_path = self._prepare_dest_path(src_path, dest_path,
                                             local=False, absolute_only=True)
         dest_dir, dest_basename = os.path.split(dest_path)
-        tar_stream = io.BytesIO()
-        tar_file = tarfile.TarFile(fileobj=tar_stream, mode='w')
-        tar_file.add(src_path, arcname=dest_basename)
-        tar_file.close()
-        tar_stream.seek(0)
+        # Feed the archive to the engine chunk by chunk so that memory use
+        # does not depend on the size of src_path.
         self.client.put_archive(container=self.container['Id'], path=dest_dir,
-            data=tar_stream)
+            data=_tar_stream(src_path, dest_basename))
 
         if uid > -1 or gid > -1:
             self.chown(dest_path, uid, gid)
 
     @borrowdoc(Session)
+    @spans.traced_transfer
     def get(self, src_path, dest_path=None, uid=-1, gid=-1):
         src_dir, src_basename = os.path.split(src_path)
         dest_path = self._prepare_dest_path(src_path, dest_path)
@@ -0,0 +1,299 @@
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the reproman package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""SQLite-backed resource inventory.
+
+The default inventory is a YAML file that is read completely by every
+ReproMan process and rewritten completely on save.  If the configured
+inventory file ends with ".db" or ".sqlite", `SQLiteInventory` is used
+instead.  It stores one row per resource, looks up resources by name and ID
+via indexes, and writes only the rows that changed in a single transaction,
+so that concurrent processes do not overwrite each other's updates.  If two
+processes change the same resource, their changes are merged key by key, or
+the second save fails if they changed the same key.
+"""
+
+from collections.abc import MutableMapping
+import json
+import logging
+import os
+import os.path as op
+import sqlite3
+
+import yaml
+
+from reproman.support.exceptions import ResourceError
+
+lgr = logging.getLogger('reproman.resource.inventory')
+
+SQLITE_SUFFIXES = (".db", ".sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS resources (
+    name TEXT PRIMARY KEY,
+    id TEXT,
+    type TEXT,
+    config TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS resources_id ON resources (id);
+CREATE INDEX IF NOT EXISTS resources_type ON resources (type);
+"""
+
+
+def _dumps(config):
+    return json.dumps(config, sort_keys=True)
+
+
+def _loads(text):
+    return None if text is None else json.loads(text)
+
+
+_CONFLICT = object()
+_MISSING = object()
+
+
+def _merge(base, ours, theirs):
+    """Merge the configurations `ours` and `theirs` that both derive from
+    `base`.
+
+    Any of the configurations may be None if the resource doesn't exist.
+
+    Returns
+    -------
+    The merged configuration, None if the resource should be removed, or
+    _CONFLICT if both changed the same key (or one removed the resource that
+    the other changed).
+    """
+    if ours is None or theirs is None or base is None:
+        # Unless both sides agree, a removal or creation can't be merged.
+        return ours if ours == theirs else _CONFLICT
+    merged = dict(theirs)
+    for key in set(base) | set(ours):
+        value = ours.get(key, _MISSING)
+        if base.get(key, _MISSING) == value:
+            continue
+        if theirs.get(key, _MISSING) not in [base.get(key, _MISSING),
+                                             value]:
+            return _CONFLICT
+        if value is _MISSING:
+            merged.pop(key, None)
+        else:
+            merged[key] = value
+    return merged
+
+
+class SQLiteInventory(MutableMapping):
+    """Mapping of resource names to configurations stored in SQLite.
+
+    Configurations are loaded on access.  Changes, including in-place
+    modifications of loaded configurations, are written by `save`.
+
+    Parameters
+    ----------
+    path : str
+        Path of the database file.  It is created if needed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if not op.exists(op.dirname(path)):
+            os.makedirs(op.dirname(path))
+        self._conn = sqlite3.connect(path, timeout=60)
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+        # name => (config, JSON of config as loaded or None if new)
+        self._loaded = {}
+        self._deleted = set()
+
+    def _load(self, rows):
+        """Register configurations from (name, config JSON) `rows`.
+        """
+        for name, text in rows:
+            if name not in self._loaded and name not in self._deleted:
+                self._loaded[name] = (json.loads(text), text)
+
+    def __getitem__(self, name):
+        if name not in self._loaded:
+            self._load(self._conn.execute(
+                "SELECT name, config FROM resources WHERE name = ?", (name,)))
+        if name not in self._loaded or name in self._deleted:
+            raise KeyError(name)
+        return self._loaded[name][0]
+
+    def __setitem__(self, name, config):
+        self._deleted.discard(name)
+        loaded = self._loaded.get(name)
+        if loaded is None:
+            row = self._conn.execute(
+                "SELECT config FROM resources WHERE name = ?",
+                (name,)).fetchone()
+            loaded = (None, row[0] if row else None)
+        self._loaded[name] = (config, loaded[1])
+
+    def __delitem__(self, name):
+        self[name]  # Raise KeyError if unknown.
+        self._deleted.add(name)
+
+    def _names(self):
+        names = [n for n, in self._conn.execute(
+            "SELECT name FROM resources ORDER BY name")
+            if n not in self._deleted]
+        new = [n for n, (_, text) in self._loaded.items()
+               if text is None and n not in self._deleted]
+        return names + sorted(set(new) - set(names))
+
+    def __iter__(self):
+        return iter(self._names())
+
+    def __len__(self):
+        return len(self._names())
+
+    def find(self, column, value, prefix=False):
+        """Return (name, config) items with `column` matching `value`.
+
+        Parameters
+        ----------
+        column : {'name', 'id', 'type'}
+        value : str
+        prefix : bool, optional
+            Match values starting with `value` rather than equal to it.
+        """
+        if column not in ["name", "id", "type"]:
+            raise ValueError("Unknown column: {}".format(column))
+        if prefix:
+            # A range rather than LIKE so that the index is used.
+            rows = self._conn.execute(
+                "SELECT name, config FROM resources "
+                "WHERE {0} >= ? AND {0} < ?".format(column),
+                (value, value + "\U0010ffff"))
+        else:
+            rows = self._conn.execute(
+                "SELECT name, config FROM resources "
+                "WHERE {} = ?".format(column), (value,))
+        self._load(rows)
+        # Go through the loaded configurations to take unsaved changes into
+        # account.
+        items = []
+        for name, (config, _) in sorted(self._loaded.items()):
+            if name in self._deleted:
+                continue
+            if column == "name":
+                actual = name
+            else:
+                actual = config.get(column)
+            if not isinstance(actual, str):
+                matched = False
+            elif prefix:
+                matched = actual.startswith(value)
+            else:
+                matched = actual == value
+            if matched:
+                items.append((name, config))
+        return items
+
+    def save(self, prepare=None):
+        """Write changed configurations in a single transaction.
+
+        A row is only written if it still has the content it had when it was
+        loaded.  If another process changed it in the meantime, the changes
+        are merged key by key.
+
+        Parameters
+        ----------
+        prepare : callable, optional
+            Called with each changed configuration before it is written.  It
+            should return the configuration to store or None if the resource
+            should be removed.
+
+        Raises
+        ------
+        ResourceError if another process changed or removed a resource, and
+        the changes can't be merged.  Nothing is written in that case.
+        """
+        changes = []
+        for name, (config, text) in self._loaded.items():
+            if name in self._deleted:
+                changes.append((name, None, text))
+            elif _dumps(config) != text:
+                if prepare:
+                    config = prepare(config)
+                changes.append((name, config, text))
+        changes.extend((name, None, None) for name in self._deleted
+                       if name not in self._loaded)
+
+        loaded = {}
+        conflicts = []
+        with self._conn:
+            # Lock the database for writing before reading the current rows.
+            self._conn.execute("BEGIN IMMEDIATE")
+            for name, config, text in changes:
+                row = self._conn.execute(
+                    "SELECT config FROM resources WHERE name = ?",
+                    (name,)).fetchone()
+                current = row[0] if row else None
+                if current != text:
+                    config = _merge(_loads(text), config, _loads(current))
+                    if config is _CONFLICT:
+                        conflicts.append(name)
+                        continue
+                if config is None:
+                    self._conn.execute(
+                        "DELETE FROM resources WHERE name = ?", (name,))
+                    loaded[name] = None
+                    continue
+                new_text = _dumps(config)
+                if row:
+                    self._conn.execute(
+                        "UPDATE resources SET id = ?, type = ?, config = ? "
+                        "WHERE name = ?",
+                        (config.get("id"), config.get("type"), new_text,
+                         name))
+                else:
+                    self._conn.execute(
+                        "INSERT INTO resources (name, id, type, config) "
+                        "VALUES (?, ?, ?, ?)",
+                        (name, config.get("id"), config.get("type"),
+                         new_text))
+                loaded[name] = (config, new_text)
+            if conflicts:
+                # Leaving the block rolls back the transaction.
+                raise ResourceError(
+                    "Resources were changed by another process: {}"
+                    .format(", ".join(sorted(conflicts))))
+
+        self._deleted.clear()
+        for name, item in loaded.items():
+            if item is None:
+                self._loaded.pop(name, None)
+                continue
+            config, text = item
+            original = self._loaded.get(name, (None,))[0]
+            if original is not None and original is not config:
+                # Keep the object that callers may hold up to date.
+                original.clear()
+                original.update(config)
+                config = original
+            self._loaded[name] = (config, text)
+
+    def import_yaml(self, path):
+        """Add the resources of the YAML inventory at `path` and save.
+        """
+        with open(path) as fp:
+            inventory = yaml.safe_load(fp) or {}
+        for name, config in inventory.items():
+            self[name] = config
+        self.save()
+        lgr.info("Imported %d resources from %s", len(inventory), path)
+
+    def export_yaml(self, path):
+        """Write all saved resources as a YAML inventory to `path`.
+        """
+        inventory = {
+            name: json.loads(text) for name, text in self._conn.execute(
+                "SELECT name, config FROM resources ORDER BY name")}
+        with open(path, "w") as fp:
+            yaml.safe_dump(inventory, fp, default_flow_style=False)
@@ -20,13 +20,17 @@ from shlex import quote as shlex_quote
 import subprocess
 from tempfile import NamedTemporaryFile
 
+import yaml
+
 from reproman.cmd import Runner
 from reproman.dochelpers import exc_str, borrowdoc
+from reproman.support import spans
 from reproman.support.exceptions import (
     CommandError,
     SessionRuntimeError,
 )
 from reproman.utils import updated, to_unicode
+from reproman.utils import command_as_string
 
 import logging
 lgr = logging.getLogger('reproman.session')
@@ -47,6 +51,8 @@ class Session(object):
         """
         self._env = {}           # environment which would be in-effect only for this session
         self._env_permanent = {}  # environment variables which would be in-effect in future sessions if resource is persistent
+        self._envvars = None      # cached result of query_envvars
+        self.resource_name = None  # set by Resource.get_session, for spans
 
     def __enter__(self):
         self.open()
@@ -112,6 +118,7 @@ class Session(object):
                     if format:
                         newvalue = newvalue.format(env[newvar])
                     env[newvar] = newvalue
+        self._envvars = None
         if permanent:
             # We should store adjusted environment within the session for future
             # invocation
@@ -137,7 +144,11 @@ class Session(object):
         return self._env_permanent if permanent else self._env
 
     def query_envvars(self):
-        """Query full session environment settings within the session"""
+        """Query full session environment settings within the session
+
+        The result is cached until the environment is changed via
+        `set_envvar` or `source_script`.
+        """
         raise NotImplementedError
 
     def source_script(self, command, permanent=False, diff=True, shell=None):
@@ -197,11 +208,75 @@ class Session(object):
         if command_env:
             run_kw['env'] = command_env
 
-        return self._execute_command(
-            command,
-            cwd=cwd,
-            with_shell=with_shell,
-            **run_kw)
+        with spans.span("execute_command", "session",
+                        resource=self.resource_name,
+                        command=command_as_string(command)) as attrs:
+            out, err = self._execute_command(
+                command,
+                cwd=cwd,
+                with_shell=with_shell,
+                **run_kw)
+            attrs.update(exit_code=0,
+                         bytes_out=len(attrs["command"]),
+                         bytes_in=len(out or "") + len(err or ""))
+        return out, err
+
+    def iter_command_output(self, command, env=None, cwd=None,
+                            with_shell=False):
+        """
+        Execute the given command in the environment and iterate over its output.
+
+        Parameters are the same as for `execute_command`.
+
+        Sessions which cannot stream the output provide it once the command
+        is done.
+
+        Yields
+        ------
+        (name, text) tuples, where name is "stdout" or "stderr" and text is a
+        line of output
+        """
+        out, err = self.execute_command(command, env=env, cwd=cwd,
+                                        with_shell=with_shell)
+        for name, text in [("stdout", out), ("stderr", err)]:
+            for line in (text or "").splitlines(True):
+                yield name, line
+
+    def execute_many(self, commands, env=None, stop_on_error=False):
+        """Execute a batch of independent commands.
+
+        Sessions which can do so send the whole batch to the environment at
+        once, which saves a round trip per command.  This generic
+        implementation just calls `execute_command` for each command.
+
+        Parameters
+        ----------
+        commands : list
+            Commands, each a shell command string or a list of command
+            tokens.
+        env : dict, optional
+            Additional environment variables which are applied to all
+            commands of this call.
+        stop_on_error : bool, optional
+            Do not run the remaining commands after one fails.
+
+        Returns
+        -------
+        list of (stdout, stderr, exitcode)
+            One item per executed command.  With `stop_on_error`, the list
+            ends with the failed command.
+        """
+        results = []
+        for command in commands:
+            try:
+                out, err = self.execute_command(command, env=env)
+                code = 0
+            except CommandError as exc:
+                out, err, code = exc.stdout, exc.stderr, exc.code
+            results.append((out, err, code))
+            if code and stop_on_error:
+                break
+        return results
 
     def _execute_command(self, command, env=None, cwd=None, with_shell=False):
         """
@@ -563,21 +638,39 @@ class POSIXSession(Session):
     _GET_ENVIRON_CMD = ['env', '-0']
     _ALT_GET_ENVIRON_CMD = ['perl', '-e', r'foreach (keys %ENV) {print "$_=$ENV{$_}\0";}']
 
+    @property
+    def _environ_cmd_key(self):
+        """Key to remember the working `_GET_ENVIRON_CMD` under across processes
+
+        None (the default) disables remembering it.
+        """
+        return None
+
     @borrowdoc(Session)
     def query_envvars(self):
-        try:
-            out, err = self.execute_command(self._GET_ENVIRON_CMD)
-        except CommandError:
-            # if this fails, we might need the altenative command...
-            if self._GET_ENVIRON_CMD == self.__class__._ALT_GET_ENVIRON_CMD:
-                # ...if it's already installed, we fail...
-                raise
-            # ...otherwise we install it and try again
-            self._GET_ENVIRON_CMD = self._ALT_GET_ENVIRON_CMD
-            return self.query_envvars()
-        env = self._parse_envvars_output(out)
-        # TODO:  should we update with our .env or .env_permament????
-        return env
+        if self._envvars is None:
+            key = self._environ_cmd_key
+            known = _load_environ_cmds().get(key) if key else None
+            cmds = [known] if known else []
+            for cmd in [self._GET_ENVIRON_CMD, self._ALT_GET_ENVIRON_CMD]:
+                if cmd not in cmds:
+                    cmds.append(cmd)
+            for idx, cmd in enumerate(cmds):
+                try:
+                    out, err = self.execute_command(cmd)
+                except CommandError:
+                    # if this fails, we might need the alternative command...
+                    if idx == len(cmds) - 1:
+                        # ...unless there is none left to try
+                        raise
+                    continue
+                break
+            self._GET_ENVIRON_CMD = cmd
+            if key and cmd != known:
+                _save_environ_cmd(key, cmd)
+            # TODO:  should we update with our .env or .env_permament????
+            self._envvars = self._parse_envvars_output(out)
+        return dict(self._envvars)
 
     def _parse_envvars_output(self, out):
         """Decode a JSON string into an object
@@ -604,6 +697,68 @@ class POSIXSession(Session):
             output[split[0]] = split[1]
         return output
 
+    # Separates the outputs of commands run by execute_many.  It is followed by
+    # the index of the command and, on stdout, by its exit code.
+    _BATCH_MARKER = "== =ReproMan batch= =="
+
+    def _get_batch_script(self, commands, env=None, stop_on_error=False):
+        """Return a POSIX shell script running `commands` for `execute_many`.
+
+        Each command runs in its own subshell, after which a marker line is
+        printed to stdout and stderr.
+        """
+        lines = ["export {}={}".format(shlex_quote(k), shlex_quote(v))
+                 for k, v in (env or {}).items()]
+        marker = shlex_quote(self._BATCH_MARKER)
+        for idx, command in enumerate(commands):
+            lines.extend([
+                "(",
+                command_as_string(command),
+                ")",
+                "_reproman_status=$?",
+                "printf '\\n%s %d %d\\n' {} {:d} $_reproman_status"
+                .format(marker, idx),
+                "printf '\\n%s %d\\n' {} {:d} >&2".format(marker, idx)])
+            if stop_on_error:
+                lines.append("test $_reproman_status -eq 0 || exit 0")
+        lines.append("exit 0")
+        return "\n".join(lines) + "\n"
+
+    def _parse_batch_output(self, out, err):
+        """Split output of a script from `_get_batch_script`.
+
+        Returns
+        -------
+        list of (stdout, stderr, exitcode)
+        """
+        marker = re.escape(self._BATCH_MARKER)
+        out_parts = re.split(r"\n{} (\d+) (\d+)\n".format(marker), out)
+        err_parts = re.split(r"\n{} (\d+)\n".format(marker), err)
+        # Each split has the form [output, index, (exitcode,) ..., trailing].
+        outs = out_parts[:-1][::3]
+        codes = [int(c) for c in out_parts[:-1][2::3]]
+        errs = err_parts[:-1][::2]
+        if len(errs) != len(outs):
+            raise CommandError(
+                cmd="execute_many",
+                msg="Failed to split output of batched commands",
+                stdout=out, stderr=err)
+        for extra in (out_parts[-1], err_parts[-1]):
+            if extra:
+                lgr.debug("Ignoring trailing output of batched commands: %r",
+                          extra)
+        return list(zip(outs, errs, codes))
+
+    @borrowdoc(Session)
+    def execute_many(self, commands, env=None, stop_on_error=False):
+        if not commands:
+            return []
+        script = self._get_batch_script(commands, env=env,
+                                        stop_on_error=stop_on_error)
+        lgr.debug("Running %d commands in a batch", len(commands))
+        out, err = self.execute_command(["/bin/sh", "-c", script])
+        return self._parse_batch_output(to_unicode(out), to_unicode(err))
+
     def _prefix_command(self, command, env=None, cwd=None, with_shell=False):
         """Wrap the command in a shell call with ENV vars and CWD prefixed
         statment to command. Will pass through the command unchanged if env
@@ -657,7 +812,7 @@ class POSIXSession(Session):
         marker = "== =ReproMan == ="  # unique marker to be able to split away
         # possible output from the sourced script
         get_env_command = " ".join("'%s'" % s for s in self._GET_ENVIRON_CMD)
-        shell = shell or self.query_envvars().get('SHELL', None)
+        shell = shell or orig_env.get('SHELL', None)
         if not isinstance(command, list):
             command = [command]
             shell = shell or "/bin/sh"
@@ -706,6 +861,7 @@ class POSIXSession(Session):
         env = self._env_permanent if permanent else self._env
         for k, v in new_env.items():
             env[k] = v
+        self._envvars = None
 
         return new_env
 
@@ -820,6 +976,41 @@ class POSIXSession(Session):
             Runner().run(command)
 
 
+def _environ_cmds_file():
+    from reproman import cfg
+    return cfg.getpath(
+        'general', 'environ_cmds_file',
+        op.join(cfg.dirs.user_cache_dir, 'environ_cmds.yml'))
+
+
+def _load_environ_cmds():
+    """Return the mapping of session keys to known working environ commands.
+    """
+    path = _environ_cmds_file()
+    if not op.exists(path):
+        return {}
+    try:
+        with open(path) as fp:
+            return yaml.safe_load(fp) or {}
+    except (OSError, yaml.YAMLError) as exc:
+        lgr.debug("Failed to load %s: %s", path, exc_str(exc))
+        return {}
+
+
+def _save_environ_cmd(key, cmd):
+    """Remember that `cmd` queries the environment for session `key`.
+    """
+    path = _environ_cmds_file()
+    cmds = _load_environ_cmds()
+    cmds[key] = cmd
+    try:
+        os.makedirs(op.dirname(path), exist_ok=True)
+        with open(path, 'w') as fp:
+            yaml.safe_dump(cmds, fp, default_flow_style=False)
+    except OSError as exc:
+        lgr.debug("Failed to save %s: %s", path, exc_str(exc))
+
+
 def get_local_session(env={'LC_ALL': 'C'}, pty=False, shared=None):
     """A shortcut to get a local session"""
     # TODO: support arbitrary session as obtained from a resource
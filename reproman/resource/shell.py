@@ -14,6 +14,7 @@ from .base import Resource
 from reproman.cmd import Runner
 from reproman.dochelpers import borrowdoc
 from reproman.resource.session import Session
+from reproman.support import spans
 from reproman.support.exceptions import CommandError
 from reproman.utils import attrib
 
@@ -65,6 +66,19 @@ class ShellSession(POSIXSession):
             **run_kw
         )  # , shell=True)
 
+    @borrowdoc(Session)
+    def iter_command_output(self, command, env=None, cwd=None,
+                            with_shell=False):
+        if self._runner is None:
+            self.open()
+        command_env = dict(self._env, **(env or {}))
+        run_kw = {}
+        if command_env:
+            run_kw['env'] = get_updated_env(os.environ, command_env)
+        # Unlike execute_command, this doesn't hold the output in memory.
+        return self._runner.stream(command, expect_fail=True, cwd=cwd,
+                                   **run_kw)
+
     @borrowdoc(Session)
     def isdir(self, path):
         return os.path.isdir(path)
@@ -81,8 +95,7 @@ class ShellSession(POSIXSession):
                     raise CommandError(
                         msg="Failed to make directory {}".format(path))
 
-    @borrowdoc(Session)
-    def get(self, src_path, dest_path=None, uid=-1, gid=-1):
+    def _copy(self, src_path, dest_path, uid=-1, gid=-1):
         dest_path = self._prepare_dest_path(src_path, dest_path)
         if os.path.isdir(src_path):
             shutil.copytree(src_path, dest_path)
@@ -92,9 +105,15 @@ class ShellSession(POSIXSession):
             self.chown(dest_path, uid, gid, recursive=True)
 
     @borrowdoc(Session)
+    @spans.traced_transfer
+    def get(self, src_path, dest_path=None, uid=-1, gid=-1):
+        self._copy(src_path, dest_path, uid, gid)
+
+    @borrowdoc(Session)
+    @spans.traced_transfer
     def put(self, src_path, dest_path, uid=-1, gid=-1):
         # put is the same as get for the shell resource
-        self.get(src_path, dest_path, uid, gid)
+        self._copy(src_path, dest_path, uid, gid)
 
 
 @attr.s
@@ -160,4 +179,6 @@ class Shell(Resource):
             raise NotImplementedError
         if shared:
             raise NotImplementedError
-        return ShellSession()
+        session = ShellSession()
+        session.resource_name = self.name
+        return session
@@ -9,12 +9,14 @@
 
 import os
 import logging
+import shutil
 from shlex import quote as shlex_quote
 
 import attr
 
 from ..cmd import Runner
 from ..dochelpers import borrowdoc
+from ..support import spans
 from ..support.exceptions import CommandError
 from ..support.external_versions import external_versions
 from .session import POSIXSession, Session
@@ -25,6 +27,22 @@ from ..utils import command_as_string
 lgr = logging.getLogger('reproman.resource.singularity')  # pylint: disable=C0103
 
 
+def _copy_local(src_path, dest_path):
+    """Copy `src_path` to `dest_path`, merging into existing directories.
+    """
+    if not os.path.isdir(src_path):
+        if not (os.path.exists(dest_path)
+                and os.path.samefile(src_path, dest_path)):
+            shutil.copy(src_path, dest_path)
+        return
+    for root, _, files in os.walk(src_path):
+        target = os.path.join(dest_path, os.path.relpath(root, src_path))
+        if not os.path.isdir(target):
+            os.makedirs(target)
+        for fname in files:
+            _copy_local(os.path.join(root, fname), os.path.join(target, fname))
+
+
 @attr.s
 class Singularity(Resource):
     """
@@ -135,9 +153,11 @@ class Singularity(Resource):
 
         if pty and shared is not None and not shared:
             lgr.warning("Cannot do non-shared pty session for Singularity yet")
-        return (PTYSingularitySession if pty else SingularitySession)(
+        session = (PTYSingularitySession if pty else SingularitySession)(
             name=self.name
         )
+        session.resource_name = self.name
+        return session
 
     def get_instance_info(self):
         """
@@ -175,6 +195,10 @@ class SingularitySession(POSIXSession):
     name = attrib(default=attr.NOTHING)
     _runner = Runner()
 
+    @property
+    def _environ_cmd_key(self):
+        return "singularity:" + self.name
+
     @borrowdoc(Session)
     def _execute_command(self, command, env=None, cwd=None, with_shell=True):
         command = self._prefix_command(command_as_string(command), env=env,
@@ -186,45 +210,117 @@ class SingularitySession(POSIXSession):
 
         return (stdout, stderr)
 
+    def _stat(self, path):
+        """Return (device, inode, is_dir) for `path` within the instance.
+
+        None is returned if `path` does not exist.
+        """
+        try:
+            out, _ = self._runner.run(
+                ['singularity', 'exec', 'instance://{}'.format(self.name),
+                 'stat', '-L', '-c', '%d %i %F', path],
+                expect_fail=True, expect_stderr=True)
+        except CommandError:
+            return None
+        dev, ino, ftype = out.strip().split(' ', 2)
+        return int(dev), int(ino), ftype == 'directory'
+
+    @staticmethod
+    def _is_shared(local_path, remote_stat):
+        """Is `local_path` the same file the instance sees as `remote_stat`?
+
+        This is the case for paths that are bind-mounted into the instance
+        (e.g., $HOME and /tmp by default), which can then be copied directly
+        on the host.
+        """
+        if remote_stat is None:
+            return False
+        try:
+            st = os.stat(local_path)
+        except OSError:
+            return False
+        return (st.st_dev, st.st_ino) == remote_stat[:2]
+
     def _put_file(self, src_path, dest_path):
-        dest_path = self._prepare_dest_path(src_path, dest_path,
-                                            local=False, absolute_only=True)
         cmd = 'cat {} | singularity exec instance://{} tee {} > /dev/null'
         self._runner.run(cmd.format(shlex_quote(src_path),
                                     self.name,
                                     shlex_quote(dest_path)))
 
+    def _put_tree(self, src_path, dest_path):
+        cmd = 'tar -C {} -cf - . | singularity exec instance://{} tar -C {} -xf -'
+        self._runner.run(cmd.format(shlex_quote(src_path),
+                                    self.name,
+                                    shlex_quote(dest_path)))
+
     @borrowdoc(Session)
+    @spans.traced_transfer
     def put(self, src_path, dest_path, uid=-1, gid=-1):
-        self.transfer_recursive(
-            src_path, 
-            dest_path, 
-            os.path.isdir, 
-            os.listdir, 
-            self.mkdir, 
-            self._put_file
-        )
+        if not os.path.isabs(dest_path):
+            raise ValueError(
+                "Destination path must be absolute, got {}".format(dest_path))
+        src_isdir = os.path.isdir(src_path)
+        if src_isdir:
+            dest_dir = dest_path
+        else:
+            dest_dir, dest_base = os.path.split(dest_path)
+            dest_path = os.path.join(dest_dir,
+                                     dest_base or os.path.basename(src_path))
+
+        dest_stat = self._stat(dest_dir)
+        if dest_stat is None:
+            self.execute_command(['mkdir', '-p', dest_dir])
+            dest_stat = self._stat(dest_dir)
+
+        if self._is_shared(dest_dir, dest_stat):
+            lgr.debug("%s is shared with the host. Copying directly",
+                      dest_dir)
+            _copy_local(src_path, dest_path)
+        elif src_isdir:
+            self._put_tree(src_path, dest_path)
+        else:
+            self._put_file(src_path, dest_path)
 
         if uid > -1 or gid > -1:
             self.chown(dest_path, uid, gid, recursive=True)
 
     def _get_file(self, src_path, dest_path):
-        dest_path = self._prepare_dest_path(src_path, dest_path)
         cmd = 'singularity exec instance://{} cat {} > {}'
         self._runner.run(cmd.format(self.name,
                                     shlex_quote(src_path),
                                     shlex_quote(dest_path)))
 
+    def _get_tree(self, src_path, dest_path):
+        cmd = 'singularity exec instance://{} tar -C {} -cf - . | tar -C {} -xf -'
+        self._runner.run(cmd.format(self.name,
+                                    shlex_quote(src_path),
+                                    shlex_quote(dest_path)))
+
     @borrowdoc(Session)
+    @spans.traced_transfer
     def get(self, src_path, dest_path=None, uid=-1, gid=-1):
-        self.transfer_recursive(
-            src_path, 
-            dest_path, 
-            self.isdir, 
-            self.listdir, 
-            os.mkdir, 
-            self._get_file
-        )
+        src_stat = self._stat(src_path)
+        if src_stat is None:
+            raise CommandError(
+                cmd='get',
+                msg="{} does not exist in instance {}".format(src_path,
+                                                              self.name))
+        src_isdir = src_stat[2]
+        if src_isdir:
+            dest_path = dest_path or os.path.basename(src_path)
+            if not os.path.exists(dest_path):
+                os.makedirs(dest_path)
+        else:
+            dest_path = self._prepare_dest_path(src_path, dest_path)
+
+        if self._is_shared(src_path, src_stat):
+            lgr.debug("%s is shared with the host. Copying directly",
+                      src_path)
+            _copy_local(src_path, dest_path)
+        elif src_isdir:
+            self._get_tree(src_path, dest_path)
+        else:
+            self._get_file(src_path, dest_path)
 
         if uid > -1 or gid > -1:
             self.chown(dest_path, uid, gid, remote=False, recursive=True)
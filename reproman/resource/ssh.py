@@ -11,6 +11,8 @@ import attr
 import os
 import stat
 import getpass
+import queue
+import threading
 import uuid
 from ..log import LoggerHelper
 # OPT: invoke, fabric and paramiko is imported at the point of use
@@ -26,6 +28,7 @@ from ..utils import attrib
 from ..utils import command_as_string
 from reproman.dochelpers import borrowdoc
 from reproman.resource.session import Session
+from reproman.support import spans
 from ..support.exceptions import CommandError
 
 # Silence CryptographyDeprecationWarning's.
@@ -159,9 +162,11 @@ class SSH(Resource):
         if not self._connection:
             self.connect()
 
-        return (PTYSSHSession if pty else SSHSession)(
+        session = (PTYSSHSession if pty else SSHSession)(
             connection=self._connection
         )
+        session.resource_name = self.name
+        return session
 
 
 # Alias SSH class so that it can be discovered by the ResourceManager.
@@ -173,10 +178,47 @@ class Ssh(SSH):
 from reproman.resource.session import POSIXSession
 
 
+class _LineWriter(object):
+    """File-like object that passes the text written to it on line by line.
+
+    Parameters
+    ----------
+    name : str
+        Name of the stream, passed along with each line.
+    put : callable
+        Called with a (name, line) tuple for each line.
+    """
+
+    def __init__(self, name, put):
+        self.name = name
+        self._put = put
+        self._partial = ""
+
+    def write(self, text):
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self._put((self.name, line + "\n"))
+
+    def flush(self):
+        pass
+
+    def finish(self):
+        """Pass on the last line if it wasn't terminated.
+        """
+        if self._partial:
+            self._put((self.name, self._partial))
+            self._partial = ""
+
+
 @attr.s
 class SSHSession(POSIXSession):
     connection = attrib(default=attr.NOTHING)
 
+    @property
+    def _environ_cmd_key(self):
+        return "ssh:{0.user}@{0.host}:{0.port}".format(self.connection)
+
     @borrowdoc(Session)
     def _execute_command(self, command, env=None, cwd=None, with_shell=False,
                         handle_permission_denied=True):
@@ -218,6 +260,48 @@ class SSHSession(POSIXSession):
         return (result.stdout, result.stderr)
 
     @borrowdoc(Session)
+    def iter_command_output(self, command, env=None, cwd=None,
+                            with_shell=False):
+        command = self._prefix_command(command_as_string(command),
+                                       env=dict(self._env, **(env or {})),
+                                       cwd=cwd, with_shell=with_shell)
+        lines = queue.Queue()
+        done = object()
+        writers = [_LineWriter(name, lines.put)
+                   for name in ["stdout", "stderr"]]
+        outcome = {}
+
+        # fabric writes the output to the streams as it arrives, but only
+        # returns once the command is done.
+        def run():
+            try:
+                outcome["result"] = self.connection.run(
+                    command, warn=True, in_stream=False,
+                    out_stream=writers[0], err_stream=writers[1])
+            except Exception as exc:
+                outcome["error"] = exc
+            finally:
+                for writer in writers:
+                    writer.finish()
+                lines.put(done)
+
+        thread = threading.Thread(target=run, name="reproman-ssh-output")
+        thread.daemon = True
+        thread.start()
+        for item in iter(lines.get, done):
+            yield item
+        thread.join()
+        if "error" in outcome:
+            raise outcome["error"]
+        result = outcome["result"]
+        if result.return_code not in [0, None]:
+            msg = "Failed to run %r. Exit code=%d. out=%s err=%s" \
+                  % (command, result.return_code, result.stdout, result.stderr)
+            raise CommandError(str(command), msg, result.return_code,
+                               result.stdout, result.stderr)
+
+    @borrowdoc(Session)
+    @spans.traced_transfer
     def put(self, src_path, dest_path, uid=-1, gid=-1):
         dest_path = self._prepare_dest_path(src_path, dest_path, local=False)
         sftp = self.connection.sftp()
@@ -234,6 +318,7 @@ class SSHSession(POSIXSession):
             self.chown(dest_path, uid, gid, recursive=True)
 
     @borrowdoc(Session)
+    @spans.traced_transfer
     def get(self, src_path, dest_path=None, uid=-1, gid=-1):
         dest_path = self._prepare_dest_path(src_path, dest_path)
         sftp = self.connection.sftp()
@@ -0,0 +1,189 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the reproman package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import asyncio
+import os.path as op
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from ...support.exceptions import CommandError
+from ..async_session import AsyncShellSession
+from ..async_session import gather_bounded
+from ..async_session import get_async_session
+from ..async_session import run_async
+from ..async_session import SyncSessionAdapter
+from ..shell import ShellSession
+
+
+@pytest.fixture(params=["native", "adapter"])
+def async_session(request):
+    if request.param == "native":
+        return get_async_session(ShellSession())
+    # A POSIXSession subclass, so goes through the generic adapter.
+    return SyncSessionAdapter(ShellSession())
+
+
+def test_get_async_session():
+    assert isinstance(get_async_session(ShellSession()), AsyncShellSession)
+
+
+def test_async_execute_command(async_session):
+    async_session.session.set_envvar("REPROMAN_TEST_VAR", "set")
+
+    async def run():
+        async with async_session:
+            out, _ = await async_session.execute_command(
+                ["sh", "-c", "echo $REPROMAN_TEST_VAR $OTHER"],
+                env={"OTHER": "other"})
+            assert out == "set other\n"
+            out, _ = await async_session.execute_command("echo a | tr a b")
+            assert out == "b\n"
+            with pytest.raises(CommandError) as exc:
+                await async_session.execute_command(["sh", "-c", "exit 3"])
+            assert exc.value.code == 3
+            results = await async_session.execute_many(["echo one", "false"])
+            assert results == [("one\n", "", 0), ("", "", 1)]
+    run_async(run())
+
+
+def test_async_execute_command_with_shell():
+    session = get_async_session(ShellSession())
+    with patch("asyncio.create_subprocess_exec",
+               wraps=asyncio.create_subprocess_exec) as create:
+        out, _ = run_async(
+            session.execute_command("echo $((1 + 2))", with_shell=True))
+    assert out == "3\n"
+    assert create.call_args[0] == ("/bin/sh", "-c", "echo $((1 + 2))")
+
+    lines = []
+    code = run_async(session.execute_command_streamed(
+        "echo a; echo b >&2", lambda *a: lines.append(a), with_shell=True))
+    assert code == 0
+    assert sorted(lines) == [("stderr", "b\n"), ("stdout", "a\n")]
+
+
+def test_adapter_streams_live():
+    seen = threading.Event()
+
+    class SlowSession(ShellSession):
+        def iter_command_output(self, command, env=None, cwd=None,
+                                with_shell=False):
+            yield "stdout", "one\n"
+            # The first line has to reach the callback while the command is
+            # still running.
+            yield "stdout", "seen\n" if seen.wait(10) else "not seen\n"
+            raise CommandError(command, "failed", 3, "tail", "")
+
+    def callback(name, line):
+        lines.append((name, line))
+        seen.set()
+
+    lines = []
+    code = run_async(SyncSessionAdapter(SlowSession())
+                     .execute_command_streamed("cmd", callback))
+    assert code == 3
+    # The output that was streamed isn't repeated from the exception.
+    assert lines == [("stdout", "one\n"), ("stdout", "seen\n")]
+
+    # Sessions that don't stream provide the output of a failed command
+    # with the exception.
+    lines = []
+    code = run_async(SyncSessionAdapter(ShellSession())
+                     .execute_command_streamed(
+                         ["sh", "-c", "echo out; echo err >&2; exit 2"],
+                         callback))
+    assert code == 2
+    assert sorted(lines) == [("stderr", "err\n"), ("stdout", "out\n")]
+
+
+def test_async_stat_many(async_session, tmpdir):
+    tmpdir.join("file").write("content")
+    paths = [str(tmpdir), str(tmpdir.join("file")), str(tmpdir.join("nope"))]
+    stats = run_async(async_session.stat_many(paths))
+    assert stats[0].isdir
+    assert not stats[1].isdir
+    assert stats[1].size == 7
+    assert stats[1].mtime == int(op.getmtime(paths[1]))
+    assert stats[2] is None
+
+
+def test_async_put_get(async_session, tmpdir):
+    src = tmpdir.join("src")
+    src.write("content")
+
+    async def run():
+        await async_session.put(str(src), str(tmpdir.join("put")))
+        await async_session.get(str(tmpdir.join("put")),
+                                str(tmpdir.join("got")))
+    run_async(run())
+    assert tmpdir.join("got").read() == "content"
+
+
+def test_async_commands_run_concurrently():
+    sessions = [get_async_session(ShellSession()) for _ in range(3)]
+    t0 = time.time()
+    results = run_async(gather_bounded(
+        [s.execute_command(["sleep", "0.5"]) for s in sessions]))
+    assert results == [("", "")] * 3
+    assert time.time() - t0 < 1.2
+
+
+def test_gather_bounded():
+    running = []
+    peak = []
+
+    async def job(idx):
+        running.append(idx)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(idx)
+        if idx == 3:
+            raise ValueError(idx)
+        return idx
+
+    results = run_async(gather_bounded([job(i) for i in range(6)],
+                                       max_parallel=2))
+    assert max(peak) == 2
+    assert results[:3] == [0, 1, 2]
+    assert isinstance(results[3], ValueError)
+    assert results[4:] == [4, 5]
+
+
+def test_run_async_max_workers():
+    # The first 50 calls only return once all of them are running.  With
+    # fewer threads, the barrier times out.
+    barrier = threading.Barrier(50, timeout=30)
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    class BlockingSession(ShellSession):
+        def execute_command(self, command, env=None, cwd=None,
+                            with_shell=False):
+            with lock:
+                running.append(command)
+                peak.append(len(running))
+            try:
+                if int(command) < 50:
+                    barrier.wait()
+            finally:
+                with lock:
+                    running.remove(command)
+            return "", ""
+
+    sessions = [SyncSessionAdapter(BlockingSession()) for _ in range(60)]
+    results = run_async(gather_bounded([s.execute_command(str(i))
+                                        for i, s in enumerate(sessions)],
+                                       max_parallel=50),
+                        max_workers=50)
+    assert results == [("", "")] * 60
+    assert max(peak) == 50
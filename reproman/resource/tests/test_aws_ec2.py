@@ -17,13 +17,32 @@ from ..ssh import SSH
 pytestmark = mark.skipif_no_aws_dependencies
 
 
+def ec2_mock(instances):
+    """Return a mock EC2 resource that describes `instances` (dicts).
+    """
+    def paginate(Filters):
+        ids = Filters[0]['Values']
+        return [{'Reservations': [
+            {'Instances': [i for i in instances if i['InstanceId'] in ids]}]}]
+
+    def instance(id):
+        data = [i for i in instances if i['InstanceId'] == id][0]
+        return MagicMock(instance_id=id, state=data['State'])
+
+    ec2 = MagicMock(Instance=instance)
+    ec2.meta.client.get_paginator.return_value.paginate.side_effect = paginate
+    return ec2
+
+
 def test_awsec2_class(resman):
+    from ..aws_ec2 import clear_state_cache
 
     with patch('boto3.resource') as client, \
             patch.object(SSH, 'get_session', return_value='started_session'), \
             swallow_logs(new_level=logging.DEBUG) as log:
 
         # Test connecting when a resource doesn't exist.
+        clear_state_cache()
         client.return_value = MagicMock(
             instances=MagicMock(filter=lambda Filters: [])
         )
@@ -39,6 +58,7 @@ def test_awsec2_class(resman):
         assert resource.status is None
 
         # Test catching exception when multiple resources are found at connection.
+        clear_state_cache()
         client.return_value = MagicMock(
             instances=MagicMock(filter=lambda Filters: [
                 MagicMock(
@@ -64,12 +84,11 @@ def test_awsec2_class(resman):
             assert e.args[0] == "Multiple container matches found"
 
         # Test connecting to an existing resource.
-        client.return_value = MagicMock(
-            Instance=lambda id: MagicMock(
-                instance_id='i-00002777d52482d9c',
-                state={'Name': 'running'}
-            )
-        )
+        clear_state_cache()
+        client.return_value = ec2_mock([
+            {'InstanceId': 'i-00002777d52482d9c',
+             'State': {'Name': 'running'}}
+        ])
         config = {
             'name': 'my-instance-name',
             'id': 'i-00002777d52482d9c',
@@ -101,6 +120,7 @@ def test_awsec2_class(resman):
             assert e.args[0] == "Instance 'i-00002777d52482d9c' already exists in AWS subscription"
 
         # Test creating resource.
+        clear_state_cache()
         client.return_value = MagicMock(
             instances=MagicMock(filter=lambda Filters: []),
             Instance=lambda id: MagicMock(
@@ -154,3 +174,126 @@ def test_awsec2_class(resman):
 
         session = resource.get_session()
         assert session == 'started_session'
+
+
+def test_connect_batched(resman):
+    from .. import aws_ec2
+
+    instances = [{'InstanceId': 'i-{}'.format(i),
+                  'State': {'Name': 'running'}} for i in range(5)]
+    creds = {'access_key_id': 'my-aws-access-key-id',
+             'secret_access_key': 'my-aws-secret-access-key-id'}
+    with patch('boto3.resource', return_value=ec2_mock(instances)), \
+            patch.dict(aws_ec2.api_calls, clear=True):
+        resources = [
+            resman.factory(dict(creds, type='aws-ec2', name='r' + str(i),
+                                id='i-' + str(i)))
+            for i in range(6)]
+        for resource in resources:
+            resource.connect()
+        assert [r.status for r in resources] == ['running'] * 5 + [None]
+        assert resources[5].id is None
+        # One connection and a single call for all of the instances.
+        assert aws_ec2.api_calls == {"connections": 1,
+                                     "describe_instances": 1}
+
+        # Changing an instance drops its cached state.
+        resources[0].stop()
+        resources[0].connect()
+        resources[1].connect()
+        assert aws_ec2.api_calls["describe_instances"] == 2
+
+
+def test_condor_connect_batched(resman):
+    from .. import aws_ec2
+    from ..aws_condor import AwsCondor
+
+    instances = [{'InstanceId': 'i-{}'.format(i),
+                  'State': {'Name': 'running'}} for i in range(3)]
+    with patch('boto3.resource', return_value=ec2_mock(instances)), \
+            patch('reproman.resource.aws_condor.get_manager',
+                  return_value=resman), \
+            patch.dict(aws_ec2.api_calls, clear=True):
+        cluster = AwsCondor(
+            name='cluster', size=3, access_key_id='key',
+            secret_access_key='secret',
+            nodes=[{'type': 'aws-ec2', 'name': 'cluster_{}'.format(i),
+                    'id': 'i-{}'.format(i)} for i in range(3)])
+        cluster.connect()
+        assert [n.status for n in cluster.nodes] == ['running'] * 3
+        assert aws_ec2.api_calls["describe_instances"] == 1
+
+
+@mark.skipif_no_moto
+def test_connect_moto(resman):
+    import boto3
+    from .. import aws_ec2
+    try:
+        from moto import mock_aws
+    except ImportError:  # moto < 5
+        from moto import mock_ec2 as mock_aws
+
+    creds = {'access_key_id': 'testing', 'secret_access_key': 'testing',
+             'region_name': 'us-east-1'}
+    with mock_aws(), patch.dict(aws_ec2.api_calls, clear=True):
+        ec2 = boto3.resource('ec2', region_name='us-east-1',
+                             aws_access_key_id='testing',
+                             aws_secret_access_key='testing')
+        created = ec2.create_instances(ImageId='ami-12345678',
+                                       MinCount=3, MaxCount=3)
+        resources = [
+            resman.factory(dict(creds, type='aws-ec2', name='r' + str(i),
+                                id=instance.id))
+            for i, instance in enumerate(created)]
+        for resource in resources:
+            resource.connect()
+        assert [r.status for r in resources] == ['running'] * 3
+        assert aws_ec2.api_calls["describe_instances"] == 1
+
+
+def test_condor_node_script(tmpdir):
+    import subprocess
+    from ..aws_condor import AwsCondor
+
+    cluster = AwsCondor(name='cluster', user='me')
+    config = "CONDOR_HOST = 10.0.0.1\nDAEMON_LIST = MASTER\n"
+    script = cluster._get_node_script(config, '10.0.0.1', True)
+    subprocess.check_call(['bash', '-n', '-c', script])
+    assert script.startswith("set -e\n")
+    assert "\n" + config + "REPROMAN_CONDOR_CONFIG_EOF\n" in script
+    assert "chown me" in script
+    assert script.endswith("sudo /home/me/bin/nfs-mount-server.sh 10.0.0.1\n")
+
+    # The configuration lands in the file as is.
+    local_script = script.replace("/etc/condor/config.d", str(tmpdir))
+    local_script = local_script[:local_script.index("sudo rm")]
+    local_script = local_script.replace("sudo ", "")
+    subprocess.check_call(['bash', '-c', local_script])
+    assert tmpdir.join("00-nitrcce-cluster").read() == config
+
+    script = cluster._get_node_script(config, '10.0.0.1', False)
+    assert "chown" not in script
+    assert "nfs-mount-client.sh 10.0.0.1" in script
+
+
+def test_condor_configure_nodes_in_parallel():
+    from ..aws_condor import AwsCondor
+
+    order = []
+
+    def node(i):
+        session = MagicMock()
+        session.execute_command.side_effect = \
+            lambda cmd: order.append(i)
+        return MagicMock(get_session=lambda: session,
+                         _ec2_instance=MagicMock(
+                             private_ip_address='10.0.0.{}'.format(i)))
+
+    cluster = AwsCondor(name='cluster', size=3,
+                        nodes=[node(i) for i in range(3)])
+    with patch('reproman.resource.aws_condor.Template') as template:
+        template.return_value.render_cluster.return_value = "config"
+        cluster._configure_nodes()
+    # One script per node, central manager first.
+    assert order[0] == 0
+    assert sorted(order) == [0, 1, 2]
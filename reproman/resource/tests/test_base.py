@@ -15,6 +15,7 @@ from reproman.resource.base import Resource
 from reproman.resource.base import backend_check_parameters
 from reproman.resource.base import get_resource_class
 from reproman.resource.shell import Shell
+from reproman.support import plugins
 from reproman.support.exceptions import MissingConfigError
 from reproman.support.exceptions import MultipleResourceMatches
 from reproman.support.exceptions import ResourceAlreadyExistsError
@@ -206,6 +207,24 @@ def test_get_resources():
         assert manager.get_resource("00", "id")
 
 
+def test_get_resources_multiple():
+    manager = ResourceManager()
+    manager.inventory = {
+        name: {"name": name, "type": "shell", "id": name + "-id"}
+        for name in ["node-2", "node-1", "other"]}
+
+    def names(resrefs, *args):
+        return [r.name for r in manager.get_resources(resrefs, *args)]
+
+    assert names(["other"]) == ["other"]
+    assert names(["node-*"]) == ["node-1", "node-2"]
+    assert names(["other-id", "node-[2]", "other"]) == ["other", "node-2"]
+    with pytest.raises(ResourceError):
+        manager.get_resources(["node-1", "nothing-*"])
+    with pytest.raises(ResourceError):
+        manager.get_resources(["node-1-id"], "name")
+
+
 def test_create_conflict():
     manager = ResourceManager()
     manager.inventory = {"already-exists": {"name": "already-exists",
@@ -248,10 +267,17 @@ def test_get_resource_class():
             get_resource_class("shll")
     assert "Failed to discover" in str(exc.value)
 
-    # We raise a resource error if we can find a module in reproman/resource/
-    # but it doesn't have a corresponding resource class.
+    # Types are taken from the registry rather than the files in
+    # reproman/resource/.
     with pytest.raises(ResourceError) as exc:
         get_resource_class("base")
+    assert "unknown resource type" in str(exc.value)
+
+    # We raise a resource error if a registered class cannot be found.
+    with patch.dict(plugins._get_registry()[plugins.RESOURCES],
+                    {"bogus": "reproman.resource.shell:Bogus"}):
+        with pytest.raises(ResourceError) as exc:
+            get_resource_class("bogus")
     assert "Failed to find" in str(exc.value)
 
     # We recognize when s/_/-/ would give an existing class and provide an
@@ -7,6 +7,8 @@
 # ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
 
 import logging
+import os
+import pytest
 from unittest.mock import patch, MagicMock, call
 
 from ...utils import merge_dicts
@@ -36,7 +38,7 @@ def test_dockercontainer_class(resman):
             swallow_logs(new_level=logging.DEBUG) as log:
 
         client.return_value = MagicMock(
-            containers=lambda all: [
+            containers=lambda all, filters: [
                 {
                     'Id': '326b0fdfbf83',
                     'Names': ['/existing-test-resource'],
@@ -61,10 +63,15 @@ def test_dockercontainer_class(resman):
                 'Id': '18b31b30e3a5'
             },
             exec_inspect=lambda id: {'ExitCode': 0},
-            exec_start=lambda exec_id, stream: [
-                b'stdout line 1',
-                b'stdout line 2',
-                b'stdout line 3'
+            # Output of the two commands executed as one batch below.
+            exec_start=lambda exec_id, stream, demux: [
+                (b'stdout line 1', None),
+                (b'\n== =ReproMan batch= == 0 0\n',
+                 b'\n== =ReproMan batch= == 0\n'),
+                (b'stdout line 2', None),
+                (None, b'stderr line 1'),
+                (b'\n== =ReproMan batch= == 1 0\n',
+                 b'\n== =ReproMan batch= == 1\n'),
             ]
         )
 
@@ -130,8 +137,10 @@ def test_dockercontainer_class(resman):
         command = ['apt-get', 'install', 'xeyes']
         resource.add_command(command)
         resource.execute_command_buffer()
-        assert_in("Running command 'apt-get install bc'", log.lines)
-        assert_in("Running command 'apt-get install xeyes'", log.lines)
+        assert_in("Running command '['apt-get', 'install', 'bc']'", log.lines)
+        assert_in("Running command '['apt-get', 'install', 'xeyes']'",
+                  log.lines)
+        assert_in("Running 2 commands in a batch", log.lines)
 
         # Test starting resource.
         resource.start()
@@ -184,3 +193,105 @@ def test_image_name_latest_default():
                           ("busybox@ddeeaa", "busybox@ddeeaa"),
                           ("busybox", "busybox:latest")]:
         assert DockerContainer(name="cname", image=img).image == expected
+
+
+@mark.skipif_no_docker_dependencies
+def test_tar_stream(tmpdir):
+    import io
+    import tarfile
+    from ..docker_container import _tar_stream
+    from ...tests.utils import create_tree
+
+    tmpdir = str(tmpdir)
+    create_tree(tmpdir, {"src": {"a": "a content",
+                                 "sub": {"b": "b" * 10000}}})
+    chunks = list(_tar_stream(os.path.join(tmpdir, "src"), "dest",
+                              chunk_size=512))
+    assert len(chunks) > 1
+    assert all(len(c) <= 512 for c in chunks)
+    with tarfile.open(fileobj=io.BytesIO(b"".join(chunks))) as tar:
+        assert set(tar.getnames()) == {"dest", "dest/a",
+                                       "dest/sub", "dest/sub/b"}
+        assert tar.extractfile("dest/sub/b").read() == b"b" * 10000
+
+    with pytest.raises(FileNotFoundError):
+        list(_tar_stream(os.path.join(tmpdir, "missing"), "dest"))
+
+
+@mark.skipif_no_docker_dependencies
+def test_docker_session_demux():
+    from ..docker_container import DockerSession
+    from ...support.exceptions import CommandError
+
+    client = MagicMock(
+        exec_create=lambda container, cmd: {'Id': 'exec-id'},
+        exec_start=lambda exec_id, stream, demux: [
+            (b'out 1\n', None),
+            (None, b'err 1\n'),
+            (b'out 2 \xc3', b'err 2\n'),
+            # A multi-byte character split across chunks.
+            (b'\xa9\n', None),
+        ],
+        exec_inspect=lambda id: {'ExitCode': 0})
+    session = DockerSession(client=client, container={'Id': 'cid'})
+    out, err = session.execute_command(['ls'])
+    assert out == 'out 1\nout 2 \xe9\n'
+    assert err == 'err 1\nerr 2\n'
+
+    client.exec_inspect = lambda id: {'ExitCode': 3}
+    with raises(CommandError) as exc:
+        session.execute_command(['ls'])
+    assert exc.value.code == 3
+    assert exc.value.stdout == out
+    assert exc.value.stderr == err
+
+
+@mark.skipif_no_docker_dependencies
+def test_connect_server_side_filters():
+    from ..docker_container import DockerContainer
+
+    containers = MagicMock(return_value=[
+        {'Id': '326b0fdfbf83', 'Names': ['/my.container'],
+         'State': 'running'}])
+    with patch('docker.APIClient') as client:
+        client.return_value = MagicMock(containers=containers)
+        resource = DockerContainer(name='my.container',
+                                   engine_url='tcp://127.0.0.1:2375')
+        resource.connect()
+        assert resource.id == '326b0fdfbf83'
+        containers.assert_called_once_with(
+            all=True, filters={'name': r'^/my\.container$'})
+
+        containers.reset_mock()
+        assert DockerContainer.is_container_running(
+            'my.container', base_url='tcp://127.0.0.1:2375')
+        containers.assert_called_once_with(
+            all=False,
+            filters={'name': r'^/my\.container$', 'status': 'running'})
+
+        # A container whose ID only partially matches is not taken.
+        resource = DockerContainer(name='my.container', id='326c',
+                                   engine_url='tcp://127.0.0.1:2375')
+        resource.connect()
+        assert resource.id is None
+
+        # All of the above shared a single client.
+        client.assert_called_once_with(base_url='tcp://127.0.0.1:2375')
+
+
+@mark.skipif_no_docker_dependencies
+def test_get_client_from_env():
+    from ..docker_container import clear_clients
+    from ..docker_container import get_client
+
+    clear_clients()
+    try:
+        with patch.dict(os.environ, {'DOCKER_HOST': 'tcp://10.0.0.1:2375'}), \
+                patch('docker.APIClient') as client:
+            get_client()
+            get_client('tcp://127.0.0.1:2375')
+            assert client.call_args_list == [
+                call(base_url='tcp://10.0.0.1:2375'),
+                call(base_url='tcp://127.0.0.1:2375')]
+    finally:
+        clear_clients()
@@ -0,0 +1,143 @@
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the reproman package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import yaml
+
+import pytest
+
+from reproman.resource.base import ResourceManager
+from reproman.resource.inventory import SQLiteInventory
+from reproman.support.exceptions import MultipleResourceMatches
+from reproman.support.exceptions import ResourceError
+from reproman.support.exceptions import ResourceNotFoundError
+
+
+def shell_config(name, id_):
+    return {"name": name, "type": "shell", "id": id_, "status": "available"}
+
+
+def test_sqlite_inventory(tmpdir):
+    path = str(tmpdir.join("sub", "inventory.db"))
+    inventory = SQLiteInventory(path)
+    assert list(inventory) == []
+    inventory["b"] = shell_config("b", "id-b")
+    inventory["a"] = shell_config("a", "id-a")
+    # Unsaved changes are visible...
+    assert list(inventory) == ["a", "b"]
+    assert inventory.find("id", "id-", prefix=True) == \
+        [("a", inventory["a"]), ("b", inventory["b"])]
+    # ... but not to others.
+    assert list(SQLiteInventory(path)) == []
+    inventory.save()
+
+    other = SQLiteInventory(path)
+    assert list(other) == ["a", "b"]
+    assert other.find("name", "a") == [("a", shell_config("a", "id-a"))]
+    assert other.find("id", "id-b") == [("b", shell_config("b", "id-b"))]
+    assert other.find("type", "shell", prefix=True)[1][0] == "b"
+    assert other.find("id", "id-c") == []
+    with pytest.raises(KeyError):
+        other["c"]
+
+    # Only changed rows are written, so concurrent updates of other
+    # resources are kept.
+    inventory["a"]["status"] = "stopped"
+    other["b"]["status"] = "stopped"
+    other.save()
+    inventory.save()
+    fresh = SQLiteInventory(path)
+    assert fresh["a"]["status"] == "stopped"
+    assert fresh["b"]["status"] == "stopped"
+
+    del fresh["a"]
+    assert list(fresh) == ["b"]
+    fresh.save()
+    assert list(SQLiteInventory(path)) == ["b"]
+
+
+def test_sqlite_inventory_concurrent_changes(tmpdir):
+    path = str(tmpdir.join("inventory.db"))
+    inventory = SQLiteInventory(path)
+    inventory["a"] = shell_config("a", "id-a")
+    inventory.save()
+
+    # Changes of different keys of the same resource are merged.
+    one, two = SQLiteInventory(path), SQLiteInventory(path)
+    one["a"]["status"] = "stopped"
+    two["a"]["status_time"] = 1
+    one.save()
+    two.save()
+    assert two["a"]["status"] == "stopped"
+    assert SQLiteInventory(path)["a"] == dict(shell_config("a", "id-a"),
+                                              status="stopped",
+                                              status_time=1)
+
+    # Changes of the same key conflict, and nothing is written.
+    one, two = SQLiteInventory(path), SQLiteInventory(path)
+    one["a"]["status"] = "running"
+    two["a"]["status"] = "terminated"
+    two["b"] = shell_config("b", "id-b")
+    one.save()
+    with pytest.raises(ResourceError):
+        two.save()
+    fresh = SQLiteInventory(path)
+    assert fresh["a"]["status"] == "running"
+    assert list(fresh) == ["a"]
+
+    # So does changing a resource that another process removed.
+    one, two = SQLiteInventory(path), SQLiteInventory(path)
+    del one["a"]
+    two["a"]["status"] = "stopped"
+    one.save()
+    with pytest.raises(ResourceError):
+        two.save()
+    assert list(SQLiteInventory(path)) == []
+
+
+def test_sqlite_inventory_yaml(tmpdir):
+    yaml_path = str(tmpdir.join("inventory.yml"))
+    with open(yaml_path, "w") as fp:
+        yaml.safe_dump({"a": shell_config("a", "id-a")}, fp)
+    inventory = SQLiteInventory(str(tmpdir.join("other.db")))
+    inventory.import_yaml(yaml_path)
+    assert inventory["a"] == shell_config("a", "id-a")
+
+    export_path = str(tmpdir.join("export.yml"))
+    inventory.export_yaml(export_path)
+    with open(export_path) as fp:
+        assert yaml.safe_load(fp) == {"a": shell_config("a", "id-a")}
+
+
+def test_resource_manager_sqlite(tmpdir):
+    yaml_path = str(tmpdir.join("inventory.yml"))
+    with open(yaml_path, "w") as fp:
+        yaml.safe_dump({"a": shell_config("a", "0-id-a"),
+                        "b": shell_config("b", "0-id-b")}, fp)
+    path = str(tmpdir.join("inventory.db"))
+    # The existing YAML inventory is imported.
+    manager = ResourceManager(path)
+    assert isinstance(manager.inventory, SQLiteInventory)
+    assert sorted(manager) == ["a", "b"]
+
+    assert manager.get_resource("a").id == "0-id-a"
+    assert manager.get_resource("0-id-b").name == "b"
+    assert manager.get_resource("0-id-a", "id").name == "a"
+    with pytest.raises(MultipleResourceMatches):
+        manager.get_resource("0-id")
+    with pytest.raises(ResourceNotFoundError):
+        manager.get_resource("c")
+
+    manager.inventory["a"]["access_key_id"] = "secret"
+    manager.inventory["b"]["id"] = None
+    manager.save_inventory()
+    manager = ResourceManager(path)
+    assert list(manager) == ["a"]
+    assert "access_key_id" not in manager.inventory["a"]
+
+    manager.delete(manager.get_resource("a"), inventory_only=True)
+    assert list(ResourceManager(path)) == []
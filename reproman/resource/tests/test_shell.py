@@ -12,19 +12,25 @@ import pytest
 import re
 import tempfile
 from pytest import raises
-from unittest.mock import patch, call
+from unittest.mock import patch
 
 from ...utils import merge_dicts
 from ...utils import swallow_logs
 from ...tests.utils import assert_in
 from ...cmd import Runner
+from ...support.exceptions import CommandError
 from ..shell import Shell, ShellSession
 from .test_session import check_session_passing_envvars
 
 
 def test_shell_class(resman):
 
-    with patch.object(Runner, 'run', return_value='installed package') as runner, \
+    # Output of the two commands executed as one batch below.
+    batch_out = ("installed package\n== =ReproMan batch= == 0 0\n"
+                 "installed package\n== =ReproMan batch= == 1 0\n")
+    batch_err = "\n== =ReproMan batch= == 0\n\n== =ReproMan batch= == 1\n"
+    with patch.object(Runner, 'run', return_value=(batch_out, batch_err)) \
+            as runner, \
             swallow_logs(new_level=logging.DEBUG) as log:
 
         # Test running some install commands.
@@ -39,12 +45,13 @@ def test_shell_class(resman):
         command = ['apt-get', 'install', 'xeyes']
         shell.add_command(command)
         shell.execute_command_buffer()
-        common_kwargs = dict(cwd=None, expect_fail=True, expect_stderr=True)
-        calls = [
-            call(['apt-get', 'install', 'xeyes'], **common_kwargs),
-            call(['apt-get', 'install', 'bc'], **common_kwargs),
-        ]
-        runner.assert_has_calls(calls, any_order=True)
+        # Both commands are sent in a single call.
+        assert runner.call_count == 1
+        args, kwargs = runner.call_args
+        assert args[0][:2] == ['/bin/sh', '-c']
+        assert "apt-get install bc" in args[0][2]
+        assert "apt-get install xeyes" in args[0][2]
+        assert kwargs == dict(cwd=None, expect_fail=True, expect_stderr=True)
         assert_in("Running command '['apt-get', 'install', 'bc']'", log.lines)
         assert_in("Running command '['apt-get', 'install', 'xeyes']'", log.lines)
 
@@ -126,6 +133,41 @@ def test_session_passing_envvars():
     check_session_passing_envvars(ShellSession())
 
 
+def test_execute_many():
+    session = ShellSession()
+    assert session.execute_many([]) == []
+    results = session.execute_many(
+        [["echo", "one two"],
+         "printf 'no newline'",
+         "echo err >&2; exit 3",
+         ["sh", "-c", "echo $REPROMAN_TEST_VAR"],
+         # Commands are independent of each other.
+         "cd /; exit 0",
+         "test \"$PWD\" != /"],
+        env={"REPROMAN_TEST_VAR": "it's set"})
+    assert results == [("one two\n", "", 0),
+                       ("no newline", "", 0),
+                       ("", "err\n", 3),
+                       ("it's set\n", "", 0),
+                       ("", "", 0),
+                       ("", "", 0)]
+
+    results = session.execute_many(["true", "false", "echo not run"],
+                                   stop_on_error=True)
+    assert results == [("", "", 0), ("", "", 1)]
+
+
+def test_execute_command_buffer_failure(resman):
+    shell = resman.factory({'name': 'my-shell', 'type': 'shell'})
+    shell.add_command(["true"])
+    shell.add_command(["sh", "-c", "echo bad >&2; exit 2"])
+    shell.add_command(["touch", "/should/not/be/run"])
+    with raises(CommandError) as exc:
+        shell.execute_command_buffer()
+    assert exc.value.code == 2
+    assert exc.value.stderr == "bad\n"
+
+
 def test_shell_resource(resman):
 
     config = {
@@ -149,3 +191,63 @@ def test_shell_resource(resman):
         resource.get_session(pty=True)
     with raises(NotImplementedError):
         resource.get_session(pty=False, shared=True)
+
+
+def test_query_envvars_cached(resource_test_dir):
+    session = ShellSession()
+    with patch.object(session, "execute_command",
+                      wraps=session.execute_command) as exec_cmd:
+        env = session.query_envvars()
+        # Callers get a copy they are free to modify.
+        env["REPROMAN_NOT_CACHED"] = "1"
+        assert "REPROMAN_NOT_CACHED" not in session.query_envvars()
+        assert exec_cmd.call_count == 1
+
+        session.set_envvar("REPROMAN_TEST_VAR", "set")
+        assert session.query_envvars()["REPROMAN_TEST_VAR"] == "set"
+        assert exec_cmd.call_count == 2
+
+        script = os.path.join(resource_test_dir, "source-me.sh")
+        with open(script, "w") as f:
+            f.write("export REPROMAN_SOURCED=yes\n")
+        # The original environment comes from the cache.
+        session.source_script(script)
+        assert exec_cmd.call_count == 3
+        assert session.query_envvars()["REPROMAN_SOURCED"] == "yes"
+        assert exec_cmd.call_count == 4
+
+
+def test_query_envvars_remembers_command(tmpdir):
+    cmds_file = str(tmpdir.join("environ_cmds.yml"))
+
+    class KeyedSession(ShellSession):
+        _GET_ENVIRON_CMD = ["false"]
+        _environ_cmd_key = "shell:test"
+
+    with patch("reproman.resource.session._environ_cmds_file",
+               return_value=cmds_file):
+        session = KeyedSession()
+        with patch.object(session, "execute_command",
+                          wraps=session.execute_command) as exec_cmd:
+            assert "PATH" in session.query_envvars()
+        # "false" failed, so the alternative was used and remembered.
+        assert exec_cmd.call_count == 2
+        assert session._GET_ENVIRON_CMD == KeyedSession._ALT_GET_ENVIRON_CMD
+        assert os.path.exists(cmds_file)
+
+        session = KeyedSession()
+        with patch.object(session, "execute_command",
+                          wraps=session.execute_command) as exec_cmd:
+            assert "PATH" in session.query_envvars()
+        exec_cmd.assert_called_once_with(KeyedSession._ALT_GET_ENVIRON_CMD)
+
+
+def test_iter_command_output():
+    session = ShellSession()
+    session.set_envvar("REPROMAN_TEST_VAR", "set")
+    output = list(session.iter_command_output(
+        ["sh", "-c", "echo $REPROMAN_TEST_VAR; echo $OTHER >&2"],
+        env={"OTHER": "other"}))
+    assert sorted(output) == [("stderr", "other\n"), ("stdout", "set\n")]
+    with raises(CommandError):
+        list(session.iter_command_output(["false"]))
@@ -99,3 +99,60 @@ def test_singularity_resource_class(tmpdir):
         # Test retrieving info from a non-existent instance.
         info = resource.get_instance_info()
         assert info is None
+
+
+def test_singularity_copy_local(tmpdir):
+    from ..singularity import _copy_local
+    from ...tests.utils import create_tree
+
+    tmpdir = str(tmpdir)
+    create_tree(tmpdir, {"src": {"a": "a", "sub": {"b": "b"}},
+                         "dest": {"c": "c", "sub": {"d": "d"}}})
+    src = op.join(tmpdir, "src")
+    dest = op.join(tmpdir, "dest")
+    _copy_local(src, dest)
+    for path in ["a", "c", op.join("sub", "b"), op.join("sub", "d")]:
+        assert op.exists(op.join(dest, path))
+    # Copying a file onto itself is a no-op.
+    _copy_local(op.join(src, "a"), op.join(src, "a"))
+    _copy_local(op.join(src, "a"), op.join(tmpdir, "a-copy"))
+    with open(op.join(tmpdir, "a-copy")) as fh:
+        assert fh.read() == "a"
+
+
+def test_singularity_is_shared(tmpdir):
+    import os
+    tmpdir = str(tmpdir)
+    st = os.stat(tmpdir)
+    assert SingularitySession._is_shared(tmpdir,
+                                         (st.st_dev, st.st_ino, True))
+    assert not SingularitySession._is_shared(tmpdir,
+                                             (st.st_dev, st.st_ino + 1, True))
+    assert not SingularitySession._is_shared(tmpdir, None)
+    assert not SingularitySession._is_shared(op.join(tmpdir, "missing"),
+                                             (st.st_dev, st.st_ino, True))
+
+
+def test_singularity_session_remembers_environ_cmd(tmpdir):
+    from unittest.mock import patch
+    from ..shell import ShellSession
+
+    cmds_file = str(tmpdir.join("environ_cmds.yml"))
+    with patch("reproman.resource.session._environ_cmds_file",
+               return_value=cmds_file):
+        session = SingularitySession("instance0")
+        assert session._environ_cmd_key == "singularity:instance0"
+        session._GET_ENVIRON_CMD = ["false"]
+        # Run the commands on the host instead of in an instance.
+        with patch.object(session, "_execute_command",
+                          ShellSession()._execute_command):
+            assert "PATH" in session.query_envvars()
+
+        other = SingularitySession("instance1")
+        assert other._environ_cmd_key != session._environ_cmd_key
+        session = SingularitySession("instance0")
+        with patch.object(session, "execute_command",
+                          return_value=("PATH=/bin\0", "")) as exec_cmd:
+            assert session.query_envvars() == {"PATH": "/bin"}
+        exec_cmd.assert_called_once_with(
+            SingularitySession._ALT_GET_ENVIRON_CMD)
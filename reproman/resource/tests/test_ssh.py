@@ -137,3 +137,41 @@ def test_ssh_resource(setup_ssh, resman):
 
     # resource.get_session()
     # assert type(resource._transport) == paramiko.Transport
+
+
+def test_ssh_session_iter_command_output():
+    from ..ssh import SSHSession
+
+    class FakeResult(object):
+        def __init__(self, return_code, stdout, stderr):
+            self.return_code = return_code
+            self.stdout = stdout
+            self.stderr = stderr
+
+    class FakeConnection(object):
+        def __init__(self, return_code):
+            self.return_code = return_code
+            self.commands = []
+
+        def run(self, command, out_stream, err_stream, **kwargs):
+            self.commands.append(command)
+            for chunk in ["o", "ne\ntw", "o\nthree"]:
+                out_stream.write(chunk)
+            err_stream.write("err\n")
+            return FakeResult(self.return_code, "one\ntwo\nthree", "err\n")
+
+    connection = FakeConnection(0)
+    session = SSHSession(connection=connection)
+    output = list(session.iter_command_output(["echo", "a b"], cwd="/tmp"))
+    assert [line for name, line in output if name == "stdout"] == \
+        ["one\n", "two\n", "three"]
+    assert [line for name, line in output if name == "stderr"] == ["err\n"]
+    assert connection.commands == ["cd /tmp && echo 'a b'"]
+
+    session = SSHSession(connection=FakeConnection(2))
+    output = []
+    with raises(CommandError) as cme:
+        for item in session.iter_command_output("false"):
+            output.append(item)
+    assert cme.value.code == 2
+    assert len(output) == 4
@@ -6,7 +6,9 @@ set -eu
 
 jobid={{ _jobid }}
 subjob=$1
-num_subjobs={{ _num_subjobs }}
+# The number of subjobs that are run, which is less than the total if some
+# were found in the run cache or are not rerun.
+num_run={{ _num_run }}
 
 metadir={{ shlex_quote(_meta_directory) }}
 rootdir={{ shlex_quote(root_directory) }}
@@ -15,6 +17,51 @@ workdir={{ shlex_quote(working_directory) }}
 _reproman_cmd_idx=$(($subjob + 1))
 export _reproman_cmd_idx
 
+# The subjob that finishes last, whichever index it has, runs the post-command
+# steps.  Each subjob adds an entry to the barrier directory when it exits,
+# also if it fails before running the command or is terminated, and then
+# counts the entries.  Creating a file or a directory is atomic on NFS, so no
+# lock is needed (flock may not work there, e.g., on mounts without lock
+# support, and a lock that is left behind by a killed subjob would block the
+# others).  If more than one subjob sees all entries, the one that creates
+# "$barrier.done" runs the post-command steps.
+barrier="$rootdir/barriers/$jobid"
+stage=pre-command
+
+finish () {
+    code=$?
+    trap - EXIT
+    case $stage in
+        pre-command)
+            echo "pre-command failure" >"$metadir/status.$subjob"
+            mkdir -p "$metadir/failed" && touch "$metadir/failed/$subjob";;
+        command)
+            echo "failed: $code" >"$metadir/status.$subjob"
+            mkdir -p "$metadir/failed" && touch "$metadir/failed/$subjob";;
+    esac
+
+    mkdir -p "$barrier"
+    touch "$barrier/$subjob"
+    nfinished=$(($(ls "$barrier" | wc -l)))
+    if test $nfinished -ge $num_run && mkdir "$barrier.done" 2>/dev/null
+    then
+        # "$barrier.done" is kept so that a subjob that counted all entries
+        # before they were removed doesn't run the post-command steps again.
+        rm -rf "$barrier"
+        cd "$workdir"
+        echo "[ReproMan] post-command..."
+
+{% block post_command %}
+{% endblock %}
+
+        mkdir -p "$rootdir/completed/"
+        touch "$rootdir/completed/$jobid"
+    fi
+}
+
+trap finish EXIT
+trap 'exit 143' HUP INT TERM
+
 echo "submitted" >"$metadir/status.$subjob"
 echo "[ReproMan] pre-command..."
 
@@ -32,10 +79,10 @@ cmd=$(get_command)
 if test -z "$cmd"
 then
     echo "[ReproMan] failed getting command at position $_reproman_cmd_idx" >&2
-    echo "pre-command failure" >"$metadir/status.$subjob"
     exit 1
 fi
 
+stage=command
 echo "running" >"$metadir/status.$subjob"
 echo "[ReproMan] executing command $cmd"
 echo "[ReproMan] ... within $PWD"
@@ -45,28 +92,4 @@ echo "[ReproMan] ... within $PWD"
     (echo "failed: $?" >"$metadir/status.$subjob";
      mkdir -p "$metadir/failed" && touch "$metadir/failed/$subjob")
 {% endblock %}
-
-if test $num_subjobs -eq $_reproman_cmd_idx
-then
-# Not all jobs should do the cleanup. Ideally none of them should and there
-# should be some post-job cleanup triggered through the batch system. But, at
-# least for now, below is a brittle solution were the last job waits until it
-# sees that all other jobs have exited and then runs the post-command stuff.
-nstatus () {
-    grep -E '^(succeed|fail)' "$metadir"/status.* | wc -l
-}
-
-echo "[ReproMan] waiting for all jobs to complete before running post-command..."
-while test $(nstatus) -lt $num_subjobs
-do
-    sleep 1
-done
-
-echo "[ReproMan] post-command..."
-
-{% block post_command %}
-{% endblock %}
-
-mkdir -p "$rootdir/completed/"
-touch "$rootdir/completed/$jobid"
-fi
+stage=post-command
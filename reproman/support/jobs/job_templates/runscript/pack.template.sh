@@ -0,0 +1,42 @@
+#!/bin/sh
+# Run the subjobs of one array task of a packed job.  Array task N runs
+# subjobs N * pack_size through (N + 1) * pack_size - 1, each with the
+# runscript and its own status, stdout, and stderr files.  If only some
+# subjobs are run (e.g., because the others were found in the run cache or
+# are not rerun), these are positions in the "subjobs" file, which lists
+# them.
+
+set -u
+
+metadir={{ shlex_quote(_meta_directory) }}
+pack_size={{ _pack_size }}
+pack_parallel={{ _pack_parallel }}
+num_run={{ _num_run }}
+
+pos=$(($1 * $pack_size))
+end=$(($pos + $pack_size))
+if test $end -gt $num_run
+then
+    end=$num_run
+fi
+
+# Run up to pack_parallel subjobs at a time.
+nrunning=0
+while test $pos -lt $end
+do
+{% if _run_subset %}
+    subjob=$(sed -n "$(($pos + 1))p" "$metadir/subjobs")
+{% else %}
+    subjob=$pos
+{% endif %}
+    "$metadir/runscript" $subjob \
+        1>"$metadir/stdout.$subjob" 2>"$metadir/stderr.$subjob" &
+    nrunning=$(($nrunning + 1))
+    if test $nrunning -ge $pack_parallel
+    then
+        wait
+        nrunning=0
+    fi
+    pos=$(($pos + 1))
+done
+wait
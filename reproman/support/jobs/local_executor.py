@@ -0,0 +1,164 @@
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the reproman package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Run the subjobs of a local job.
+
+The local submission template copies this file to the job's meta directory on
+the resource and runs it in the background.  It runs "runscript N" for each
+subjob N, writing the output to stdout.N and stderr.N, with as many subjobs
+at once as the CPUs and, optionally, the available memory allow.
+
+This runs on the resource with whatever Python 3 is there, so it must not
+import anything outside of the standard library.
+"""
+
+import argparse
+import os
+import os.path as op
+import re
+import signal
+import subprocess
+import sys
+import time
+
+POLL_INTERVAL = 0.2
+
+_UNITS = {"": 1, "K": 1. / 1024, "M": 1, "G": 1024, "T": 1024 ** 2}
+
+
+def parse_memory(value):
+    """Convert a memory request like "512", "512MB", or "4G" to MiB.
+
+    Values without a unit are taken to be in MiB, as for Condor's
+    request_memory.
+    """
+    match = re.match(r"^\s*([0-9.]+)\s*([KMGT]?)I?B?\s*$", value.upper())
+    if not match:
+        raise ValueError("Invalid memory request: {}".format(value))
+    return float(match.group(1)) * _UNITS[match.group(2)]
+
+
+def available_memory():
+    """Return the available memory in MiB, or None if it is unknown.
+    """
+    try:
+        with open("/proc/meminfo") as fh:
+            for line in fh:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024.
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def get_max_procs(cpus_per_subjob=1):
+    try:
+        ncpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        ncpus = os.cpu_count() or 1
+    return max(1, ncpus // max(1, cpus_per_subjob))
+
+
+def run_subjobs(meta_directory, num_subjobs, max_procs, memory=None,
+                subjobs=None):
+    """Run the subjobs, returning once all of them have exited.
+
+    Parameters
+    ----------
+    meta_directory : str
+    num_subjobs : int
+    max_procs : int
+        Maximum number of subjobs to run at once.
+    memory : float, optional
+        Memory in MiB that each subjob needs.  A subjob is started only if
+        this much memory is available or if no other subjob is running.
+    subjobs : list of int, optional
+        Run only these subjobs instead of all `num_subjobs`.
+
+    Returns
+    -------
+    The number of subjobs that exited with a non-zero status.
+    """
+    runscript = op.join(meta_directory, "runscript")
+    pending = list(range(num_subjobs) if subjobs is None else subjobs)
+    running = {}
+    nfailed = 0
+
+    def terminate(signum, frame):
+        for proc in running.values():
+            proc.terminate()
+        sys.exit(128 + signum)
+
+    handlers = {signum: signal.signal(signum, terminate)
+                for signum in [signal.SIGTERM, signal.SIGINT]}
+    try:
+        while pending or running:
+            while pending and len(running) < max_procs:
+                if memory and running:
+                    avail = available_memory()
+                    if avail is not None and avail < memory:
+                        break
+                idx = pending.pop(0)
+                with open(op.join(meta_directory, "stdout.{}".format(idx)),
+                          "wb") as out, \
+                        open(op.join(meta_directory, "stderr.{}".format(idx)),
+                             "wb") as err:
+                    running[idx] = subprocess.Popen(
+                        [runscript, str(idx)], stdout=out, stderr=err,
+                        stdin=subprocess.DEVNULL)
+                if memory:
+                    # Give the subjob a chance to allocate its memory before
+                    # checking what is left.
+                    time.sleep(POLL_INTERVAL)
+            time.sleep(POLL_INTERVAL)
+            for idx, proc in list(running.items()):
+                if proc.poll() is not None:
+                    del running[idx]
+                    if proc.returncode:
+                        nfailed += 1
+                        print("Subjob {} exited with {}"
+                              .format(idx, proc.returncode), file=sys.stderr)
+    finally:
+        for signum, handler in handlers.items():
+            signal.signal(signum, handler)
+    return nfailed
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("meta_directory")
+    parser.add_argument("num_subjobs", type=int)
+    parser.add_argument("--max-procs", type=int,
+                        help="Number of subjobs to run at once "
+                        "(default: number of CPUs / --cpus-per-subjob)")
+    parser.add_argument("--cpus-per-subjob", type=int, default=1)
+    parser.add_argument("--memory", type=parse_memory,
+                        help="Memory each subjob needs (e.g., 512M or 4G)")
+    parser.add_argument("--subjobs", metavar="FILE",
+                        help="File that lists the subjobs to run, one per "
+                        "line (default: all)")
+    args = parser.parse_args(args)
+
+    meta_directory = op.abspath(args.meta_directory)
+    with open(op.join(meta_directory, "local-executor.pid"), "w") as fh:
+        fh.write("{}\n".format(os.getpid()))
+    subjobs = None
+    if args.subjobs:
+        with open(args.subjobs) as fh:
+            subjobs = [int(line) for line in fh if line.strip()]
+    max_procs = args.max_procs or get_max_procs(args.cpus_per_subjob)
+    print("Running {} subjobs, at most {} at once"
+          .format(args.num_subjobs if subjobs is None else len(subjobs),
+                  max_procs))
+    sys.stdout.flush()
+    nfailed = run_subjobs(meta_directory, args.num_subjobs, max_procs,
+                          memory=args.memory, subjobs=subjobs)
+    return 1 if nfailed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
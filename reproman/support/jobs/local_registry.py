@@ -39,7 +39,7 @@ class LocalRegistry(object):
         return collections.OrderedDict((f, op.join(self._root, f))
                                        for f in sorted(files))
 
-    def register(self, jobid, kwds):
+    def register(self, jobid, kwds, replace=False):
         """Register a job.
 
         Parameters
@@ -48,12 +48,14 @@ class LocalRegistry(object):
             Full ID of the job.
         kwds : dict
             Values defined here will be dumped to the job file.
+        replace : bool, optional
+            Replace the record of a job that is already registered.
         """
         if not op.exists(self._root):
             os.makedirs(self._root)
 
         job_file = op.join(self._root, jobid)
-        if op.exists(job_file):
+        if op.exists(job_file) and not replace:
             raise ValueError("%s is already registered", jobid)
 
         with open(job_file, "w") as jfh:
@@ -20,10 +20,14 @@ This module has three main parts:
 """
 
 import abc
+import attr
+import base64
 import collections
 from contextlib import contextmanager
+import hashlib
 import json
 import logging
+import math
 import os
 import os.path as op
 import uuid
@@ -37,9 +41,14 @@ from reproman.dochelpers import borrowdoc
 from reproman.dochelpers import exc_str
 from reproman.utils import cached_property
 from reproman.utils import chpwd
+from reproman.utils import command_as_string
 from reproman.utils import write_update
 from reproman.resource.shell import ShellSession
 from reproman.resource.ssh import SSHSession
+from reproman.support.digests import Digester
+from reproman.support.jobs.status import format_subjob_summary
+from reproman.support.jobs.status import read_subjob_statuses
+from reproman.support.jobs.status import summarize_subjobs
 from reproman.support.jobs.submitters import SUBMITTERS
 from reproman.support.jobs.template import Template
 from reproman.support.exceptions import CommandError
@@ -48,6 +57,92 @@ from reproman.support.external_versions import external_versions
 
 lgr = logging.getLogger("reproman.support.jobs.orchestrators")
 
+# Prepare the failed subjobs of a completed job to be run again, resetting
+# their failed markers, the runscript's barrier, and the completion marker.
+# This is run along with the submit command, so the job still looks completed
+# if the submission fails before it.  The status files are left to the
+# runscript.
+_RESET_FAILED = """\
+for idx in {indices}; do rm -f {failed}/$idx; done
+rm -rf {barrier} {barrier}.done
+rm -f {completed}"""
+
+# Undo _RESET_FAILED after a failed submission.  The arguments are the job's
+# completion marker, its meta directory, and the indices of the subjobs.
+_RESTORE_FAILED = """\
+set -e
+completed=$1; meta=$2; shift 2
+mkdir -p "$meta/failed"
+for idx in "$@"; do
+  touch "$meta/failed/$idx"
+done
+touch "$completed"
+"""
+
+# The staging script is passed as a single argument, and Linux limits an
+# argument to 128 KiB.  Leave room for the submit command.
+_MAX_STAGING_SCRIPT = 96 * 1024
+
+
+def _get_int_parameter(spec, key, default=1):
+    """Return the positive integer job parameter `key` from `spec`.
+    """
+    value = spec.get(key)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        value = 0
+    if value < 1:
+        raise OrchestratorError(
+            "Job parameter {} must be a positive integer, got {!r}"
+            .format(key, spec[key]))
+    return value
+
+
+def _get_bool_parameter(spec, key, default=False):
+    """Return the boolean job parameter `key` from `spec`.
+    """
+    value = spec.get(key)
+    if value is None:
+        return default
+    value = str(value).lower()
+    if value in ["1", "true", "yes", "on"]:
+        return True
+    if value in ["0", "false", "no", "off"]:
+        return False
+    raise OrchestratorError(
+        "Job parameter {} must be a boolean (e.g., true or false), got {!r}"
+        .format(key, spec[key]))
+
+
+def _get_staging_script(files):
+    """Return a shell script that writes `files`.
+
+    Parameters
+    ----------
+    files : list of (str, str, bool) tuples
+        The path, content, and whether the file should be executable.  The
+        content is base64-encoded in the script, so it may contain any
+        character, including NUL.
+
+    Returns
+    -------
+    The script as a string.
+    """
+    lines = ["set -e"]
+    for directory in sorted({op.dirname(path) for path, _, _ in files}):
+        lines.append("mkdir -p {}".format(shlex_quote(directory)))
+    for path, content, executable in files:
+        lines.append("printf '%s' {} | base64 -d >{}".format(
+            base64.b64encode(content.encode("utf-8")).decode("ascii"),
+            shlex_quote(path)))
+        # Use the same modes as Session.put_text.
+        lines.append("chmod {} {}".format("775" if executable else "664",
+                                          shlex_quote(path)))
+    return "\n".join(lines)
+
 
 # Abstract orchestrators
 
@@ -110,6 +205,9 @@ class Orchestrator(object, metaclass=abc.ABCMeta):
             self._prepare_spec()
 
         self.template = None
+        # Subjobs whose results were taken from a run cache by
+        # prepare_remote() and that should not be submitted.
+        self.cached_subjobs = []
 
     @property
     @cached_property
@@ -217,52 +315,110 @@ class Orchestrator(object, metaclass=abc.ABCMeta):
         """Prepare remote for run.
         """
 
-    def submit(self):
+    def submit(self, subjobs=None, prelude=None):
         """Submit the job with `submitter`.
+
+        Parameters
+        ----------
+        subjobs : list of int, optional
+            Submit only these subjobs.  By default, all subjobs that were not
+            found in the run cache are submitted.
+        prelude : str, optional
+            Shell code to run right before the submit command, in the same
+            remote command.
         """
         njobs = len(self.job_spec["_command_array"])
-        if njobs > 1 and self.submitter.name == "local":
-            will_cite = op.join(self.home, ".parallel", "will-cite")
-            if not self.session.exists(will_cite):
-                lgr.info(
-                    "Submitter will use GNU Parallel.\n"
-                    "Its author asks that you cite it. "
-                    "Please run `parallel --citation` on the resource '%s'",
-                    self.resource.name)
+        if subjobs is None:
+            cached = set(self.cached_subjobs)
+            subjobs = [idx for idx in range(njobs) if idx not in cached]
+        else:
+            subjobs = sorted(subjobs)
+        run_subset = len(subjobs) < njobs
+        pack_size = 1
+        use_runpack = False
+        if self.submitter.name != "local":
+            # The local submitter's executor starts each subjob itself, so
+            # there is no scheduler overhead to save.
+            pack_size = max(1, min(_get_int_parameter(self.job_spec,
+                                                      "pack_size"),
+                                   len(subjobs)))
+            # Array tasks are mapped to the subjobs that are run by runpack.
+            use_runpack = pack_size > 1 or run_subset
         lgr.info("Submitting %s", self.jobid)
         templ = Template(
             **dict(self.job_spec,
                    _jobid=self.jobid,
                    _num_subjobs=njobs,
+                   # If only some subjobs are run, they are listed in the
+                   # "subjobs" file.
+                   _num_run=len(subjobs),
+                   _run_subset=run_subset,
+                   _use_runpack=use_runpack,
+                   _pack_size=pack_size,
+                   _pack_parallel=_get_int_parameter(self.job_spec,
+                                                     "pack_parallel"),
+                   _num_packs=int(math.ceil(len(subjobs) / pack_size)),
                    root_directory=self.root_directory,
                    working_directory=self.working_directory,
                    _meta_directory=self.meta_directory,
                    _meta_directory_rel=op.relpath(self.meta_directory,
                                                   self.working_directory)))
         self.template = templ
-        self.session.put_text(
-            templ.render_runscript("{}.template.sh".format(
-                self.template_name or self.name)),
-            op.join(self.meta_directory, "runscript"),
-            executable=True)
-
         submission_file = op.join(self.meta_directory, "submit")
-        self.session.put_text(
-            templ.render_submission("{}.template".format(self.submitter.name)),
-            submission_file,
-            executable=True)
-
-        self.session.put_text(
-            "\0".join(self.job_spec["_command_array"]),
-            op.join(self.meta_directory, "command-array"))
-
-        self.session.put_text(
-            yaml.safe_dump(self.as_dict()),
-            op.join(self.meta_directory, "spec.yaml"))
+        files = [
+            (op.join(self.meta_directory, "command-array"),
+             "\0".join(self.job_spec["_command_array"]),
+             False),
+            (op.join(self.meta_directory, "spec.yaml"),
+             yaml.safe_dump(self.as_dict()),
+             False)]
+        if subjobs:
+            files.extend([
+                (op.join(self.meta_directory, "runscript"),
+                 templ.render_runscript("{}.template.sh".format(
+                     self.template_name or self.name)),
+                 True),
+                (submission_file,
+                 templ.render_submission(
+                     "{}.template".format(self.submitter.name)),
+                 True)])
+            if run_subset:
+                files.append((op.join(self.meta_directory, "subjobs"),
+                              "".join("{}\n".format(idx) for idx in subjobs),
+                              False))
+            if use_runpack:
+                if pack_size > 1:
+                    lgr.info("Running %d commands in each of %d array tasks",
+                             pack_size, templ.kwds["_num_packs"])
+                files.append((op.join(self.meta_directory, "runpack"),
+                              templ.render_runscript("pack.template.sh"),
+                              True))
+        # Write the files and submit with a single remote command unless the
+        # files are too large to pass in a command.
+        setup = _get_staging_script(files)
+        if len(setup) > _MAX_STAGING_SCRIPT:
+            lgr.debug("Staging files are too large for a single command. "
+                      "Copying them separately")
+            for path, content, executable in files:
+                self.session.put_text(content, path, executable=executable)
+            setup = None
+        if prelude:
+            setup = "{}\n{}".format(setup, prelude) if setup else prelude
+
+        if not subjobs:
+            lgr.info("All subjobs of %s were found in the run cache. "
+                     "Nothing to submit", self.jobid)
+            completed = op.join(self.root_directory, "completed")
+            self.session.execute_command(
+                ["sh", "-c", "{}\nmkdir -p {}\ntouch {}".format(
+                    setup or "", shlex_quote(completed),
+                    shlex_quote(op.join(completed, self.jobid)))])
+            return
 
         subm_id = self.submitter.submit(
             submission_file,
-            submit_command=self.job_spec.get("submit_command"))
+            submit_command=self.job_spec.get("submit_command"),
+            setup=setup)
         if subm_id is None:
             lgr.warning("No submission ID obtained for %s", self.jobid)
         else:
@@ -272,6 +428,48 @@ class Orchestrator(object, metaclass=abc.ABCMeta):
                 subm_id,
                 op.join(self.meta_directory, "idmap")))
 
+    def rerun_failed(self):
+        """Resubmit the failed subjobs of a completed job.
+
+        The subjobs are run again by the same submitter in the same working
+        directory.  They keep their indices, so their new status and output
+        files replace those of the failed run.
+
+        Returns
+        -------
+        The resubmitted subjobs (list of int).
+        """
+        if not self.has_completed:
+            raise OrchestratorError(
+                "Job {} has not completed [status: {}]"
+                .format(self.jobid, self.status))
+        failed = self.get_failed_subjobs()
+        if not failed:
+            lgr.info("Job %s has no failed subjobs", self.jobid)
+            return []
+        lgr.info("Rerunning %d failed subjob%s of %s",
+                 len(failed), "" if len(failed) == 1 else "s", self.jobid)
+        completed = op.join(self.root_directory, "completed", self.jobid)
+        try:
+            self.submit(
+                subjobs=failed,
+                prelude=_RESET_FAILED.format(
+                    indices=" ".join(map(str, failed)),
+                    failed=shlex_quote(op.join(self.meta_directory, "failed")),
+                    barrier=shlex_quote(op.join(self.root_directory,
+                                                "barriers", self.jobid)),
+                    completed=shlex_quote(completed)))
+        except Exception:
+            lgr.warning("Resubmitting %s failed. Restoring its failed subjobs",
+                        self.jobid)
+            for chunk in _chunk_records([(str(idx),) for idx in failed]):
+                self.session.execute_command(
+                    ["sh", "-c", _RESTORE_FAILED, "sh", completed,
+                     self.meta_directory] +
+                    [idx for idx, in chunk])
+            raise
+        return failed
+
     def get_status(self, subjob=0):
         status_file = op.join(self.meta_directory,
                               "status.{:d}".format(subjob))
@@ -283,10 +481,23 @@ class Orchestrator(object, metaclass=abc.ABCMeta):
     @property
     def status(self):
         """Get information from job status file.
+
+        This is the status of the first subjob.  See `get_subjob_summary` for
+        the status of all subjobs.
         """
-        # FIXME: How to handle subjobs?
         return self.get_status()
 
+    def get_subjob_summary(self):
+        """Return the number of subjobs in each state and the failed ones.
+
+        All status files are read with a single command.  See
+        `reproman.support.jobs.status.summarize_subjobs` for the return value.
+        """
+        statuses = read_subjob_statuses(self.session,
+                                        [self.meta_directory])[0]
+        return summarize_subjobs(statuses,
+                                 len(self.job_spec["_command_array"]))
+
     @property
     def has_completed(self):
         """Has the run, including post-command processing, completed?
@@ -354,7 +565,13 @@ class Orchestrator(object, metaclass=abc.ABCMeta):
 
     def follow(self):
         """Follow command, exiting when post-command processing completes."""
-        self.submitter.follow()
+        progress = None
+        njobs = len(self.job_spec["_command_array"])
+        if njobs > 1:
+            def progress():
+                return format_subjob_summary(self.get_subjob_summary())
+        if len(self.cached_subjobs) < njobs:
+            self.submitter.follow(progress=progress)
         # We're done according to the submitter. This includes the
         # post-processing. Make sure it looks like it passed.
         if not self.has_completed:
@@ -403,13 +620,16 @@ class Orchestrator(object, metaclass=abc.ABCMeta):
         return self._get_io_set("outputs", subjobs)
 
     @abc.abstractmethod
-    def fetch(self, on_remote_finish=None):
+    def fetch(self, on_remote_finish=None, meta_only=False):
         """Fetch the submission result.
 
         In addition to doing whatever is need to fetch the results, this method
         should call `self.log_failed` right before it's finished working with
         the resource. Once finished with the resource, it should call
         `on_remote_finish`.
+
+        If `meta_only` is true, orchestrators that can should fetch only the
+        status, stdout, and stderr files of the subjobs.
         """
 
 
@@ -559,6 +779,13 @@ class DataladOrchestrator(Orchestrator, metaclass=abc.ABCMeta):
         d["_head"] = self.head
         return d
 
+    def rerun_failed(self):
+        # The post-command steps, which save the results of all subjobs at
+        # once, can't be repeated for some of them.
+        raise OrchestratorError(
+            "Rerunning failed subjobs is not supported by the {} orchestrator"
+            .format(self.name))
+
     def _prepare_spec(self):
         # Disable. _datalad_format_command() and _datalad_format_command()
         # handle this in __init__(). We can't just call those here because the
@@ -571,7 +798,8 @@ class DataladOrchestrator(Orchestrator, metaclass=abc.ABCMeta):
             gitignore,
             ("# Automatically created by ReproMan.\n"
              "# Do not change manually.\n"
-             "log.*\n"))
+             "log.*\n"
+             "pack-log.*\n"))
 
         gitattrs = op.join(self.ds.path, ".reproman", "jobs", ".gitattributes")
         write_update(
@@ -589,8 +817,225 @@ class DataladOrchestrator(Orchestrator, metaclass=abc.ABCMeta):
 # Orchestrator method mixins
 
 
+# Check which inputs need to be transferred.  The arguments are the input
+# store directory (empty if there is none) followed by the SHA-256 digest and
+# target path of each input.  For each input, print "same" if the target
+# already has the content, "linked" if it was linked from the store, or
+# "missing".  A stale target is removed so that it is not written through if
+# it is a link into the store.  Store entries are read-only, but that doesn't
+# stop root, so an entry is checked before it is linked and removed if it was
+# changed.
+_CHECK_INPUTS = """\
+sha256 () {
+  { sha256sum || shasum -a 256; } <"$1" 2>/dev/null | cut -d' ' -f1
+}
+store=$1; shift
+while [ $# -gt 0 ]; do
+  digest=$1; target=$2; shift 2
+  if [ -f "$target" ] && [ "$(sha256 "$target")" = "$digest" ]; then
+    echo same
+    continue
+  fi
+  rm -f "$target" 2>/dev/null
+  if [ -n "$store" ] && [ -f "$store/$digest" ] && \
+       [ "$(sha256 "$store/$digest")" != "$digest" ]; then
+    rm -f "$store/$digest"
+  fi
+  if [ -n "$store" ] && [ -f "$store/$digest" ] && \
+       mkdir -p "$(dirname "$target")" && \
+       ln -f "$store/$digest" "$target" 2>/dev/null; then
+    echo linked
+  else
+    echo missing
+  fi
+done"""
+
+# Move uploaded inputs into the store, write-protect them so that jobs can't
+# change them through their links, and link them to their targets.  The
+# arguments are the store directory followed by the uploaded file (empty if
+# the content was already moved into the store), digest, and target path of
+# each input.
+_LINK_INPUTS = """\
+set -e
+store=$1; shift
+while [ $# -gt 0 ]; do
+  part=$1; digest=$2; target=$3; shift 3
+  if [ -n "$part" ]; then
+    chmod a-w "$part"
+    mv -f "$part" "$store/$digest"
+  fi
+  mkdir -p "$(dirname "$target")"
+  ln -f "$store/$digest" "$target" 2>/dev/null || \
+    { rm -f "$target"; cp "$store/$digest" "$target"; }
+done"""
+
+# Keep the command line of each call well below the 128 KiB limit that Linux
+# puts on a single argument (which the whole command is for SSH sessions).
+_MAX_ARGS_LENGTH = 64 * 1024
+
+
+def _chunk_records(records, max_length=_MAX_ARGS_LENGTH):
+    """Split `records`, tuples of strings, into lists of limited total length.
+    """
+    chunk, length = [], 0
+    for record in records:
+        record_length = sum(len(x) + 3 for x in record)
+        if chunk and length + record_length > max_length:
+            yield chunk
+            chunk, length = [], 0
+        chunk.append(record)
+        length += record_length
+    if chunk:
+        yield chunk
+
+
+# Copy the results of subjobs from the run cache.  The arguments are the cache
+# directory, the working directory, the meta directory, and the index and
+# cache key of each subjob.  The index of each subjob whose results were
+# copied is printed.
+_RESTORE_CACHED = """\
+cache=$1; wdir=$2; meta=$3; shift 3
+mkdir -p "$wdir" "$meta"
+while [ $# -gt 0 ]; do
+  idx=$1; entry="$cache/$2"; shift 2
+  if [ -d "$entry" ] && cp -pR "$entry/files/." "$wdir" && \
+     cp "$entry/stdout" "$meta/stdout.$idx" && \
+     cp "$entry/stderr" "$meta/stderr.$idx"; then
+    echo cached >"$meta/status.$idx"
+    echo "$idx"
+  fi
+done"""
+
+
 class PrepareRemotePlainMixin(object):
 
+    @property
+    @cached_property
+    def input_store(self):
+        """Directory of the content-addressed input store on the resource.
+
+        This is None unless the "input_store" job parameter is true.
+        """
+        if _get_bool_parameter(self.job_spec, "input_store"):
+            return op.join(self.root_directory, ".reproman", "input-store")
+        return None
+
+    @property
+    @cached_property
+    def run_cache(self):
+        """Directory of the run cache on the resource.
+
+        This is None unless the "run_cache" job parameter is true.
+        """
+        if not _get_bool_parameter(self.job_spec, "run_cache"):
+            return None
+        if not isinstance(self, FetchPlainMixin):
+            # Other orchestrators would use cached results but never add
+            # any.
+            raise OrchestratorError(
+                "The run_cache job parameter is not supported by the {} "
+                "orchestrator".format(self.name))
+        return op.join(self.root_directory, ".reproman", "run-cache")
+
+    def _iter_input_files(self, subjobs=None, dirs=False):
+        """Yield the files in the inputs, descending into directories.
+
+        If `dirs` is true, yield the directories instead.
+        """
+        for path in sorted(self.get_inputs(subjobs)):
+            if op.isdir(path):
+                for root, _, fnames in os.walk(path):
+                    if dirs:
+                        yield root
+                        continue
+                    for fname in sorted(fnames):
+                        yield op.join(root, fname)
+            elif not dirs:
+                yield path
+
+    def _get_digests(self, paths):
+        """Return a dict that maps the local `paths` to their SHA-256 digest.
+        """
+        known = self.__dict__.setdefault("_digests", {})
+        digester = Digester(["sha256"])
+        for path in paths:
+            if path not in known:
+                known[path] = digester(path)["sha256"]
+        return {path: known[path] for path in paths}
+
+    def _put_inputs(self):
+        """Transfer the inputs to the working directory.
+
+        If the working directory exists or `input_store` is set, the inputs
+        are compared file by file, and files are not transferred if the
+        remote path already has the same content or, if `input_store` is
+        set, the content is in the store.
+        """
+        session = self.session
+        store = self.input_store
+
+        def remote_path(path):
+            return op.join(self.working_directory,
+                           op.relpath(path, self.local_directory))
+
+        if not store and not session.exists(self.working_directory):
+            # There is nothing that could be reused, so transfer each input,
+            # including directories, as a whole.
+            for path in sorted(self.get_inputs()):
+                session.put(path, remote_path(path))
+            return
+
+        inputs = [(path, remote_path(path))
+                  for path in self._iter_input_files()]
+        # Create the directories of the inputs up front so that empty ones
+        # exist too.
+        dirs = [(remote_path(path),)
+                for path in self._iter_input_files(dirs=True)]
+        for chunk in _chunk_records(dirs):
+            session.execute_command(
+                ["mkdir", "-p"] + [path for path, in chunk])
+
+        digests = self._get_digests([src for src, _ in inputs])
+        records = [(digests[src], dest) for src, dest in inputs]
+        states = []
+        try:
+            for chunk in _chunk_records(records):
+                out, _ = session.execute_command(
+                    ["sh", "-c", _CHECK_INPUTS, "sh", store or ""] +
+                    [x for record in chunk for x in record])
+                states.extend(out.split())
+        except CommandError as exc:
+            lgr.debug("Failed to check inputs on the resource: %s",
+                      exc_str(exc))
+        if len(states) != len(inputs):
+            states = ["missing"] * len(inputs)
+
+        missing = [(src, digest, dest)
+                   for (src, _), (digest, dest), state
+                   in zip(inputs, records, states) if state == "missing"]
+        lgr.info("Transferring %d of %d input files (%d unchanged, "
+                 "%d linked from the input store)",
+                 len(missing), len(inputs),
+                 states.count("same"), states.count("linked"))
+        if not store:
+            for src, _, dest in missing:
+                session.put(src, dest)
+            return
+
+        links = []
+        uploaded = set()
+        for src, digest, dest in missing:
+            part = ""
+            if digest not in uploaded:
+                part = op.join(store, "{}.part-{}".format(digest, self.jobid))
+                session.put(src, part)
+                uploaded.add(digest)
+            links.append((part, digest, dest))
+        for chunk in _chunk_records(links):
+            session.execute_command(
+                ["sh", "-c", _LINK_INPUTS, "sh", store] +
+                [x for record in chunk for x in record])
+
     def prepare_remote(self):
         """Prepare "plain" execution directory on remote.
 
@@ -600,13 +1045,73 @@ class PrepareRemotePlainMixin(object):
         # unlikely to happen with the default working directory but can easily
         # happen with user-supplied working directory.
 
+        # Check the parameter before anything is transferred.
+        run_cache = self.run_cache
         session = self.session
         if not session.exists(self.root_directory):
             session.mkdir(self.root_directory, parents=True)
 
-        for i in self.get_inputs():
-            session.put(i, op.join(self.working_directory,
-                                   op.relpath(i, self.local_directory)))
+        if self.get_inputs():
+            self._put_inputs()
+        if run_cache:
+            self._restore_from_run_cache()
+
+    def _get_run_cache_keys(self):
+        """Return the run cache key of each subjob.
+
+        The key is a hash of the command, the paths and content of the
+        inputs, the container, and the configuration of the resource.  It is
+        None for subjobs that cannot be cached because they have an output
+        outside of the working directory.
+        """
+        resource = attr.asdict(
+            self.resource, recurse=False,
+            filter=lambda a, _: not a.name.startswith("_") and
+            a.name not in ["id", "name", "status"])
+        keys = []
+        for idx, command in enumerate(self.job_spec["_command_array"]):
+            if any(op.isabs(o) or o.split(op.sep)[0] == op.pardir
+                   for o in self.get_outputs([idx])):
+                keys.append(None)
+                continue
+            inputs = self._get_digests(list(self._iter_input_files([idx])))
+            record = {
+                "command": command,
+                "inputs": sorted(
+                    [op.relpath(path, self.local_directory), digest]
+                    for path, digest in inputs.items()),
+                "container": self.job_spec.get("container"),
+                "resource": resource}
+            keys.append(hashlib.sha256(
+                json.dumps(record, sort_keys=True, default=str)
+                .encode("utf-8")).hexdigest())
+        return keys
+
+    def _restore_from_run_cache(self):
+        """Copy the results of subjobs found in the run cache.
+
+        The keys are stored in the job spec so that the results can be added
+        to the cache when the job is fetched.  The subjobs whose results were
+        copied are marked as "cached" and are not submitted.
+        """
+        keys = self._get_run_cache_keys()
+        self.job_spec["_run_cache_keys"] = keys
+        records = [(str(idx), key) for idx, key in enumerate(keys) if key]
+        cached = []
+        try:
+            for chunk in _chunk_records(records):
+                out, _ = self.session.execute_command(
+                    ["sh", "-c", _RESTORE_CACHED, "sh", self.run_cache,
+                     self.working_directory, self.meta_directory] +
+                    [x for record in chunk for x in record])
+                cached.extend(int(idx) for idx in out.split())
+        except CommandError as exc:
+            lgr.warning("Failed to look up subjobs in the run cache: %s",
+                        exc_str(exc))
+            cached = []
+        lgr.info("Found %d of %d subjobs in the run cache",
+                 len(cached), len(keys))
+        self.cached_subjobs = cached
 
 
 def _format_ssh_url(user, host, port, path):
@@ -699,11 +1204,12 @@ class PrepareRemoteDataladMixin(object):
                           for ln in failed_ref.strip().splitlines()]
         return failed
 
+    _git_status_cmd = ["git", "status", "--porcelain",
+                       "--ignore-submodules=all", "--untracked-files=normal"]
+
     def _assert_clean_repo(self, cwd=None):
-        cmd = ["git", "status", "--porcelain",
-               "--ignore-submodules=all", "--untracked-files=normal"]
         out, _ = self.session.execute_command(
-            cmd, cwd=cwd or self.working_directory)
+            self._git_status_cmd, cwd=cwd or self.working_directory)
         if out:
             raise OrchestratorError("Remote repository {} is dirty"
                                     .format(cwd or self.working_directory))
@@ -746,11 +1252,31 @@ class PrepareRemoteDataladMixin(object):
         # to stay, we should avoid this call for non-annex datasets.
         lgr.info("Adjusting state of remote dataset")
         self._execute_in_wdir(["git", "annex", "init"])
-        for res in self._execute_datalad_json_command(
-                ["subdatasets", "--fulfilled=true", "--recursive"]):
-            cwd = res["path"]
-            self._assert_clean_repo(cwd=cwd)
-            lgr.debug("Adjusting state of %s", cwd)
+        subdatasets = list(self._execute_datalad_json_command(
+            ["subdatasets", "--fulfilled=true", "--recursive"]))
+        if not subdatasets:
+            return
+
+        def in_dir(path, *commands):
+            return " && ".join(["cd " + shlex_quote(path)] +
+                               [command_as_string(c) for c in commands])
+
+        # Check and then adjust all subdatasets, each step in a single batch
+        # rather than with separate commands for each subdataset.
+        results = self.session.execute_many(
+            [in_dir(res["path"], self._git_status_cmd)
+             for res in subdatasets])
+        for res, (out, err, code) in zip(subdatasets, results):
+            if code:
+                raise OrchestratorError(
+                    "Failed to check status of {}: {}".format(res["path"], err))
+            if out:
+                raise OrchestratorError("Remote repository {} is dirty"
+                                        .format(res["path"]))
+
+        cmds = []
+        for res in subdatasets:
+            lgr.debug("Adjusting state of %s", res["path"])
             # "gitshasum" replaced "revision" in v0.12, with the old name kept
             # for compatibility until v0.14. Even though the minimum version
             # for DataLad in setup.py is above 0.12, support both keys until
@@ -758,14 +1284,15 @@ class PrepareRemoteDataladMixin(object):
             # gh-477).
             revision = res.get("gitshasum", res.get("revision"))
             assert revision, "bug: incorrectly assumed revision is in results"
-            cmds = [["git", "checkout", revision],
-                    ["git", "annex", "init"]]
-            for cmd in cmds:
-                try:
-                    out, _ = self.session.execute_command(
-                        cmd, cwd=cwd)
-                except CommandError as exc:
-                    raise OrchestratorError(str(exc))
+            cmds.append(in_dir(res["path"],
+                               ["git", "checkout", revision],
+                               ["git", "annex", "init"]))
+        results = self.session.execute_many(cmds, stop_on_error=True)
+        out, err, code = results[-1]
+        if code:
+            raise OrchestratorError(
+                "Failed to adjust state of {}: {}"
+                .format(subdatasets[len(results) - 1]["path"], err))
 
     def prepare_remote(self):
         """Prepare dataset sibling on remote.
@@ -858,26 +1385,105 @@ class PrepareRemoteDataladMixin(object):
             session.mkdir(self.meta_directory, parents=True)
 
 
-class FetchPlainMixin(object):
+# Add the results of subjobs to the run cache.  This is executed in the working
+# directory.  The arguments are the cache directory and the meta directory
+# followed by the cache key, index, number of outputs, and outputs of each
+# subjob.  A subjob is not added if any of its outputs is missing.
+_STORE_CACHED = """\
+cache=$1; meta=$2; shift 2
+while [ $# -gt 0 ]; do
+  key=$1; idx=$2; n=$3; shift 3
+  entry="$cache/$key"
+  part="$entry.part-$$"
+  ok=yes
+  rm -rf "$part"
+  mkdir -p "$part/files" && cp "$meta/stdout.$idx" "$part/stdout" && \
+    cp "$meta/stderr.$idx" "$part/stderr" || ok=
+  while [ $n -gt 0 ]; do
+    [ -n "$ok" ] && [ -e "$1" ] && mkdir -p "$part/files/$(dirname "$1")" && \
+      cp -pR "$1" "$part/files/$1" || ok=
+    shift; n=$((n - 1))
+  done
+  if [ -n "$ok" ] && [ ! -e "$entry" ] && mv "$part" "$entry"; then
+    echo "$idx"
+  else
+    rm -rf "$part"
+  fi
+done"""
+
+
+# Archive the results of a job.  This is executed in the working directory.
+# The arguments are the archive path, the relative meta directory, the
+# compression option for tar (or an empty string), and relative output paths.
+# Paths that do not exist are skipped.
+_ARCHIVE_RESULTS = """\
+set -e
+archive=$1; meta=$2; compress=$3; shift 3
+mkdir -p "$(dirname "$archive")"
+for f in "$@" "$meta"/status.* "$meta"/stdout.* "$meta"/stderr.*; do
+  if [ -e "$f" ] || [ -h "$f" ]; then printf '%s\\n' "$f"; fi
+done | tar -c $compress -f "$archive" -T -"""
+
+
+
+def _extract_archive(archive, path):
+    """Extract the tar file `archive` under `path`.
+
+    The archive is created on the resource, so members that would end up
+    outside of `path` are refused: absolute names, names with "..", links
+    that point outside, and files below such links.
 
-    def fetch(self, on_remote_finish=None):
-        """Get outputs from remote.
+    Raises
+    ------
+    OrchestratorError if the archive has such a member.
+    """
+    import tarfile
+    with tarfile.open(archive) as tar:
+        if hasattr(tarfile, "data_filter"):  # Python 3.12, 3.11.4, ...
+            try:
+                tar.extractall(path=path, filter="data")
+            except tarfile.FilterError as exc:
+                raise OrchestratorError(
+                    "Refusing to extract {}: {}".format(archive, exc))
+            return
+
+        root = op.realpath(path)
+
+        def outside(target):
+            target = op.realpath(target)
+            return target != root and not target.startswith(root + os.sep)
+
+        members = tar.getmembers()
+        for member in members:
+            dest = op.join(root, member.name)
+            if member.issym():
+                target = op.join(op.dirname(dest), member.linkname)
+            elif member.islnk():
+                target = op.join(root, member.linkname)
+            else:
+                target = dest
+            if op.isabs(member.name) or ".." in member.name.split("/") \
+                    or member.isdev() or outside(dest) or outside(target):
+                raise OrchestratorError(
+                    "Refusing to extract {}: {} would be outside of {}"
+                    .format(archive, member.name, path))
+        tar.extractall(path=path, members=members)
 
-        Parameters
-        ----------
-        on_remote_finish : callable, optional
-            Function to be called when work with the resource is finished. It
-            will be passed two arguments, the resource and the failed subjobs
-            (list of ints).
+
+class FetchPlainMixin(object):
+
+    def _fetch_files(self, outputs, meta=True):
+        """Get `outputs` and, if `meta` is true, the metadata files one by one.
         """
-        lgr.info("Fetching results for %s", self.jobid)
-        for o in self.get_outputs():
+        for o in outputs:
             self.session.get(
                 o if op.isabs(o) else op.join(self.working_directory, o),
                 # Make sure directory has trailing slash so that get doesn't
                 # treat it as the file.
                 op.join(self.local_directory, ""))
 
+        if not meta:
+            return
         for idx in range(len(self.job_spec["_command_array"])):
             for f in ["status", "stdout", "stderr"]:
                 self.session.get(
@@ -888,6 +1494,106 @@ class FetchPlainMixin(object):
                                        self.working_directory),
                             ""))
 
+    def _fetch_archive(self, outputs):
+        """Get `outputs` and the metadata files with a single archive.
+
+        Returns
+        -------
+        True if the files were fetched, or False if the archive could not be
+        created.
+        """
+        # Prefix paths with "./" so that tar doesn't take any for options.
+        paths = [op.join(op.curdir, o) for o in outputs]
+        if sum(len(p) + 3 for p in paths) > _MAX_ARGS_LENGTH:
+            return False
+        compress = _get_bool_parameter(self.job_spec, "compress_results",
+                                       default=True)
+        remote_archive = op.join(
+            self.root_directory, "outputs",
+            "{}-fetch.tar{}".format(self.jobid, ".gz" if compress else ""))
+        try:
+            self.session.execute_command(
+                ["sh", "-c", _ARCHIVE_RESULTS, "sh", remote_archive,
+                 op.join(op.curdir,
+                         op.relpath(self.meta_directory,
+                                    self.working_directory)),
+                 "-z" if compress else ""] + paths,
+                cwd=self.working_directory)
+        except CommandError as exc:
+            lgr.debug("Failed to archive results on the resource: %s",
+                      exc_str(exc))
+            return False
+
+        import tempfile
+        fd, local_archive = tempfile.mkstemp(prefix="reproman-fetch-")
+        os.close(fd)
+        try:
+            self.session.get(remote_archive, local_archive)
+            self.session.execute_command(["rm", "-f", remote_archive])
+            _extract_archive(local_archive, self.local_directory)
+        finally:
+            os.unlink(local_archive)
+
+        for o in outputs:
+            if not op.lexists(op.join(self.local_directory, o)):
+                lgr.warning("Output %s was not found on the resource", o)
+        return True
+
+    def _store_in_run_cache(self):
+        """Add the results of the subjobs that succeeded to the run cache.
+        """
+        keys = self.job_spec.get("_run_cache_keys")
+        if not (keys and self.run_cache):
+            return
+        statuses = read_subjob_statuses(self.session,
+                                        [self.meta_directory])[0]
+        records = []
+        for idx, key in enumerate(keys):
+            if key and statuses.get(idx) == "succeeded":
+                outputs = [op.join(op.curdir, o)
+                           for o in sorted(self.get_outputs([idx]))]
+                records.append((key, str(idx), str(len(outputs))) +
+                               tuple(outputs))
+        stored = []
+        try:
+            for chunk in _chunk_records(records):
+                out, _ = self.session.execute_command(
+                    ["sh", "-c", _STORE_CACHED, "sh", self.run_cache,
+                     self.meta_directory] +
+                    [x for record in chunk for x in record],
+                    cwd=self.working_directory)
+                stored.extend(out.split())
+        except CommandError as exc:
+            lgr.warning("Failed to add results to the run cache: %s",
+                        exc_str(exc))
+        lgr.info("Added %d of %d subjobs to the run cache",
+                 len(stored), len(records))
+
+    def fetch(self, on_remote_finish=None, meta_only=False):
+        """Get outputs from remote.
+
+        Parameters
+        ----------
+        on_remote_finish : callable, optional
+            Function to be called when work with the resource is finished. It
+            will be passed two arguments, the resource and the failed subjobs
+            (list of ints).
+        meta_only : bool, optional
+            Get only the status, stdout, and stderr files of the subjobs, not
+            the outputs.
+        """
+        lgr.info("Fetching results for %s", self.jobid)
+        outputs = [] if meta_only else sorted(self.get_outputs())
+        # Absolute outputs are placed in the local directory by their base
+        # name, which doesn't fit into the archive.
+        absolute = [o for o in outputs if op.isabs(o)]
+        relative = [o for o in outputs if not op.isabs(o)]
+        if self._fetch_archive(relative):
+            self._fetch_files(absolute, meta=False)
+        else:
+            self._fetch_files(absolute + relative)
+
+        self._store_in_run_cache()
         failed = self.get_failed_subjobs()
         self.log_failed(failed)
 
@@ -952,9 +1658,15 @@ def head_at(dataset, commit):
         yield moved
 
 
+def _warn_meta_only(orc, meta_only):
+    if meta_only:
+        lgr.warning("The %s orchestrator cannot fetch only the metadata. "
+                    "Fetching all results of %s", orc.name, orc.jobid)
+
+
 class FetchDataladPairMixin(object):
 
-    def fetch(self, on_remote_finish=None):
+    def fetch(self, on_remote_finish=None, meta_only=False):
         """Fetch the results from the remote dataset sibling.
 
         Parameters
@@ -963,10 +1675,13 @@ class FetchDataladPairMixin(object):
             Function to be called when work with the resource is finished. It
             will be passed two arguments, the resource and the failed subjobs
             (list of ints).
+        meta_only : bool, optional
+            Not supported. All results are fetched.
         """
         from datalad.support.exceptions import CommandError as DCError
 
         lgr.info("Fetching results for %s", self.jobid)
+        _warn_meta_only(self, meta_only)
         failed = self.get_failed_subjobs()
         resource_name = self.resource.name
         ref = self.job_refname
@@ -1015,15 +1730,18 @@ class FetchDataladPairMixin(object):
 
 class FetchDataladRunMixin(object):
 
-    def fetch(self, on_remote_finish=None):
+    def fetch(self, on_remote_finish=None, meta_only=False):
         """Fetch results tarball and inject run record into the local dataset.
 
         on_remote_finish : callable, optional
             Function to be called when work with the resource is finished. It
             will be passed two arguments, the resource and the failed subjobs
             (list of ints).
+        meta_only : bool, optional
+            Not supported. All results are fetched.
         """
         lgr.info("Fetching results for %s", self.jobid)
+        _warn_meta_only(self, meta_only)
         import tarfile
         tfile = "{}.tar.gz".format(self.jobid)
         remote_tfile = op.join(self.root_directory, "outputs", tfile)
@@ -1099,7 +1817,10 @@ class PlainOrchestrator(
     If no working directory is supplied via the `working_directory` job
     parameter, the remote directory is named with the job ID. Inputs are made
     available with a session.put(), and outputs are fetched with a
-    session.get().
+    session.get(). Inputs whose content is already in the working directory
+    are not transferred again. If the `input_store` job parameter is true,
+    inputs are also kept in a content-addressed store under the root
+    directory and linked into the working directory of later jobs.
 
     Note: This orchestrator may be sufficient for simple tasks, but using one
     of the DataLad orchestrators is recommended.
@@ -1175,7 +1896,7 @@ class DataladNoRemoteOrchestrator(DataladOrchestrator):
                 self.ds.get, "'datalad get' failed",
                 inputs, on_failure="ignore")
 
-    def fetch(self, on_remote_finish=None):
+    def fetch(self, on_remote_finish=None, meta_only=False):
         failed = self.get_failed_subjobs()
         self.log_failed(failed)
         if on_remote_finish:
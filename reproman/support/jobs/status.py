@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the reproman package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Query the status of many jobs at once.
+
+Resurrecting an orchestrator for each job to query its status means
+connecting to the resource, opening a session, reading the status file, and
+running a batch system query for every single job.  `query_statuses` instead
+groups the jobs by resource, opens one session per resource, reads the status
+files of all its jobs and their subjobs with one command, and runs one batch
+system query per submitter.
+"""
+
+from collections import defaultdict
+from collections import OrderedDict
+import logging
+import os.path as op
+
+from reproman.support.exceptions import CommandError
+from reproman.support.exceptions import OrchestratorError
+from reproman.support.jobs.submitters import SUBMITTERS
+
+lgr = logging.getLogger("reproman.support.jobs.status")
+
+# For each meta directory given as an argument, print the file name and first
+# line, separated by a tab, of every status file in it.  A line with a single
+# "." ends the output for a directory.
+_READ_SUBJOB_STATUSES = """\
+for d in "$@"; do
+  (cd "$d" 2>/dev/null &&
+   exec awk 'FNR == 1 {print FILENAME "\\t" $0}' status.* 2>/dev/null)
+  echo .
+done"""
+
+# The states of a subjob, in the order they are displayed.  "cached" subjobs
+# were not run because their results were found in the run cache.
+SUBJOB_STATES = ["submitted", "running", "succeeded", "cached", "failed",
+                 "unknown"]
+
+
+def read_subjob_statuses(session, meta_directories):
+    """Read the status files of all subjobs in `meta_directories`.
+
+    Parameters
+    ----------
+    session : Session
+    meta_directories : list of str
+
+    Returns
+    -------
+    A list with a dict for each directory that maps the subjob index to the
+    content of its status file.  Subjobs without a (non-empty) status file
+    are missing.
+    """
+    if not meta_directories:
+        return []
+    out, _ = session.execute_command(
+        ["sh", "-c", _READ_SUBJOB_STATUSES, "sh"] + list(meta_directories))
+    results = [{}]
+    for line in out.splitlines():
+        if line == ".":
+            results.append({})
+            continue
+        fname, _, status = line.partition("\t")
+        idx = fname[len("status."):]
+        if fname.startswith("status.") and idx.isdigit():
+            results[-1][int(idx)] = status.strip()
+    results = results[:len(meta_directories)]
+    return results + [{}] * (len(meta_directories) - len(results))
+
+
+def summarize_subjobs(statuses, num_subjobs):
+    """Summarize the statuses of a job's subjobs.
+
+    Parameters
+    ----------
+    statuses : dict
+        Maps subjob indices to statuses, as returned by
+        `read_subjob_statuses`.
+    num_subjobs : int
+
+    Returns
+    -------
+    A dict with the number of subjobs in each state in `SUBJOB_STATES` that
+    has any ("counts") and the sorted indices of the failed subjobs
+    ("failed").
+    """
+    counts = dict.fromkeys(SUBJOB_STATES, 0)
+    failed = []
+    for idx in range(num_subjobs):
+        status = statuses.get(idx) or "unknown"
+        # The runscript writes "failed: <exit code>" or, if it couldn't run
+        # the command, "pre-command failure".
+        if status.startswith("failed") or "failure" in status:
+            status = "failed"
+            failed.append(idx)
+        elif status not in counts:
+            status = "unknown"
+        counts[status] += 1
+    return {"counts": {state: n for state, n in counts.items() if n},
+            "failed": failed}
+
+
+def format_subjob_summary(summary):
+    """Format a summary returned by `summarize_subjobs` as one line.
+    """
+    counts = summary["counts"]
+    return "{} subjob{}: {}".format(
+        sum(counts.values()),
+        "" if sum(counts.values()) == 1 else "s",
+        ", ".join("{} {}".format(n, state) for state, n in counts.items()))
+
+
+def num_subjobs(job):
+    """Return the number of subjobs of the `job` record.
+    """
+    return job.get("_num_subjobs") or len(job.get("_command_array") or [0])
+
+
+def query_statuses(jobs, manager, needs_orchestrator=None):
+    """Query the status of `jobs`.
+
+    Parameters
+    ----------
+    jobs : list of dict
+        Job records as stored in the local registry.
+    manager : ResourceManager
+    needs_orchestrator : callable, optional
+        Called with a job record and the status read from its status file.
+        If it returns true, the job's status is reported as None so that the
+        caller can resurrect the orchestrator to find the status (e.g., from
+        a DataLad ref).
+
+    Returns
+    -------
+    An OrderedDict mapping job IDs to one of
+
+      - a tuple (orchestrator status, (normalized queried status, queried
+        status), subjob summary as returned by `summarize_subjobs`)
+      - None if the caller should resurrect the orchestrator to determine the
+        status
+      - an exception that was raised while querying the status of the job
+    """
+    results = OrderedDict((job["_jobid"], None) for job in jobs)
+    by_resource = defaultdict(list)
+    for job in jobs:
+        if not op.isdir(job["local_directory"]):
+            results[job["_jobid"]] = OrchestratorError(
+                "local directory for job {} no longer exists: {}"
+                .format(job["_jobid"], job["local_directory"]))
+        elif "_meta_directory" in job:
+            by_resource[job["resource_id"]].append(job)
+        # Otherwise, the record is too old to find the status file without
+        # the orchestrator.
+
+    for resource_id, resource_jobs in by_resource.items():
+        try:
+            resource = manager.get_resource(resource_id, "id")
+            resource.connect()
+            session = resource.get_session()
+            subjob_statuses = read_subjob_statuses(
+                session, [job["_meta_directory"] for job in resource_jobs])
+            by_submitter = defaultdict(list)
+            for job in resource_jobs:
+                by_submitter[job["submitter"] or "local"].append(job)
+            queried = {}
+            for name, subm_jobs in by_submitter.items():
+                subm_statuses = SUBMITTERS[name].status_many(
+                    session, [job.get("_submission_id") for job in subm_jobs])
+                for job in subm_jobs:
+                    queried[job["_jobid"]] = subm_statuses[
+                        job.get("_submission_id")]
+        except (CommandError, OrchestratorError) as exc:
+            lgr.debug("Failed to query jobs on %s at once: %s",
+                      resource_id, exc)
+            # Leave it to the orchestrators.
+            continue
+        except Exception as exc:
+            for job in resource_jobs:
+                results[job["_jobid"]] = exc
+            continue
+
+        for job, statuses in zip(resource_jobs, subjob_statuses):
+            # Like Orchestrator.status, report the status of the first
+            # subjob as the job's status.
+            orc_status = statuses.get(0) or "unknown"
+            if needs_orchestrator and needs_orchestrator(job, orc_status):
+                continue
+            results[job["_jobid"]] = (
+                orc_status, queried[job["_jobid"]],
+                summarize_subjobs(statuses, num_subjobs(job)))
+    return results
@@ -20,6 +20,7 @@ import time
 
 from reproman.cmd import CommandError
 from reproman.dochelpers import borrowdoc
+from reproman.utils import command_as_string
 
 
 lgr = logging.getLogger("reproman.support.jobs.submitters")
@@ -54,7 +55,7 @@ class Submitter(object, metaclass=abc.ABCMeta):
         """A list the defines the command used to submit the job.
         """
 
-    def submit(self, script, submit_command=None):
+    def submit(self, script, submit_command=None, setup=None):
         """Submit `script`.
 
         Parameters
@@ -63,14 +64,25 @@ class Submitter(object, metaclass=abc.ABCMeta):
             Submission script.
         submit_command : list or None, optional
             If specified, use this instead of `.submit_command`.
+        setup : str or None, optional
+            Shell code to run before submitting.  It is executed along with
+            the submit command in a single remote call.  The job is not
+            submitted if it fails.
 
         Returns
         -------
         submission ID (str) or, if one can't be determined, None.
         """
         lgr.info("Submitting %s", script)
-        out, _ = self.session.execute_command(
-            (submit_command or self.submit_command) + [script])
+        command = (submit_command or self.submit_command) + [script]
+        if setup:
+            command = ["sh", "-c",
+                       "{}\nexec {}".format(setup, command_as_string(command))]
+        out, err = self.session.execute_command(command)
+        if err and err.strip():
+            # E.g., warnings from the batch system or notices from the
+            # submission script.
+            lgr.info("Submission of %s reported: %s", script, err.strip())
         subm_id = out.rstrip()
         if subm_id:
             self.submission_id = subm_id
@@ -88,8 +100,60 @@ class Submitter(object, metaclass=abc.ABCMeta):
         None if one could not be determined.
         """
 
-    def follow(self):
+    @classmethod
+    def status_many(cls, session, submission_ids):
+        """Return the status of several jobs submitted in `session`.
+
+        Submitters that can query the batch system about several jobs at once
+        override this to do so with a single command.  The default queries
+        each job separately.
+
+        Parameters
+        ----------
+        session : Session
+        submission_ids : list of str
+
+        Returns
+        -------
+        A dict that maps each submission ID to a tuple as returned by
+        `status`.
+        """
+        statuses = {}
+        for subm_id in submission_ids:
+            submitter = cls(session)
+            submitter.submission_id = subm_id
+            statuses[subm_id] = submitter.status
+        return statuses
+
+    @classmethod
+    def _query_many(cls, session, command, submission_ids):
+        """Run `command` to query `submission_ids` at once.
+
+        Returns
+        -------
+        The output of `command` or, if it fails without any output, None.
+        The output of a failed command is returned because batch systems
+        commonly fail if any of the jobs is unknown to them, but still report
+        the others.
+        """
+        try:
+            out, _ = session.execute_command(command)
+        except CommandError as exc:
+            if not (exc.stdout or "").strip():
+                lgr.debug("Querying %d %s jobs at once failed: %s",
+                          len(submission_ids), cls.name, exc)
+                return None
+            out = exc.stdout
+        return out
+
+    def follow(self, progress=None):
         """Follow submitted command, exiting once it is finished.
+
+        Parameters
+        ----------
+        progress : callable, optional
+            Called without arguments whenever the status is announced.  It
+            should return a string that describes the progress of the job.
         """
         # Sleeping and announcement to the user would follow different
         # time interval.  We will not re-announce unless at least 10 seconds or
@@ -109,8 +173,10 @@ class Submitter(object, metaclass=abc.ABCMeta):
             dt = (t - t0)
             if t >= next_announce:
                 next_announce = t + max(5, dt*1.1)
-                lgr.info("Waiting on job %s: %s. Next heartbeat in %d seconds",
-                         self.submission_id, their_status, next_announce - t)
+                lgr.info("Waiting on job %s: %s%s. Next heartbeat in %d seconds",
+                         self.submission_id, their_status,
+                         " (" + progress() + ")" if progress else "",
+                         next_announce - t)
             # for dt=0sec, no sleep at all but then grows
             sleep_time = min(10, math.log2(1 + dt))
             lgr.debug("Sleeping for %.2f sec before next check", sleep_time)
@@ -152,6 +218,10 @@ class PbsSubmitter(Submitter):
         except CommandError:
             return "unknown", None
 
+        return self._parse_qstat(stat_out)
+
+    @staticmethod
+    def _parse_qstat(stat_out):
         match = re.search(r"job_state = ([A-Z])", stat_out)
         if not match:
             lgr.warning("No job status match found in %s", stat_out)
@@ -166,6 +236,29 @@ class PbsSubmitter(Submitter):
             our_state = "unknown"
         return our_state, job_state
 
+    @classmethod
+    @borrowdoc(Submitter)
+    def status_many(cls, session, submission_ids):
+        ids = [i for i in submission_ids if i]
+        statuses = dict.fromkeys(submission_ids, ("unknown", None))
+        if not ids:
+            return statuses
+        stat_out = cls._query_many(session, ["qstat", "-f"] + ids, ids)
+        if stat_out is None:
+            return statuses
+        # The output has a "Job Id: <id>" block for each job.  The ID may be
+        # qualified with the server name.
+        blocks = {}
+        for block in re.split(r"^(?=Job Id:)", stat_out, flags=re.MULTILINE):
+            match = re.match(r"Job Id: *(\S+)", block)
+            if match:
+                blocks[match.group(1).split(".")[0]] = block
+        for subm_id in ids:
+            block = blocks.get(subm_id.split(".")[0])
+            if block is not None:
+                statuses[subm_id] = cls._parse_qstat(block)
+        return statuses
+
 
 class CondorSubmitter(Submitter):
     """Submit a HTCondor job.
@@ -182,10 +275,11 @@ class CondorSubmitter(Submitter):
         return ["condor_submit", "-terse"]
 
     @borrowdoc(Submitter)
-    def submit(self, script, submit_command=None):
+    def submit(self, script, submit_command=None, setup=None):
         # Discard return value, which isn't submission ID for the current
         # condor_submit form.
-        out = super(CondorSubmitter, self).submit(script, submit_command)
+        out = super(CondorSubmitter, self).submit(
+            script, submit_command, setup)
         # Output example (3 subjobs): 199.0 - 199.2
         job_id = out.strip().split(" - ")[0].split(".")[0]
         self.submission_id = job_id
@@ -214,8 +308,10 @@ class CondorSubmitter(Submitter):
             lgr.debug("Status output for %s empty", self.submission_id)
             return "unknown", None
 
-        stat_json = json.loads(stat_out)
+        return self._parse_condor_json(json.loads(stat_out))
 
+    @staticmethod
+    def _parse_condor_json(stat_json):
         # http://pages.cs.wisc.edu/~adesmet/status.html
         condor_states = {0: "unexpanded",
                          1: "idle",
@@ -237,6 +333,30 @@ class CondorSubmitter(Submitter):
         # just taking the first code.
         return our_status, condor_states.get(codes[0])
 
+    @classmethod
+    @borrowdoc(Submitter)
+    def status_many(cls, session, submission_ids):
+        ids = [i for i in submission_ids if i]
+        statuses = dict.fromkeys(submission_ids, ("unknown", None))
+        if not ids:
+            return statuses
+        try:
+            stat_out, _ = session.execute_command(["condor_q", "-json"] + ids)
+        except CommandError:
+            lgr.debug("condor_q -json failed. Querying jobs one at a time.")
+            return super(CondorSubmitter, cls).status_many(
+                session, submission_ids)
+        if not stat_out.strip():
+            return statuses
+        by_cluster = collections.defaultdict(list)
+        for subjob in json.loads(stat_out):
+            by_cluster[str(subjob.get("ClusterId"))].append(subjob)
+        for subm_id in ids:
+            if by_cluster.get(subm_id):
+                statuses[subm_id] = cls._parse_condor_json(
+                    by_cluster[subm_id])
+        return statuses
+
     def _status_no_json(self):
         """Unclever status for older condor versions without 'condor_q -json'.
         """
@@ -284,8 +404,9 @@ class SlurmSubmitter(Submitter):
         return ["sbatch"]
 
     @borrowdoc(Submitter)
-    def submit(self, script, submit_command=None):
-        out = super(SlurmSubmitter, self).submit(script, submit_command)
+    def submit(self, script, submit_command=None, setup=None):
+        out = super(SlurmSubmitter, self).submit(
+            script, submit_command, setup)
         # Output example (v19.05): Submitted batch job 5
         job_id = out.strip().split()[-1]
         self.submission_id = job_id
@@ -306,7 +427,10 @@ class SlurmSubmitter(Submitter):
         if not matches:
             lgr.warning("No job status match found in %s", stat_out)
             return "unknown", None
+        return self._summarize_states(matches)
 
+    @staticmethod
+    def _summarize_states(matches):
         # https://github.com/SchedMD/slurm/blob/db82f4eb3d844501b53a72ea313a9166d7a421b2/src/common/slurm_protocol_defs.c#L2656
         waiting_states = ["PENDING", "RUNNING"]
         if any(m in waiting_states for m in matches):
@@ -319,6 +443,34 @@ class SlurmSubmitter(Submitter):
         # just taking the first code.
         return our_state, matches[0]
 
+    @classmethod
+    @borrowdoc(Submitter)
+    def status_many(cls, session, submission_ids):
+        ids = [i for i in submission_ids if i]
+        statuses = dict.fromkeys(submission_ids, ("unknown", None))
+        if not ids:
+            return statuses
+        # %F is the ID of the array job (i.e. our submission ID) for each
+        # subjob listed due to --array.
+        stat_out = cls._query_many(
+            session,
+            ["squeue", "--noheader", "--array", "--states=all",
+             "--jobs=" + ",".join(ids), "--format=%F %T"],
+            ids)
+        if stat_out is None:
+            # squeue fails if any job is no longer known to Slurm.
+            return super(SlurmSubmitter, cls).status_many(
+                session, submission_ids)
+        states = collections.defaultdict(list)
+        for line in stat_out.splitlines():
+            parts = line.split()
+            if len(parts) == 2:
+                states[parts[0]].append(parts[1])
+        for subm_id in ids:
+            if states.get(subm_id):
+                statuses[subm_id] = cls._summarize_states(states[subm_id])
+        return statuses
+
 
 class LocalSubmitter(Submitter):
     """Submit a local job.
@@ -335,8 +487,9 @@ class LocalSubmitter(Submitter):
         return ["sh"]
 
     @borrowdoc(Submitter)
-    def submit(self, script, submit_command=None):
-        out = super(LocalSubmitter, self).submit(script, submit_command)
+    def submit(self, script, submit_command=None, setup=None):
+        out = super(LocalSubmitter, self).submit(
+            script, submit_command, setup)
         pid = None
         if out:
             pid = out.strip() or None
@@ -358,6 +511,23 @@ class LocalSubmitter(Submitter):
             status = "completed", "completed"
         return status
 
+    @classmethod
+    @borrowdoc(Submitter)
+    def status_many(cls, session, submission_ids):
+        ids = [i for i in submission_ids if i]
+        # As with `status`, a process that is gone can't be told apart from
+        # one that was never there (ps fails for both).
+        statuses = dict.fromkeys(submission_ids, ("unknown", None))
+        if not ids:
+            return statuses
+        out = cls._query_many(
+            session, ["ps", "-o", "pid=", "-p", ",".join(ids)], ids)
+        running = set((out or "").split())
+        for pid in ids:
+            if pid in running:
+                statuses[pid] = "waiting", "running"
+        return statuses
+
 
 class LSFSubmitter(Submitter):
     """Submit an LSF job.
@@ -377,8 +547,9 @@ class LSFSubmitter(Submitter):
         return ["/bin/bash"]
 
     @borrowdoc(Submitter)
-    def submit(self, script, submit_command=None):
-        out = super(LSFSubmitter, self).submit(script, submit_command)
+    def submit(self, script, submit_command=None, setup=None):
+        out = super(LSFSubmitter, self).submit(
+            script, submit_command, setup)
         m = re.search('Job <(\d+)> is submitted to queue', out)
         self.submission_id = m.group(1)
         # Although LSF may have submitted the job successfully, it might 
@@ -409,11 +580,32 @@ class LSFSubmitter(Submitter):
             # it terminated
             return ("unknown", None)
         assert parts[0] == self.submission_id
-        if parts[2] in ("PEND", "RUN"):
-            return ("waiting", parts[2])
-        if parts[2] in ("DONE", "EXIT"):
-            return ("completed", parts[2])
-        return ("unknown", parts[2])
+        return self._parse_bjobs_state(parts[2])
+
+    @staticmethod
+    def _parse_bjobs_state(state):
+        if state in ("PEND", "RUN"):
+            return ("waiting", state)
+        if state in ("DONE", "EXIT"):
+            return ("completed", state)
+        return ("unknown", state)
+
+    @classmethod
+    @borrowdoc(Submitter)
+    def status_many(cls, session, submission_ids):
+        ids = [i for i in submission_ids if i]
+        statuses = dict.fromkeys(submission_ids, ("unknown", None))
+        if not ids:
+            return statuses
+        out = cls._query_many(session, ["bjobs", "-noheader"] + ids, ids)
+        for line in (out or "").splitlines():
+            parts = line.split()
+            # Array jobs have a line for each element.  Like `status`, take
+            # the first one.
+            if len(parts) > 2 and parts[0] in statuses \
+                    and statuses[parts[0]][1] is None:
+                statuses[parts[0]] = cls._parse_bjobs_state(parts[2])
+        return statuses
 
 
 SUBMITTERS = collections.OrderedDict(
@@ -19,6 +19,16 @@ from shlex import quote as shlex_quote
 lgr = logging.getLogger("reproman.support.jobs.template")
 
 
+def _read_local_executor():
+    """Return the source of the local executor module.
+
+    The local submission template writes it to the resource.  It is passed
+    as a variable rather than included so that Jinja doesn't interpret it.
+    """
+    with open(op.join(op.dirname(__file__), "local_executor.py")) as fh:
+        return fh.read()
+
+
 class Template(object):
     """Job templates.
 
@@ -40,6 +50,8 @@ class Template(object):
             undefined=jinja2.StrictUndefined,
             trim_blocks=True)
         env.globals["shlex_quote"] = shlex_quote
+        if subdir == "submission":
+            env.globals["local_executor_source"] = _read_local_executor()
         return env.get_template(template_name).render(**self.kwds)
 
     def render_runscript(self, template_name):
@@ -0,0 +1,123 @@
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the reproman package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import os
+import os.path as op
+from unittest.mock import patch
+
+import pytest
+
+from reproman.support.jobs import local_executor as lex
+
+
+@pytest.mark.parametrize("value,expected",
+                         [("512", 512), ("512MB", 512), ("4G", 4096),
+                          ("4 GiB", 4096), ("2048k", 2), ("1t", 1024 ** 2)])
+def test_parse_memory(value, expected):
+    assert lex.parse_memory(value) == expected
+
+
+def test_parse_memory_invalid():
+    with pytest.raises(ValueError):
+        lex.parse_memory("lots")
+
+
+@pytest.fixture
+def metadir(tmpdir):
+    runscript = tmpdir.join("runscript")
+    runscript.write("#!/bin/sh\n"
+                    "echo out $1\n"
+                    "test $1 -ne 2\n")
+    runscript.chmod(0o755)
+    return str(tmpdir)
+
+
+class FakeProcesses(object):
+    """Stand-in for subprocess.Popen that tracks concurrent subjobs.
+
+    Each process exits after it has been polled `npolls` times, with a
+    non-zero status for subjob 2.
+    """
+
+    def __init__(self, npolls=2):
+        self.npolls = npolls
+        self.running = set()
+        self.max_running = 0
+        self.started = []
+
+    def __call__(self, cmd, **kwds):
+        fakes = self
+        idx = int(cmd[-1])
+
+        class Proc(object):
+            returncode = None
+            polls = 0
+
+            def poll(self):
+                self.polls += 1
+                if self.polls >= fakes.npolls:
+                    self.returncode = int(idx == 2)
+                    fakes.running.discard(idx)
+                return self.returncode
+
+            def terminate(self):
+                pass
+
+        self.started.append(idx)
+        self.running.add(idx)
+        self.max_running = max(self.max_running, len(self.running))
+        return Proc()
+
+
+@pytest.fixture
+def fake_procs():
+    fakes = FakeProcesses()
+    with patch.object(lex.subprocess, "Popen", fakes), \
+            patch.object(lex.time, "sleep"):
+        yield fakes
+
+
+def test_main(metadir):
+    assert lex.main([metadir, "4", "--max-procs", "4"]) == 1
+    for idx in range(4):
+        with open(op.join(metadir, "stdout.{}".format(idx))) as fh:
+            assert fh.read() == "out {}\n".format(idx)
+        assert op.exists(op.join(metadir, "stderr.{}".format(idx)))
+    with open(op.join(metadir, "local-executor.pid")) as fh:
+        assert int(fh.read()) == os.getpid()
+
+
+def test_run_subjobs_max_procs(metadir, fake_procs):
+    assert lex.run_subjobs(metadir, 5, max_procs=2) == 1
+    assert fake_procs.started == list(range(5))
+    assert fake_procs.max_running == 2
+
+    fake_procs.max_running = 0
+    assert lex.run_subjobs(metadir, 3, max_procs=1) == 1
+    assert fake_procs.max_running == 1
+
+
+def test_run_subjobs_memory(metadir, fake_procs):
+    # Without enough memory, subjobs are started only when no other one is
+    # running.
+    with patch.object(lex, "available_memory", return_value=100):
+        lex.run_subjobs(metadir, 3, max_procs=3, memory=200)
+    assert fake_procs.max_running == 1
+
+    with patch.object(lex, "available_memory", return_value=1000):
+        lex.run_subjobs(metadir, 3, max_procs=3, memory=200)
+    assert fake_procs.max_running == 3
+
+
+def test_main_subjobs(metadir):
+    subjobs = op.join(metadir, "subjobs")
+    with open(subjobs, "w") as fh:
+        fh.write("1\n3\n")
+    assert lex.main([metadir, "2", "--subjobs", subjobs]) == 0
+    assert sorted(f for f in os.listdir(metadir)
+                  if f.startswith("stdout.")) == ["stdout.1", "stdout.3"]
@@ -31,6 +31,10 @@ def test_local_registry(tmpdir):
     # Can't register same ID.
     with pytest.raises(ValueError):
         lreg.register("jobid0", {})
+    # ... unless the record should be replaced.
+    lreg.register("jobid0", {"value0": "baz"}, replace=True)
+    with open(lreg.find_job_files()["jobid0"]) as yfh:
+        assert yaml.safe_load(yfh) == {"value0": "baz"}
 
     lreg.register("jobid1", {"value0": ""})
     files = lreg.find_job_files()
@@ -10,6 +10,10 @@
 import logging
 import os
 import os.path as op
+import shutil
+import signal
+import subprocess
+import time
 import yaml
 
 from unittest.mock import MagicMock
@@ -20,6 +24,7 @@ from reproman.consts import TEST_SSH_DOCKER_DIGEST
 from reproman.utils import chpwd
 from reproman.utils import swallow_logs
 from reproman.resource.shell import Shell
+from reproman.support.exceptions import CommandError
 from reproman.support.exceptions import MissingExternalDependency
 from reproman.support.exceptions import OrchestratorError
 from reproman.support.external_versions import external_versions
@@ -134,6 +139,595 @@ def test_orc_plain_shell(check_orc_plain, shell, job_spec):
     check_orc_plain(shell, job_spec)
 
 
+def test_get_staging_script(tmpdir, shell):
+    files = [(str(tmpdir.join("a", "b", "exec")), "#!/bin/sh\n", True),
+             (str(tmpdir.join("a", "nul")), "it's\0\"é\"\0$HOME", False)]
+    shell.get_session().execute_command(
+        ["sh", "-c", orcs._get_staging_script(files)])
+    for path, content, executable in files:
+        with open(path, encoding="utf-8") as fh:
+            assert fh.read() == content
+        assert os.stat(path).st_mode & 0o777 == (0o775 if executable
+                                                 else 0o664)
+
+
+@pytest.mark.parametrize("large", [False, True], ids=["inline", "put"])
+def test_orc_submit_staging(tmpdir, shell, job_spec, large):
+    local_dir = str(tmpdir)
+    create_tree(local_dir, {"d": {"in": "content\n"}})
+    if large:
+        job_spec["_resolved_command_str"] += \
+            " # " + "x" * orcs._MAX_STAGING_SCRIPT
+    with chpwd(local_dir):
+        orc = orcs.PlainOrchestrator(shell, submission_type="local",
+                                     job_spec=job_spec)
+        orc.prepare_remote()
+        with patch.object(orc.session, "put_text",
+                          wraps=orc.session.put_text) as put_text:
+            with patch.object(orc.session, "execute_command",
+                              wraps=orc.session.execute_command) as ex:
+                orc.submit()
+        # One call to stage and submit and one to record the ID.
+        assert ex.call_count == 2
+        assert put_text.call_count == (4 if large else 0)
+        orc.follow()
+        orc.fetch()
+        assert open("out").read() == "content\nmore\n"
+
+    with open(op.join(orc.meta_directory, "command-array")) as fh:
+        assert fh.read() == job_spec["_resolved_command_str"]
+    with open(op.join(orc.meta_directory, "spec.yaml")) as fh:
+        assert yaml.safe_load(fh)["_jobid"] == orc.jobid
+
+
+@pytest.mark.parametrize("store", [False, True], ids=["no store", "store"])
+def test_orc_plain_input_delta(tmpdir, shell, job_spec, store):
+    local_dir = str(tmpdir)
+    create_tree(local_dir, {"d": {"in": "content\n",
+                                  "sub": {"a": "a", "b": "b"}}})
+    job_spec["inputs"] = ["d"]
+    if store:
+        job_spec["input_store"] = "true"
+    else:
+        job_spec["working_directory"] = op.join(job_spec["root_directory"],
+                                                "wdir")
+
+    def prepare():
+        with chpwd(local_dir):
+            orc = orcs.PlainOrchestrator(shell, submission_type="local",
+                                         job_spec=dict(job_spec))
+            with patch.object(orc.session, "put",
+                              wraps=orc.session.put) as put:
+                orc.prepare_remote()
+            return orc, sorted(op.relpath(c[0][0]) for c in put.call_args_list)
+
+    orc, puts = prepare()
+    # Without anything to compare to, the directory is put as a whole.
+    assert puts == ([op.join("d", "in"), op.join("d", "sub", "a"),
+                     op.join("d", "sub", "b")] if store else ["d"])
+    # Nothing changed.
+    orc, puts = prepare()
+    assert puts == []
+    # Only changed files are transferred.
+    create_tree(local_dir, {"d": {"in": "changed\n"}})
+    orc, puts = prepare()
+    assert puts == [op.join("d", "in")]
+    with open(op.join(orc.working_directory, "d", "in")) as fh:
+        assert fh.read() == "changed\n"
+
+    if store:
+        in_store = op.join(orc.root_directory, ".reproman", "input-store")
+        assert orc.input_store == in_store
+        # Both versions of d/in and the two other files, without any
+        # leftover partial uploads.
+        assert len(os.listdir(in_store)) == 4
+        digest = orcs.Digester(["sha256"])(
+            op.join(local_dir, "d", "in"))["sha256"]
+        assert op.exists(op.join(in_store, digest))
+        linked = op.join(orc.working_directory, "d", "sub", "a")
+        stat = os.stat(linked)
+        assert stat.st_nlink == 4  # Store and three working directories
+        # Store entries are write-protected.
+        assert not stat.st_mode & 0o222
+
+        # A store entry that was changed anyway (e.g., by root) through its
+        # link in a working directory is not used.
+        os.chmod(linked, 0o644)
+        with open(linked, "a") as fh:
+            fh.write("changed")
+        orc, puts = prepare()
+        assert puts == [op.join("d", "sub", "a")]
+        with open(op.join(orc.working_directory, "d", "sub", "a")) as fh:
+            assert fh.read() == "a"
+
+
+def test_orc_plain_run_cache(tmpdir, shell, job_spec):
+    nsubjobs = 3
+    local_dir = op.join(str(tmpdir), "local")
+    log = op.join(str(tmpdir), "runs")
+    create_tree(local_dir,
+                {"in.{}".format(i): str(i) for i in range(nsubjobs)})
+    job_spec["run_cache"] = True
+
+    def run():
+        with chpwd(local_dir):
+            orc = orcs.PlainOrchestrator(shell, submission_type="local",
+                                         job_spec=dict(job_spec))
+            orc.job_spec.update(
+                _command_array=["echo {0} >>{1}; cat in.{0} >out.{0}"
+                                .format(i, log) for i in range(nsubjobs)],
+                _inputs_array=[["in.{}".format(i)] for i in range(nsubjobs)],
+                _outputs_array=[["out.{}".format(i)]
+                                for i in range(nsubjobs)])
+            orc.prepare_remote()
+            orc.submit()
+            orc.follow()
+            for i in range(nsubjobs):
+                if op.exists("out.{}".format(i)):
+                    os.unlink("out.{}".format(i))
+            orc.fetch()
+            for i in range(nsubjobs):
+                with open("out.{}".format(i)) as fh:
+                    assert fh.read() == open("in.{}".format(i)).read()
+        runs = []
+        if op.exists(log):
+            with open(log) as fh:
+                runs = sorted(int(line) for line in fh)
+            os.unlink(log)
+        return orc, runs
+
+    orc, runs = run()
+    assert runs == [0, 1, 2]
+    assert orc.cached_subjobs == []
+    assert len(os.listdir(orc.run_cache)) == nsubjobs
+
+    # Only the subjob with a changed input is run.
+    create_tree(local_dir, {"in.2": "changed"})
+    orc, runs = run()
+    assert runs == [2]
+    assert sorted(orc.cached_subjobs) == [0, 1]
+    assert orc.get_subjob_summary() == {
+        "counts": {"succeeded": 1, "cached": 2}, "failed": []}
+    assert len(os.listdir(orc.run_cache)) == nsubjobs + 1
+
+    # Nothing is submitted if all subjobs are cached.
+    orc, runs = run()
+    assert runs == []
+    assert orc.submitter.submission_id is None
+    assert orc.has_completed
+    assert orc.get_subjob_summary() == {
+        "counts": {"cached": nsubjobs}, "failed": []}
+
+
+def test_orc_plain_run_cache_keys(tmpdir, shell, job_spec):
+    create_tree(str(tmpdir), {"d": {"in": "content\n"}})
+    job_spec["run_cache"] = "yes"
+
+    def get_keys(**kwds):
+        with chpwd(str(tmpdir)):
+            orc = orcs.PlainOrchestrator(shell, submission_type="local",
+                                         job_spec=dict(job_spec, **kwds))
+            return orc._get_run_cache_keys()
+
+    key, = get_keys()
+    assert get_keys() == [key]
+    assert get_keys(_resolved_command_str="true") != [key]
+    assert get_keys(container="img") != [key]
+    # An output outside of the working directory can't be cached.
+    assert get_keys(outputs=[op.join(op.sep, "elsewhere", "out")]) == [None]
+    assert get_keys(outputs=[op.join(op.pardir, "out")]) == [None]
+    create_tree(str(tmpdir), {"d": {"in": "changed\n"}})
+    assert get_keys() != [key]
+
+
+@pytest.mark.parametrize("existing", [False, True],
+                         ids=["new wdir", "existing wdir"])
+def test_orc_plain_input_directories(tmpdir, shell, job_spec, existing):
+    local_dir = str(tmpdir)
+    create_tree(local_dir, {"d": {"in": "content\n",
+                                  "sub": {"subsub": {"a": "a"}}}})
+    os.makedirs(op.join(local_dir, "d", "empty", "nested-empty"))
+    job_spec["inputs"] = ["d"]
+    job_spec["working_directory"] = wdir = op.join(
+        job_spec["root_directory"], "wdir")
+    if existing:
+        os.makedirs(wdir)
+
+    with chpwd(local_dir):
+        orc = orcs.PlainOrchestrator(shell, submission_type="local",
+                                     job_spec=job_spec)
+        with patch.object(orc.session, "put",
+                          wraps=orc.session.put) as put:
+            orc.prepare_remote()
+    assert put.call_count == (2 if existing else 1)
+    with open(op.join(wdir, "d", "sub", "subsub", "a")) as fh:
+        assert fh.read() == "a"
+    assert op.isdir(op.join(wdir, "d", "empty", "nested-empty"))
+
+
+def test_orc_run_cache_plain_only(tmpdir, shell, job_spec):
+    class LocalRunLike(orcs.PrepareRemotePlainMixin, orcs.Orchestrator):
+        # Prepares like the plain orchestrator but doesn't fetch like it,
+        # as the datalad-local-run orchestrator.
+        name = "local-run-like"
+        working_directory = str(tmpdir)
+
+        def fetch(self, on_remote_finish=None, meta_only=False):
+            pass
+
+    job_spec["run_cache"] = "on"
+    with chpwd(str(tmpdir)):
+        orc = LocalRunLike(shell, submission_type="local", job_spec=job_spec)
+        with pytest.raises(OrchestratorError) as exc:
+            orc.prepare_remote()
+    assert "not supported by the local-run-like" in str(exc.value)
+
+
+@pytest.mark.parametrize("value,expected",
+                         [(True, True), ("yes", True), ("1", True),
+                          (False, False), ("Off", False), (0, False),
+                          (None, "default")])
+def test_get_bool_parameter(value, expected):
+    assert orcs._get_bool_parameter({"key": value}, "key",
+                                    default="default") == expected
+
+
+@pytest.mark.parametrize("value", ["", "sure", 2])
+def test_get_bool_parameter_invalid(value):
+    with pytest.raises(OrchestratorError):
+        orcs._get_bool_parameter({"key": value}, "key")
+
+
+@pytest.mark.parametrize("archive", [True, False],
+                         ids=["archive", "no archive"])
+def test_orc_plain_fetch(tmpdir, shell, job_spec, archive):
+    local_dir = str(tmpdir)
+    create_tree(local_dir, {"d": {"in": "content\n"}})
+    if archive:
+        job_spec["outputs"] = ["out", "missing"]
+    with chpwd(local_dir):
+        orc = orcs.PlainOrchestrator(shell, submission_type="local",
+                                     job_spec=job_spec)
+        orc.prepare_remote()
+        orc.submit()
+        orc.follow()
+        with patch.object(orc.session, "get", wraps=orc.session.get) as get:
+            with swallow_logs(new_level=logging.WARNING) as log:
+                if archive:
+                    orc.fetch()
+                    assert "missing was not found" in log.out
+                else:
+                    with patch.object(orcs, "_ARCHIVE_RESULTS", "exit 1"):
+                        orc.fetch()
+        # One archive or an output and three metadata files.
+        assert get.call_count == (1 if archive else 4)
+        assert open("out").read() == "content\nmore\n"
+        metadir_local = op.relpath(orc.meta_directory,
+                                   orc.working_directory)
+        for fname in "status", "stderr", "stdout":
+            assert op.exists(op.join(metadir_local, fname + ".0"))
+    if archive:
+        # The remote archive is removed.
+        assert not os.listdir(op.join(orc.root_directory, "outputs"))
+
+
+@pytest.mark.parametrize("data_filter", [True, False],
+                         ids=["data filter", "own checks"])
+def test_extract_archive(tmpdir, monkeypatch, data_filter):
+    import io
+    import tarfile
+    if not data_filter:
+        monkeypatch.delattr(tarfile, "data_filter", raising=False)
+    elif not hasattr(tarfile, "data_filter"):
+        pytest.skip("tarfile has no extraction filters")
+
+    def make_archive(name, members):
+        archive = str(tmpdir.join(name))
+        with tarfile.open(archive, "w") as tar:
+            for member, content in members:
+                tar.addfile(member, io.BytesIO(content) if content else None)
+        return archive
+
+    def file_member(name, content=b"content"):
+        member = tarfile.TarInfo(name)
+        member.size = len(content)
+        return member, content
+
+    def link_member(name, target):
+        member = tarfile.TarInfo(name)
+        member.type = tarfile.SYMTYPE
+        member.linkname = target
+        return member, None
+
+    dest = tmpdir.mkdir("dest")
+    _extract_archive = orcs._extract_archive
+    _extract_archive(make_archive("good.tar", [file_member("d/f"),
+                                               link_member("l", "d/f")]),
+                     str(dest))
+    assert dest.join("l").read() == "content"
+
+    outside = tmpdir.join("outside")
+    # An absolute name is either refused or taken as relative to `dest`.
+    try:
+        _extract_archive(make_archive("abs.tar", [file_member(str(outside))]),
+                         str(dest))
+    except OrchestratorError:
+        pass
+    assert not outside.exists()
+
+    for members in [[file_member("../outside")],
+                    [link_member("l2", "../outside")],
+                    [link_member("esc", ".."), file_member("esc/outside")]]:
+        archive = make_archive("bad.tar", members)
+        with pytest.raises(OrchestratorError):
+            _extract_archive(archive, str(dest))
+        assert not outside.exists()
+        assert not op.lexists(str(dest.join("l2")))
+
+
+def _stage_runscripts(tmpdir, shell, job_spec, commands):
+    # Only stage the files.  The runscripts are started by the caller.
+    job_spec["submit_command"] = ["true"]
+    with chpwd(str(tmpdir)):
+        orc = orcs.PlainOrchestrator(shell, submission_type="local",
+                                     job_spec=job_spec)
+        orc.job_spec.update(
+            _command_array=commands,
+            _inputs_array=[[]] * len(commands),
+            _outputs_array=[[]] * len(commands))
+        orc.prepare_remote()
+        orc.submit()
+    return orc
+
+
+def _run_runscripts(orc, subjobs, env=None):
+    runscript = op.join(orc.meta_directory, "runscript")
+    procs = [subprocess.Popen([runscript, str(i)], stdout=subprocess.PIPE,
+                              universal_newlines=True, env=env)
+             for i in subjobs]
+    return [(p.communicate()[0], p.returncode) for p in procs]
+
+
+def test_orc_runscript_barrier(tmpdir, shell, job_spec):
+    nsubjobs = 6
+    orc = _stage_runscripts(tmpdir, shell, job_spec,
+                            ["sleep 0.{}".format(i)
+                             for i in reversed(range(nsubjobs))])
+    # The runscript doesn't need flock.
+    bindir = tmpdir.mkdir("bin")
+    for prog in ["ls", "mkdir", "perl", "rm", "sh", "sleep", "touch", "wc"]:
+        os.symlink(shutil.which(prog), str(bindir.join(prog)))
+    results = _run_runscripts(orc, range(nsubjobs),
+                              env=dict(os.environ, PATH=str(bindir)))
+    assert [code for _, code in results] == [0] * nsubjobs
+    # The first subjob finishes last and is the only one that runs the
+    # post-command steps.
+    assert ["post-command" in out for out, _ in results] == \
+        [True] + [False] * (nsubjobs - 1)
+    assert orc.has_completed
+    assert os.listdir(op.join(orc.root_directory, "barriers")) == \
+        [orc.jobid + ".done"]
+    assert orc.get_subjob_summary() == {"counts": {"succeeded": nsubjobs},
+                                        "failed": []}
+
+
+def test_orc_runscript_barrier_early_exit(tmpdir, shell, job_spec):
+    # The second subjob fails before running its command (there is no
+    # command to run) and the third one is terminated.  Both are counted, so
+    # the job still completes.
+    orc = _stage_runscripts(tmpdir, shell, job_spec,
+                            ["true", "", "sleep 30"])
+    runscript = op.join(orc.meta_directory, "runscript")
+    terminated = subprocess.Popen([runscript, "2"], stdout=subprocess.PIPE,
+                                  universal_newlines=True,
+                                  start_new_session=True)
+    status_file = op.join(orc.meta_directory, "status.2")
+    for _ in range(100):
+        if op.exists(status_file) and \
+                open(status_file).read().strip() == "running":
+            break
+        time.sleep(0.1)
+    # Like a batch system, terminate the subjob's process group.
+    os.killpg(terminated.pid, signal.SIGTERM)
+    terminated.communicate()
+    results = _run_runscripts(orc, [0, 1])
+    assert [code for _, code in results] == [0, 1]
+    assert orc.has_completed
+    assert orc.get_failed_subjobs() == [1, 2]
+    assert orc.get_status(1) == "pre-command failure"
+    assert orc.get_status(2).startswith("failed")
+
+    # The failed subjobs can be rerun.
+    orc.job_spec["_command_array"][1:] = ["true", "true"]
+    assert orc.rerun_failed() == [1, 2]
+    assert not orc.has_completed
+    _run_runscripts(orc, [1, 2])
+    assert orc.has_completed
+    assert orc.get_failed_subjobs() == []
+
+
+def test_orc_local_subjobs(tmpdir, shell, job_spec):
+    nsubjobs = 4
+    job_spec["num_processes"] = 1
+    job_spec["memory"] = "1M"
+    with chpwd(str(tmpdir)):
+        orc = orcs.PlainOrchestrator(shell, submission_type="local",
+                                     job_spec=job_spec)
+        orc.job_spec.update(
+            _command_array=["echo {} >out.{}".format(i, i)
+                            for i in range(nsubjobs)],
+            _inputs_array=[[]] * nsubjobs,
+            _outputs_array=[["out.{}".format(i)] for i in range(nsubjobs)])
+        orc.prepare_remote()
+        orc.submit()
+        orc.follow()
+        orc.fetch()
+        for i in range(nsubjobs):
+            assert open("out.{}".format(i)).read() == "{}\n".format(i)
+    assert orc.get_subjob_summary() == {"counts": {"succeeded": nsubjobs},
+                                        "failed": []}
+    with open(op.join(orc.meta_directory, "local-executor.pid")) as fh:
+        assert fh.read().strip() == orc.submitter.submission_id
+
+
+def test_orc_plain_rerun_failed(tmpdir, shell, job_spec):
+    nsubjobs = 4
+    flag = op.join(str(tmpdir), "flag")
+    log = op.join(str(tmpdir), "runs")
+    with chpwd(str(tmpdir)):
+        orc = orcs.PlainOrchestrator(shell, submission_type="local",
+                                     job_spec=job_spec)
+        orc.job_spec.update(
+            _command_array=["echo {0} >>{1}; test -e {2} || test {0} -ne 1 "
+                            "-a {0} -ne 3".format(i, log, flag)
+                            for i in range(nsubjobs)],
+            _inputs_array=[[]] * nsubjobs,
+            _outputs_array=[[]] * nsubjobs)
+        orc.prepare_remote()
+        orc.submit()
+        orc.follow()
+    assert orc.get_failed_subjobs() == [1, 3]
+
+    create_tree(str(tmpdir), {"flag": ""})
+    orc = orcs.PlainOrchestrator(shell, submission_type="local",
+                                 job_spec=orc.as_dict(), resurrection=True)
+    assert orc.rerun_failed() == [1, 3]
+    orc.follow()
+    assert orc.has_completed
+    assert orc.get_failed_subjobs() == []
+    assert orc.get_subjob_summary() == {
+        "counts": {"succeeded": nsubjobs}, "failed": []}
+    with open(log) as fh:
+        assert sorted(int(line) for line in fh) == [0, 1, 1, 2, 3, 3]
+    # There is nothing left to rerun.
+    assert orc.rerun_failed() == []
+
+
+def test_orc_plain_rerun_failed_submission_error(tmpdir, shell, job_spec):
+    nsubjobs = 3
+    with chpwd(str(tmpdir)):
+        orc = orcs.PlainOrchestrator(shell, submission_type="local",
+                                     job_spec=job_spec)
+        orc.job_spec.update(
+            _command_array=["test {} -ne 1".format(i)
+                            for i in range(nsubjobs)],
+            _inputs_array=[[]] * nsubjobs,
+            _outputs_array=[[]] * nsubjobs)
+        orc.prepare_remote()
+        orc.submit()
+        orc.follow()
+    assert orc.get_failed_subjobs() == [1]
+
+    spec = dict(orc.as_dict(), submit_command=["false"])
+    orc = orcs.PlainOrchestrator(shell, submission_type="local",
+                                 job_spec=spec, resurrection=True)
+    with pytest.raises(CommandError):
+        orc.rerun_failed()
+    # The job is left as it was before the submission.
+    assert orc.has_completed
+    assert orc.get_failed_subjobs() == [1]
+    assert orc.get_subjob_summary()["failed"] == [1]
+
+
+def test_orc_rerun_failed_incomplete(tmpdir, shell, job_spec):
+    with chpwd(str(tmpdir)):
+        orc = orcs.PlainOrchestrator(shell, submission_type="local",
+                                     job_spec=job_spec)
+        with pytest.raises(OrchestratorError):
+            orc.rerun_failed()
+
+
+def test_local_template_executor_source(tmpdir):
+    from reproman.support.jobs import template
+    source = "print('{{}} {%} {#}'.format())\n"
+    templ = template.Template(
+        _meta_directory=str(tmpdir), _meta_directory_rel=".",
+        working_directory=str(tmpdir), _num_run=2, _run_subset=False)
+    with patch.object(template, "_read_local_executor",
+                      return_value=source):
+        script = templ.render_submission("local.template")
+    # The module is written verbatim, not interpreted as template source.
+    assert "<<'REPROMAN_LOCAL_EXECUTOR_EOF'\n" + source in script
+    assert "parallel --citation" in script
+
+
+@pytest.mark.parametrize("pack_parallel", [1, 2])
+def test_orc_pack(tmpdir, shell, job_spec, pack_parallel):
+    nsubjobs = 5
+    job_spec["pack_size"] = "2"
+    job_spec["pack_parallel"] = pack_parallel
+    # Only stage the files.  The array tasks are started below.
+    job_spec["submit_command"] = ["sh", "-c", "echo Submitted batch job 5",
+                                  "sh"]
+    with chpwd(str(tmpdir)):
+        orc = orcs.PlainOrchestrator(shell, submission_type="slurm",
+                                     job_spec=job_spec)
+        orc.job_spec.update(
+            _command_array=["echo {}; test {} -ne 3".format(i, i)
+                            for i in range(nsubjobs)],
+            _inputs_array=[[]] * nsubjobs,
+            _outputs_array=[[]] * nsubjobs)
+        orc.prepare_remote()
+        orc.submit()
+
+    with open(op.join(orc.meta_directory, "submit")) as fh:
+        submit = fh.read()
+    assert "#SBATCH --array=0-2\n" in submit
+    assert "/pack-stdout.%a" in submit
+    assert "/runpack $SLURM_ARRAY_TASK_ID" in submit
+
+    runpack = op.join(orc.meta_directory, "runpack")
+    procs = [subprocess.Popen([runpack, str(i)]) for i in range(3)]
+    assert [p.wait() for p in procs] == [0] * 3
+    assert orc.has_completed
+    assert orc.get_subjob_summary() == {
+        "counts": {"succeeded": nsubjobs - 1, "failed": 1},
+        "failed": [3]}
+    assert orc.get_failed_subjobs() == [3]
+    for i in range(nsubjobs):
+        with open(op.join(orc.meta_directory, "stdout.{}".format(i))) as fh:
+            assert "{}\n".format(i) in fh.read()
+
+
+def test_orc_submit_cached_subset(tmpdir, shell, job_spec):
+    nsubjobs = 5
+    job_spec["pack_size"] = 2
+    job_spec["submit_command"] = ["sh", "-c", "echo Submitted batch job 5",
+                                  "sh"]
+    with chpwd(str(tmpdir)):
+        orc = orcs.PlainOrchestrator(shell, submission_type="slurm",
+                                     job_spec=job_spec)
+        orc.job_spec.update(
+            _command_array=["echo {}".format(i) for i in range(nsubjobs)],
+            _inputs_array=[[]] * nsubjobs,
+            _outputs_array=[[]] * nsubjobs)
+        orc.prepare_remote()
+        # Pretend that prepare_remote() found these in the run cache.
+        orc.cached_subjobs = [1, 2]
+        orc.submit()
+
+    with open(op.join(orc.meta_directory, "submit")) as fh:
+        assert "#SBATCH --array=0-1\n" in fh.read()
+    runpack = op.join(orc.meta_directory, "runpack")
+    procs = [subprocess.Popen([runpack, str(i)]) for i in range(2)]
+    assert [p.wait() for p in procs] == [0] * 2
+    assert orc.has_completed
+    for i in [0, 3, 4]:
+        assert orc.get_status(i) == "succeeded"
+    for i in [1, 2]:
+        assert orc.get_status(i) == "unknown"
+
+
+@pytest.mark.parametrize("value", ["0", "two", -1])
+def test_orc_pack_invalid(tmpdir, shell, job_spec, value):
+    job_spec["pack_size"] = value
+    with chpwd(str(tmpdir)):
+        orc = orcs.PlainOrchestrator(shell, submission_type="slurm",
+                                     job_spec=job_spec)
+        with pytest.raises(OrchestratorError):
+            orc.submit()
+
+
 def test_orc_resurrection_invalid_job_spec(check_orc_plain, shell):
     with pytest.raises(OrchestratorError):
         orcs.PlainOrchestrator(shell, submission_type="local",
@@ -0,0 +1,43 @@
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the reproman package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+from reproman.resource.shell import Shell
+from reproman.support.jobs import status
+from reproman.tests.utils import create_tree
+
+
+def test_read_subjob_statuses(tmpdir):
+    create_tree(str(tmpdir), {"a": {"status.0": "succeeded\n",
+                                    "status.1": "failed: 3\n",
+                                    "status.10": "running\n",
+                                    "status.2": "",
+                                    "stdout.0": "not a status\n"},
+                              "b": {},
+                              "c": {"status.0": "submitted\n"}})
+    session = Shell("localshell").get_session()
+    dirs = [str(tmpdir.join(d)) for d in ["a", "b", "missing", "c"]]
+    assert status.read_subjob_statuses(session, dirs) == [
+        {0: "succeeded", 1: "failed: 3", 10: "running"},
+        {},
+        {},
+        {0: "submitted"}]
+    assert status.read_subjob_statuses(session, []) == []
+
+
+def test_summarize_subjobs():
+    summary = status.summarize_subjobs(
+        {0: "succeeded", 1: "failed: 3", 2: "pre-command failure",
+         3: "running", 4: "succeeded", 6: "whatever"},
+        8)
+    assert summary == {"counts": {"running": 1, "succeeded": 2, "failed": 2,
+                                  "unknown": 3},
+                       "failed": [1, 2]}
+    assert status.format_subjob_summary(summary) == \
+        "8 subjobs: 1 running, 2 succeeded, 2 failed, 3 unknown"
+    assert status.format_subjob_summary(
+        status.summarize_subjobs({0: "running"}, 1)) == "1 subjob: 1 running"
@@ -0,0 +1,118 @@
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the reproman package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import json
+import logging
+from unittest.mock import patch
+from unittest.mock import PropertyMock
+
+import pytest
+
+from reproman.support.exceptions import CommandError
+from reproman.support.jobs import submitters
+from reproman.utils import swallow_logs
+
+
+class FakeSession(object):
+    """Session that answers commands with canned output.
+    """
+
+    def __init__(self, responses):
+        # Map the first word of a command to (stdout, exit code).
+        self.responses = responses
+        self.commands = []
+
+    def execute_command(self, command):
+        self.commands.append(command)
+        if isinstance(command, str):
+            command = command.split()
+        out, code = self.responses[command[0]]
+        if code:
+            raise CommandError(cmd=" ".join(command), code=code, stdout=out,
+                               stderr="")
+        return out, ""
+
+
+def test_slurm_status_many():
+    session = FakeSession(
+        {"squeue": ("5 RUNNING\n5 COMPLETED\n6 COMPLETED\n", 0)})
+    statuses = submitters.SlurmSubmitter.status_many(
+        session, ["5", "6", "7", None])
+    assert statuses == {"5": ("waiting", "RUNNING"),
+                        "6": ("completed", "COMPLETED"),
+                        "7": ("unknown", None),
+                        None: ("unknown", None)}
+    assert len(session.commands) == 1
+    assert "--jobs=5,6,7" in session.commands[0]
+
+
+def test_slurm_status_many_fallback():
+    # squeue fails if a job is no longer known.
+    session = FakeSession({"squeue": ("", 1),
+                           "scontrol": ("JobState=PENDING", 0)})
+    statuses = submitters.SlurmSubmitter.status_many(session, ["5"])
+    assert statuses == {"5": ("waiting", "PENDING")}
+
+
+def test_condor_status_many():
+    out = json.dumps([{"ClusterId": 10, "JobStatus": 2},
+                      {"ClusterId": 10, "JobStatus": 4},
+                      {"ClusterId": 11, "JobStatus": 4}])
+    session = FakeSession({"condor_q": (out, 0)})
+    statuses = submitters.CondorSubmitter.status_many(
+        session, ["10", "11", "12"])
+    assert statuses == {"10": ("waiting", "running"),
+                        "11": ("completed", "completed"),
+                        "12": ("unknown", None)}
+    assert session.commands == [["condor_q", "-json", "10", "11", "12"]]
+
+
+def test_pbs_status_many():
+    out = ("Job Id: 1.server\n    job_state = R\n"
+           "Job Id: 2.server\n    job_state = C\n")
+    # qstat fails because job 3 is unknown, but reports the others.
+    session = FakeSession({"qstat": (out, 153)})
+    statuses = submitters.PbsSubmitter.status_many(
+        session, ["1.server", "2", "3.server"])
+    assert statuses == {"1.server": ("waiting", "R"),
+                        "2": ("completed", "C"),
+                        "3.server": ("unknown", None)}
+
+
+def test_lsf_status_many():
+    out = ("7 me RUN normal host host job Jan 1 00:00\n"
+           "8 me DONE normal host host job Jan 1 00:00\n")
+    session = FakeSession({"bjobs": (out, 255)})
+    statuses = submitters.LSFSubmitter.status_many(session, ["7", "8", "9"])
+    assert statuses == {"7": ("waiting", "RUN"),
+                        "8": ("completed", "DONE"),
+                        "9": ("unknown", None)}
+
+
+@pytest.mark.parametrize("out,code", [("  100\n", 0), ("", 1)])
+def test_local_status_many(out, code):
+    session = FakeSession({"ps": (out, code)})
+    statuses = submitters.LocalSubmitter.status_many(session, ["100", "101"])
+    assert statuses["101"] == ("unknown", None)
+    assert statuses["100"] == (("waiting", "running") if out
+                               else ("unknown", None))
+    assert session.commands == [["ps", "-o", "pid=", "-p", "100,101"]]
+
+
+def test_follow_progress():
+    statuses = iter([("waiting", "running"), ("completed", "completed")])
+    submitter = submitters.LocalSubmitter(FakeSession({}))
+    submitter.submission_id = "1"
+    with patch.object(submitters.LocalSubmitter, "status",
+                      new_callable=PropertyMock,
+                      side_effect=lambda: next(statuses)):
+        with patch("time.sleep"):
+            with swallow_logs(new_level=logging.INFO) as log:
+                submitter.follow(progress=lambda: "2 subjobs: 2 running")
+                assert ("Waiting on job 1: running (2 subjobs: 2 running)"
+                        in log.out)
@@ -0,0 +1,200 @@
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the reproman package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Registry of resource backends and tracers.
+
+The registry maps plugin names to "module:attribute" import paths without
+importing anything.  The built-in plugins are listed below (and only there,
+they are not declared as entry points), and installed packages can add their
+own through the entry point groups in `GROUPS`.
+Scanning installed packages for entry points is slow, so the result is
+cached in a small table under the user cache directory, which is refreshed
+when the Python path changes.  The plugins themselves are imported on first
+use by `load_plugin`.
+
+Tracers may also register a probe under the same name in the
+"reproman.tracer_probes" group.  A probe is a function that takes a session
+and returns false if the tracer cannot apply to it (e.g., because dpkg is
+missing).  Probes should live in modules which are cheap to import so that
+they can run before the tracer module and its dependencies are imported.
+"""
+
+from collections import OrderedDict
+from importlib import import_module
+import json
+import logging
+import os
+import os.path as op
+import sys
+
+from reproman.dochelpers import exc_str
+
+lgr = logging.getLogger('reproman.support.plugins')
+
+RESOURCES = "reproman.resources"
+TRACERS = "reproman.tracers"
+TRACER_PROBES = "reproman.tracer_probes"
+GROUPS = (RESOURCES, TRACERS, TRACER_PROBES)
+
+# The order of tracers matters: the ones listed first get the first chance to
+# claim files.
+BUILTIN_PLUGINS = {
+    RESOURCES: [
+        ("aws-condor", "reproman.resource.aws_condor:AwsCondor"),
+        ("aws-ec2", "reproman.resource.aws_ec2:AwsEc2"),
+        ("docker-container", "reproman.resource.docker_container:DockerContainer"),
+        ("shell", "reproman.resource.shell:Shell"),
+        ("singularity", "reproman.resource.singularity:Singularity"),
+        ("ssh", "reproman.resource.ssh:Ssh"),
+    ],
+    TRACERS: [
+        ("debian", "reproman.distributions.debian:DebTracer"),
+        ("redhat", "reproman.distributions.redhat:RPMTracer"),
+        ("conda", "reproman.distributions.conda:CondaTracer"),
+        ("venv", "reproman.distributions.venv:VenvTracer"),
+        ("vcs", "reproman.distributions.vcs:VCSTracer"),
+        ("docker", "reproman.distributions.docker:DockerTracer"),
+        ("singularity", "reproman.distributions.singularity:SingularityTracer"),
+    ],
+    TRACER_PROBES: [
+        ("debian", "reproman.distributions.probes:have_dpkg"),
+        ("redhat", "reproman.distributions.probes:have_rpm"),
+        ("docker", "reproman.distributions.probes:have_docker"),
+        ("singularity", "reproman.distributions.probes:have_singularity"),
+    ],
+}
+
+_registry = None
+_loaded = {}
+
+
+def _cache_file():
+    from reproman import cfg
+    return cfg.getpath(
+        'general', 'plugins_cache_file',
+        op.join(cfg.dirs.user_cache_dir, 'plugins.json'))
+
+
+def _path_key():
+    """Return a value which changes when packages are (un)installed.
+    """
+    from reproman.version import __version__
+    key = [sys.version, __version__]
+    for path in sys.path:
+        try:
+            key.append([path, os.stat(path or os.curdir).st_mtime])
+        except OSError:
+            continue
+    return key
+
+
+def _iter_entry_points():
+    """Yield (group, name, import path) for installed entry points.
+    """
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:  # Python < 3.8
+        try:
+            import pkg_resources
+        except ImportError:
+            return
+        for group in GROUPS:
+            for ep in pkg_resources.iter_entry_points(group):
+                yield (group, ep.name,
+                       "{}:{}".format(ep.module_name, ".".join(ep.attrs)))
+        return
+
+    eps = entry_points()
+    for group in GROUPS:
+        if hasattr(eps, "select"):  # Python 3.10+
+            selected = eps.select(group=group)
+        else:
+            selected = eps.get(group, [])
+        for ep in selected:
+            yield group, ep.name, ep.value
+
+
+def _scan_entry_points():
+    """Return the installed entry points, using the cache file if current.
+    """
+    path = _cache_file()
+    key = _path_key()
+    try:
+        with open(path) as fp:
+            cache = json.load(fp)
+        if cache.get("key") == key:
+            return [tuple(row) for row in cache["plugins"]]
+    except (OSError, ValueError, KeyError) as exc:
+        lgr.log(5, "Not using plugin cache %s: %s", path, exc_str(exc))
+
+    lgr.debug("Scanning for plugin entry points")
+    try:
+        rows = sorted(set(_iter_entry_points()))
+    except Exception as exc:
+        lgr.warning("Failed to scan for plugin entry points: %s",
+                    exc_str(exc))
+        return []
+    try:
+        os.makedirs(op.dirname(path), exist_ok=True)
+        with open(path, "w") as fp:
+            json.dump({"key": key, "plugins": rows}, fp)
+    except OSError as exc:
+        lgr.debug("Failed to save %s: %s", path, exc_str(exc))
+    return rows
+
+
+def _get_registry():
+    global _registry
+    if _registry is None:
+        registry = {group: OrderedDict(BUILTIN_PLUGINS.get(group, []))
+                    for group in GROUPS}
+        for group, name, target in _scan_entry_points():
+            registry[group][name] = target
+        _registry = registry
+    return _registry
+
+
+def get_plugins(group):
+    """Return the registered plugins of `group`.
+
+    Parameters
+    ----------
+    group : str
+        One of `GROUPS`.
+
+    Returns
+    -------
+    OrderedDict mapping names to "module:attribute" import paths.  Built-in
+    plugins come first, in their defined order.
+    """
+    return OrderedDict(_get_registry()[group])
+
+
+def load_plugin(group, name):
+    """Import and return the object registered as `name` in `group`.
+
+    Raises
+    ------
+    KeyError if no plugin is registered under `name`.  Any error raised while
+    importing the plugin is propagated.
+    """
+    target = _get_registry()[group][name]
+    if target not in _loaded:
+        module_name, _, attr_name = target.partition(":")
+        obj = import_module(module_name)
+        for part in attr_name.split(".") if attr_name else []:
+            obj = getattr(obj, part)
+        _loaded[target] = obj
+    return _loaded[target]
+
+
+def reset():
+    """Forget the registry so that it is rebuilt on next access.
+    """
+    global _registry
+    _registry = None
+    _loaded.clear()
@@ -0,0 +1,176 @@
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the reproman package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Record timed spans of session commands, transfers, and tracer phases.
+
+Recording is off unless `start` is called (e.g., via the --trace-profile
+command-line option).  The recorded spans can be written as Chrome trace-event
+JSON, which can be loaded in chrome://tracing or https://ui.perfetto.dev, or
+as JSON lines.
+"""
+
+from contextlib import contextmanager
+from functools import wraps
+import json
+import logging
+import os
+import os.path as op
+import threading
+import time
+
+from reproman.support.exceptions import CommandError
+
+lgr = logging.getLogger("reproman.support.spans")
+
+_recorder = None
+
+
+class SpanRecorder(object):
+    """Thread-safe collection of spans.
+    """
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, name, category, start, duration, attrs):
+        span = {"name": name,
+                "category": category,
+                "start": start,
+                "duration": duration,
+                "pid": os.getpid(),
+                "tid": threading.get_ident()}
+        span.update(attrs)
+        with self._lock:
+            self.spans.append(span)
+
+
+def start():
+    """Start recording spans.
+    """
+    global _recorder
+    _recorder = SpanRecorder()
+
+
+def stop():
+    """Stop recording spans.
+
+    Returns
+    -------
+    list of recorded spans (dicts)
+    """
+    global _recorder
+    recorder, _recorder = _recorder, None
+    return recorder.spans if recorder else []
+
+
+def recording():
+    """Return true if spans are being recorded.
+    """
+    return _recorder is not None
+
+
+@contextmanager
+def span(name, category, **attrs):
+    """Record the duration of the enclosed block as a span.
+
+    Parameters
+    ----------
+    name : str
+    category : str
+        For example, "session" or "tracer".
+    **attrs
+        Additional information to record with the span.
+
+    Yields
+    ------
+    A dict with `attrs` that can be updated (e.g., with "exit_code",
+    "bytes_in", or "bytes_out") before the block ends.  If a CommandError is
+    raised, its code is recorded as "exit_code".
+    """
+    recorder = _recorder
+    if recorder is None:
+        yield attrs
+        return
+
+    begin = time.time()
+    try:
+        yield attrs
+    except CommandError as exc:
+        attrs.setdefault("exit_code", exc.code)
+        raise
+    except BaseException as exc:
+        attrs.setdefault("error", exc.__class__.__name__)
+        raise
+    finally:
+        recorder.add(name, category, begin, time.time() - begin, attrs)
+
+
+def _local_size(path):
+    if not path or not op.lexists(path):
+        return None
+    if not op.isdir(path):
+        return op.getsize(path)
+    return sum(op.getsize(op.join(root, f))
+               for root, _, files in os.walk(path) for f in files
+               if not op.islink(op.join(root, f)))
+
+
+def traced_transfer(method):
+    """Decorate a session's `put` or `get` to record a span for each call.
+
+    The size of the local side of the transfer is recorded as "bytes_out" for
+    `put` and "bytes_in" for `get`.
+    """
+    @wraps(method)
+    def wrapper(self, src_path, dest_path=None, *args, **kwargs):
+        if _recorder is None:
+            return method(self, src_path, dest_path, *args, **kwargs)
+        with span(method.__name__, "session",
+                  resource=getattr(self, "resource_name", None),
+                  src=src_path, dest=dest_path) as attrs:
+            result = method(self, src_path, dest_path, *args, **kwargs)
+            if method.__name__ == "put":
+                attrs["bytes_out"] = _local_size(src_path)
+            else:
+                attrs["bytes_in"] = _local_size(dest_path)
+        return result
+    return wrapper
+
+
+def to_chrome_trace(spans):
+    """Convert `spans` to a Chrome trace-event object.
+    """
+    events = []
+    for s in spans:
+        args = {k: v for k, v in s.items()
+                if k not in ["name", "category", "start", "duration",
+                             "pid", "tid"]}
+        events.append({"name": s["name"],
+                       "cat": s["category"],
+                       "ph": "X",
+                       "ts": int(s["start"] * 1e6),
+                       "dur": int(s["duration"] * 1e6),
+                       "pid": s["pid"],
+                       "tid": s["tid"],
+                       "args": args})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def write(spans, path):
+    """Write `spans` to `path`.
+
+    The spans are written as JSON lines if `path` ends with ".jsonl" and as
+    Chrome trace-event JSON otherwise.
+    """
+    with open(path, "w") as fh:
+        if path.endswith(".jsonl"):
+            for s in spans:
+                fh.write(json.dumps(s, default=str) + "\n")
+        else:
+            json.dump(to_chrome_trace(spans), fh, default=str)
+    lgr.info("Wrote %d spans to %s", len(spans), path)
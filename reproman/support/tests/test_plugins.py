@@ -0,0 +1,79 @@
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the reproman package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import json
+from unittest.mock import patch
+
+import pytest
+
+from reproman.support import plugins
+
+
+@pytest.fixture
+def cache_file(tmpdir):
+    cache = str(tmpdir.join("plugins.json"))
+    with patch("reproman.support.plugins._cache_file", return_value=cache):
+        plugins.reset()
+        try:
+            yield cache
+        finally:
+            plugins.reset()
+
+
+def test_builtin_plugins(cache_file):
+    with patch("reproman.support.plugins._iter_entry_points",
+               return_value=iter([])):
+        tracers = plugins.get_plugins(plugins.TRACERS)
+        resources = plugins.get_plugins(plugins.RESOURCES)
+    assert list(tracers)[:2] == ["debian", "redhat"]
+    assert "shell" in resources
+
+    from reproman.resource.shell import Shell
+    assert plugins.load_plugin(plugins.RESOURCES, "shell") is Shell
+    with pytest.raises(KeyError):
+        plugins.load_plugin(plugins.RESOURCES, "unknown")
+
+
+def test_entry_points_cached(cache_file):
+    entry_points = [
+        (plugins.RESOURCES, "mine", "reproman.resource.shell:Shell"),
+        (plugins.TRACERS, "debian", "mypkg.tracers:DebTracer"),
+    ]
+    with patch("reproman.support.plugins._iter_entry_points",
+               return_value=iter(entry_points)) as scan:
+        resources = plugins.get_plugins(plugins.RESOURCES)
+        tracers = plugins.get_plugins(plugins.TRACERS)
+    assert scan.call_count == 1
+    assert resources["mine"] == "reproman.resource.shell:Shell"
+    # Entry points override built-ins, but keep their position.
+    assert list(tracers)[0] == "debian"
+    assert tracers["debian"] == "mypkg.tracers:DebTracer"
+
+    with open(cache_file) as fp:
+        assert len(json.load(fp)["plugins"]) == 2
+
+    # A new process uses the cache rather than scanning again.
+    plugins.reset()
+    with patch("reproman.support.plugins._iter_entry_points") as scan:
+        assert "mine" in plugins.get_plugins(plugins.RESOURCES)
+    assert not scan.called
+
+    # The cache is refreshed when the path changes.
+    plugins.reset()
+    with patch("reproman.support.plugins._path_key",
+               return_value=["changed"]), \
+            patch("reproman.support.plugins._iter_entry_points",
+                  return_value=iter([])) as scan:
+        assert "mine" not in plugins.get_plugins(plugins.RESOURCES)
+    assert scan.call_count == 1
+
+
+def test_installed_entry_points():
+    # Works whether or not reproman is installed with its entry points.
+    rows = list(plugins._iter_entry_points())
+    assert all(group in plugins.GROUPS for group, _, _ in rows)
@@ -0,0 +1,91 @@
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the reproman package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import json
+from unittest.mock import patch
+
+import pytest
+
+from reproman.cmdline.main import main
+from reproman.resource.base import ResourceManager
+from reproman.resource.shell import Shell
+from reproman.support import spans
+from reproman.support.exceptions import CommandError
+
+
+@pytest.fixture
+def recording():
+    spans.start()
+    try:
+        yield
+    finally:
+        spans.stop()
+
+
+def test_span_not_recording():
+    assert not spans.recording()
+    with spans.span("name", "cat", a=1) as attrs:
+        attrs["b"] = 2
+    assert spans.stop() == []
+
+
+def test_session_spans(recording, tmpdir):
+    session = Shell("myshell").get_session()
+    session.execute_command(["echo", "hi"])
+    with pytest.raises(CommandError):
+        session.execute_command(["sh", "-c", "exit 3"])
+    src = tmpdir.join("src")
+    src.write("content")
+    session.put(str(src), str(tmpdir.join("dest")))
+
+    recorded = spans.stop()
+    assert [s["name"] for s in recorded] == \
+        ["execute_command", "execute_command", "put"]
+    ok, failed, put = recorded
+    assert ok["resource"] == "myshell"
+    assert ok["command"] == "echo hi"
+    assert ok["exit_code"] == 0
+    assert ok["bytes_in"] == 3
+    assert ok["duration"] >= 0
+    assert failed["exit_code"] == 3
+    assert put["bytes_out"] == 7
+
+
+def test_write(tmpdir):
+    recorded = [{"name": "execute_command", "category": "session",
+                 "start": 1.5, "duration": 0.25, "pid": 1, "tid": 2,
+                 "exit_code": 0}]
+    chrome = str(tmpdir.join("trace.json"))
+    spans.write(recorded, chrome)
+    with open(chrome) as fh:
+        events = json.load(fh)["traceEvents"]
+    assert events == [{"name": "execute_command", "cat": "session",
+                       "ph": "X", "ts": 1500000, "dur": 250000,
+                       "pid": 1, "tid": 2, "args": {"exit_code": 0}}]
+
+    jsonl = str(tmpdir.join("trace.jsonl"))
+    spans.write(recorded * 2, jsonl)
+    with open(jsonl) as fh:
+        assert [json.loads(line) for line in fh] == recorded * 2
+
+
+def test_trace_profile_option(tmpdir):
+    manager = ResourceManager()
+    manager.inventory = {"myshell": {"name": "myshell", "type": "shell",
+                                     "id": "myshell-id"}}
+    path = str(tmpdir.join("trace.jsonl"))
+    with patch("reproman.interface.execute.get_manager",
+               return_value=manager):
+        main(["--trace-profile", path, "execute", "-r", "myshell",
+              "true"])
+    assert not spans.recording()
+    with open(path) as fh:
+        recorded = [json.loads(line) for line in fh]
+    names = [(s["category"], s["name"]) for s in recorded]
+    assert ("session", "execute_command") in names
+    assert ("command", "execute") in names
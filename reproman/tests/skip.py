@@ -104,6 +104,10 @@ def no_docker_engine():
     return "docker engine not running", not is_engine_running()
 
 
+def no_moto():
+    return "moto not installed", not external_versions["moto"]
+
+
 def no_network():
     return ("no network settings",
             os.environ.get('REPROMAN_TESTS_NONETWORK'))
@@ -152,6 +156,7 @@ CONDITION_FNS = [
     no_datalad,
     no_docker_dependencies,
     no_docker_engine,
+    no_moto,
     no_network,
     no_singularity,
     no_slurm,
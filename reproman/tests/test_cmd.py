@@ -13,12 +13,14 @@ import os
 import sys
 import logging
 import shlex
+import time
 import pytest
 
 from .utils import ok_, eq_, assert_is, assert_equal, assert_false, \
     assert_true, assert_in
 
 from ..cmd import Runner, link_file_load
+from ..cmd import TailBuffer
 from ..support.exceptions import CommandError
 from ..support.protocol import DryRunProtocol
 from .utils import assert_cwd_unchanged
@@ -219,3 +221,73 @@ def test_runner_failure(dir_=None):
             runner.run(failing_cmd, cwd=dir_)
         assert_in('Failed to run', cml.out)
         assert_equal(2, cme.value.code)
+
+
+def test_tail_buffer():
+    tail = TailBuffer(5)
+    assert str(tail) == ""
+    tail.append("ab")
+    assert str(tail) == "ab"
+    tail.append("cdef")
+    assert str(tail) == "bcdef"
+    tail.append("ghijklm")
+    assert str(tail) == "ijklm"
+
+    tail = TailBuffer(0)
+    tail.append("ab")
+    assert str(tail) == ""
+
+    with pytest.raises(ValueError):
+        TailBuffer(-1)
+
+
+def test_runner_stream():
+    runner = Runner()
+    cmd = ['sh', '-c', 'echo one; echo two; echo err >&2; printf no-newline']
+    output = list(runner.stream(cmd))
+    assert [t for n, t in output if n == "stdout"] == \
+        ["one\n", "two\n", "no-newline"]
+    assert [t for n, t in output if n == "stderr"] == ["err\n"]
+
+    # Long lines come in pieces.
+    output = list(runner.stream(['sh', '-c', 'printf %s abcdefg'],
+                                chunk_size=3))
+    assert output == [("stdout", "abc"), ("stdout", "def"), ("stdout", "g")]
+
+    # Only the tail of the output ends up in the exception.
+    with swallow_logs():
+        with pytest.raises(CommandError) as cme:
+            list(runner.stream(['sh', '-c', 'seq 1000; exit 3'],
+                               tail_size=8))
+    assert cme.value.code == 3
+    assert cme.value.stdout == "999\n1000\n"[-8:]
+
+    # Stopping early doesn't hang.
+    for _ in runner.stream(['sh', '-c', 'yes | head -n 1000000']):
+        break
+
+
+@pytest.mark.skipif(on_windows, reason="Uses process groups")
+def test_runner_stream_stop_kills_children():
+    runner = Runner()
+    # The background subshell holds the pipes after the shell itself is
+    # killed.  If it survived, stopping would block until it exits.
+    start = time.time()
+    for _ in runner.stream(['sh', '-c', '(sleep 300; :) & echo started; wait']):
+        break
+    assert time.time() - start < 60
+
+
+def test_runner_run_streamed():
+    runner = Runner()
+    lines = []
+    cmd = ['sh', '-c', 'seq 3; echo err >&2']
+    assert runner.run(cmd, callback=lambda *a: lines.append(a)) == \
+        (None, None)
+    assert sorted(lines) == [("stderr", "err\n"), ("stdout", "1\n"),
+                             ("stdout", "2\n"), ("stdout", "3\n")]
+
+    out, err = runner.run(['seq', '1000'], spool=100)
+    assert out._rolled
+    assert out.read() == "".join("%d\n" % i for i in range(1, 1001))
+    assert err.read() == ""
@@ -74,7 +74,7 @@ requires = {
         'datalad-container',
     ],
     'docker': [
-        'docker>=3.0.0',
+        'docker>=4.0.0',  # for demux in exec_start
         'dockerpty',
     ],
     'aws': [